@@ -0,0 +1,126 @@
+"""Microbenchmark: time to route one callback query to its handler.
+
+    python -m benchmarks.callback_routing [--updates 20000]
+
+Registers a no-op handler for every callback pattern the bot uses, twice: once the way the
+handlers were registered before (one aiogram handler per pattern, with a lambda on
+callback.data, tried in order) and once through handlers.callback_router. Then replays
+callback_data drawn uniformly from all patterns through aiogram's own propagation and reports
+µs per callback.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime
+
+from aiogram import Router
+from aiogram.fsm.state import State
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+import handlers  # noqa: F401  (registers every route on handlers.callback_router.callbacks)
+from handlers.callback_router import _SEGMENT_SEP, CallbackRouter, callbacks
+
+
+def _sample(pattern: str) -> str:
+    """callback_data that the pattern matches, e.g. "task:view:7" for "task:view:{task_id:int}"."""
+    parts = []
+    for segment in _SEGMENT_SEP.split(pattern):
+        if not segment.startswith("{"):
+            parts.append(segment)
+            continue
+        _, _, kind = segment[1:-1].partition(":")
+        if kind == "int":
+            parts.append("7")
+        elif kind == "path":
+            parts.append("menu:main")
+        elif "|" in kind:
+            parts.append(kind.split("|")[0])
+        else:
+            parts.append("dice")
+    return ":".join(parts)
+
+
+def _legacy_filter(pattern: str, states: frozenset[str] | None):
+    literal, _, rest = pattern.partition("{")
+    if not rest:
+        check = lambda c: c.data == pattern  # noqa: E731
+    else:
+        check = lambda c: c.data.startswith(literal)  # noqa: E731
+    if states is None:
+        return check
+
+    def in_state(c: CallbackQuery, raw_state: str | None = None) -> bool:
+        return raw_state in states and check(c)
+    return in_state
+
+
+async def _noop(callback: CallbackQuery, **kwargs) -> None:
+    return None
+
+
+def _build_legacy() -> Router:
+    router = Router(name="legacy")
+    for route in callbacks.routes:
+        router.callback_query.register(_noop, _legacy_filter(route.pattern, route.states))
+    return router
+
+
+def _build_trie() -> Router:
+    trie = CallbackRouter(name="trie")
+    for route in callbacks.routes:
+        state = None
+        if route.states is not None:
+            state = tuple(State(*s.split(":")[::-1]) for s in route.states)
+        trie(route.pattern, state=state)(_noop)
+    return trie.router
+
+
+def _callbacks(updates: int, seed: int = 1) -> list[tuple[CallbackQuery, str | None]]:
+    rnd = random.Random(seed)
+    user = User(id=1, is_bot=False, first_name="u")
+    message = Message(message_id=1, date=datetime.now(), chat=Chat(id=1, type="private"))
+    out = []
+    for _ in range(updates):
+        route = rnd.choice(callbacks.routes)
+        raw_state = next(iter(route.states)) if route.states else None
+        cb = CallbackQuery(
+            id="1", from_user=user, chat_instance="1", message=message, data=_sample(route.pattern),
+        )
+        out.append((cb, raw_state))
+    return out
+
+
+async def _measure(router: Router, mix: list[tuple[CallbackQuery, str | None]]) -> float:
+    async def replay() -> None:
+        for cb, raw_state in mix:
+            await router.propagate_event("callback_query", cb, raw_state=raw_state)
+
+    await replay()  # warm up
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        await replay()
+        best = min(best, time.perf_counter() - start)
+    return best / len(mix) * 1e6
+
+
+async def _main(updates: int) -> None:
+    mix = _callbacks(updates)
+    legacy_us = await _measure(_build_legacy(), mix)
+    trie_us = await _measure(_build_trie(), mix)
+    print(f"{len(callbacks.routes)} callback patterns, {updates} callbacks")
+    print(f"  per-handler filters: {legacy_us:8.2f} µs/callback")
+    print(f"  trie:                {trie_us:8.2f} µs/callback")
+    print(f"  speedup x{legacy_us / trie_us:.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=20_000)
+    args = parser.parse_args()
+    asyncio.run(_main(args.updates))
+
+
+if __name__ == "__main__":
+    main()
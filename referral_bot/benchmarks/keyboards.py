@@ -0,0 +1,99 @@
+"""Microbenchmark: keyboard construction per update, rebuilt vs memoised.
+
+    python -m benchmarks.keyboards [--updates 20000]
+
+Replays a typical mix of navigation updates (main menu, profile, tasks, games, a game result)
+and reports time and allocated bytes per update, first building every markup from scratch
+(the functions' `__wrapped__` / no version) and then through the caches.
+"""
+import argparse
+import random
+import timeit
+import tracemalloc
+
+from keyboards.games import game_result_kb, games_menu_kb, game_cancel_kb
+from keyboards.main import main_menu_kb, profile_kb, tasks_list_kb, back_to_menu_kb
+from services.task_cache import CachedTask
+
+TASKS = tuple(
+    CachedTask(i, "subscribe", f"Подпишись на канал #{i}", "", 5.0, f"@channel{i}", None)
+    for i in range(1, 9)
+)
+GAMES = {
+    game: {"enabled": True, "min_bet": 1.0, "coeff_label": "x2"}
+    for game in ("football", "basketball", "bowling", "dice", "slots")
+}
+# completion bitsets seen in practice: most users sit at a handful of progress states
+MASKS = [0, 0b10, 0b110, 0b11110, 0b111111110]
+
+
+def _mix(updates: int, seed: int = 1) -> list[tuple[str, int]]:
+    rnd = random.Random(seed)
+    kinds = ["main", "main", "profile", "back", "tasks", "tasks", "games", "result", "cancel"]
+    return [(rnd.choice(kinds), rnd.choice(MASKS)) for _ in range(updates)]
+
+
+def _rebuilt(kind: str, mask: int):
+    if kind == "main":
+        return main_menu_kb.__wrapped__()
+    if kind == "profile":
+        return profile_kb.__wrapped__()
+    if kind == "back":
+        return back_to_menu_kb.__wrapped__()
+    if kind == "tasks":
+        return tasks_list_kb(TASKS, mask)
+    if kind == "games":
+        return games_menu_kb(GAMES)
+    if kind == "result":
+        return game_result_kb.__wrapped__("dice")
+    return game_cancel_kb.__wrapped__()
+
+
+def _memoised(kind: str, mask: int):
+    if kind == "main":
+        return main_menu_kb()
+    if kind == "profile":
+        return profile_kb()
+    if kind == "back":
+        return back_to_menu_kb()
+    if kind == "tasks":
+        return tasks_list_kb(TASKS, mask, 1)
+    if kind == "games":
+        return games_menu_kb(GAMES, 1)
+    if kind == "result":
+        return game_result_kb("dice")
+    return game_cancel_kb()
+
+
+def _measure(func, mix: list[tuple[str, int]]) -> tuple[float, float]:
+    """(µs per update, bytes of markup allocated per update)."""
+    def replay() -> list:
+        return [func(kind, mask) for kind, mask in mix]
+
+    replay()  # warm the caches, so only steady state is measured
+    seconds = min(timeit.repeat(replay, number=1, repeat=3))
+    # keep every returned markup alive, so the traced size is what the updates allocated
+    tracemalloc.start()
+    markups = replay()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del markups
+    return seconds / len(mix) * 1e6, allocated / len(mix)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=20_000)
+    args = parser.parse_args()
+
+    mix = _mix(args.updates)
+    rebuilt_us, rebuilt_bytes = _measure(_rebuilt, mix)
+    cached_us, cached_bytes = _measure(_memoised, mix)
+    print(f"{args.updates} updates")
+    print(f"  rebuilt:  {rebuilt_us:8.2f} µs/update  {rebuilt_bytes:10.1f} B/update")
+    print(f"  memoised: {cached_us:8.2f} µs/update  {cached_bytes:10.1f} B/update")
+    print(f"  speedup x{rebuilt_us / cached_us:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Benchmark: Bot API calls per menu navigation.
+
+    python -m benchmarks.navigation [--steps 10000] [--photo-share 0.5]
+
+Walks randomly between menus, some of which have an admin photo, against an in-process fake
+of the Bot API that keeps each message's kind and rejects edits Telegram would reject (editing
+the text of a photo, the caption of a text message). Every request the bot makes is counted,
+for the current rendering in handlers.button_helper and for the previous edit_text-first one.
+"""
+import argparse
+import asyncio
+import random
+from collections import Counter
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import (
+    DeleteMessage, EditMessageCaption, EditMessageMedia, EditMessageText, SendMessage, SendPhoto,
+)
+from aiogram.types import CallbackQuery, Chat, InlineKeyboardMarkup, Message, PhotoSize, User
+
+from handlers.button_helper import _show
+from keyboards.main import back_to_menu_kb
+
+CHAT_ID = 1
+MENUS = ["main", "earn", "referrals", "tasks", "games", "bonus", "profile", "top", "withdraw", "how"]
+
+
+class FakeTelegram(BaseSession):
+    """Just enough of the Bot API for menu rendering; counts every request by method."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: Counter[str] = Counter()
+        self._photos: dict[int, str | None] = {}  # message_id → photo file_id (None: text)
+        self._next_id = 1
+        # the menu message as the user sees it, which the next callback points at
+        self.current: Message | None = None
+
+    def _message(self, bot: Bot, message_id: int, text: str | None) -> Message:
+        photo = self._photos[message_id]
+        self.current = Message(
+            message_id=message_id,
+            date=datetime.now(),
+            chat=Chat(id=CHAT_ID, type="private"),
+            text=None if photo else text,
+            caption=text if photo else None,
+            # Telegram hands back its own file_id, not the one the bot sent
+            photo=[PhotoSize(file_id=f"{photo}:sent", file_unique_id=photo, width=1, height=1)] if photo else None,
+        ).as_(bot)
+        return self.current
+
+    def _send(self, bot: Bot, photo: str | None, text: str) -> Message:
+        message_id, self._next_id = self._next_id, self._next_id + 1
+        self._photos[message_id] = photo
+        return self._message(bot, message_id, text)
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[type(method).__name__] += 1
+        if isinstance(method, SendMessage):
+            return self._send(bot, None, method.text)
+        if isinstance(method, SendPhoto):
+            return self._send(bot, method.photo, method.caption)
+        if isinstance(method, DeleteMessage):
+            self._photos.pop(method.message_id, None)
+            return True
+        photo = self._photos.get(method.message_id, ...)
+        if photo is ...:
+            raise TelegramBadRequest(method, "message to edit not found")
+        if isinstance(method, EditMessageText):
+            if photo:
+                raise TelegramBadRequest(method, "there is no text in the message to edit")
+            return self._message(bot, method.message_id, method.text)
+        if isinstance(method, EditMessageCaption):
+            if not photo:
+                raise TelegramBadRequest(method, "there is no caption in the message to edit")
+            return self._message(bot, method.message_id, method.caption)
+        if isinstance(method, EditMessageMedia):
+            if not photo:
+                raise TelegramBadRequest(method, "there is no media in the message to edit")
+            self._photos[method.message_id] = method.media.media
+            return self._message(bot, method.message_id, method.media.caption)
+        raise NotImplementedError(type(method).__name__)
+
+    async def close(self) -> None:
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        raise NotImplementedError
+        yield
+
+
+async def _legacy_show(callback: CallbackQuery, text: str, keyboard: InlineKeyboardMarkup, photo: str | None) -> None:
+    """The rendering before message kinds were tracked."""
+    if photo:
+        try:
+            await callback.message.delete()
+        except Exception:
+            pass
+        await callback.message.answer_photo(photo=photo, caption=text, parse_mode="HTML", reply_markup=keyboard)
+    else:
+        try:
+            await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+        except Exception:
+            try:
+                await callback.message.delete()
+            except Exception:
+                pass
+            await callback.message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+
+
+async def _walk(show, steps: int, photos: dict[str, str | None], seed: int) -> Counter[str]:
+    telegram = FakeTelegram()
+    bot = Bot("42:benchmark", session=telegram)
+    user = User(id=CHAT_ID, is_bot=False, first_name="bench")
+    await bot.send_message(CHAT_ID, "start")
+    telegram.calls.clear()
+    rnd = random.Random(seed)
+    keyboard = back_to_menu_kb()
+    for step in range(steps):
+        menu = rnd.choice(MENUS)
+        callback = CallbackQuery(
+            id=str(step), from_user=user, chat_instance="bench", data=f"menu:{menu}", message=telegram.current,
+        ).as_(bot)
+        await show(callback, f"{menu} #{step}", keyboard, photos[menu])
+    return telegram.calls
+
+
+async def run(steps: int, photo_share: float, seed: int = 1) -> None:
+    rnd = random.Random(seed)
+    photos = {menu: (f"photo-{menu}" if rnd.random() < photo_share else None) for menu in MENUS}
+    print(f"{steps} navigations, photo menus: {sorted(m for m, p in photos.items() if p)}")
+    for name, show in (("previous", _legacy_show), ("current", _show)):
+        calls = await _walk(show, steps, photos, seed)
+        total = sum(calls.values())
+        detail = ", ".join(f"{method} {n}" for method, n in calls.most_common())
+        print(f"  {name:8}  {total / steps:.2f} calls/navigation  ({detail})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=10_000)
+    parser.add_argument("--photo-share", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(run(args.steps, args.photo_share))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Load test: many users redeem one public promo code at the same moment.
+
+Runs against a throwaway SQLite file, never the bot's database.db.
+
+    python -m benchmarks.promo_redeem_load [--users 10000] [--limit 2500] [--pool 16]
+
+Checks that usage_count == min(limit, users), that promo_uses agrees, that nobody redeemed
+twice and that exactly the winners were credited.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from sqlalchemy import event, select, func, insert
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from database.models import Base, PromoCode, PromoUse, User
+from services.promo import REDEEM_OK, redeem_promo
+
+CODE = "LOADTEST"
+REWARD = 1.0
+
+
+async def run(users: int, limit: int | None, pool: int) -> None:
+    path = Path(tempfile.mkdtemp(prefix="promo_load_")) / "load.db"
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{path}",
+        # bounded pool: the aiosqlite default (NullPool) would open one connection thread per task
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=pool,
+        max_overflow=0,
+        pool_timeout=600,
+        connect_args={"timeout": 60},
+    )
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with factory() as session:
+        await session.execute(insert(User), [{"user_id": uid} for uid in range(1, users + 1)])
+        session.add(PromoCode(code=CODE, reward=REWARD, usage_limit=limit))
+        await session.commit()
+
+    async def attempt(user_id: int, code: str) -> str:
+        async with factory() as session:
+            status, _, _ = await redeem_promo(session, user_id, code)
+            return status
+
+    # Every user sends the code, a tenth of them twice, plus garbage that must not touch the DB
+    jobs = [attempt(uid, CODE.lower()) for uid in range(1, users + 1)]
+    jobs += [attempt(uid, CODE) for uid in range(1, users + 1, 10)]
+    jobs += [attempt(uid, "NOPE" + str(uid)) for uid in range(1, users + 1, 10)]
+
+    started = time.perf_counter()
+    statuses = Counter(await asyncio.gather(*jobs))
+    elapsed = time.perf_counter() - started
+
+    expected = users if limit is None else min(limit, users)
+    async with factory() as session:
+        usage_count = (await session.execute(select(PromoCode.usage_count))).scalar_one()
+        uses = (await session.execute(select(func.count()).select_from(PromoUse))).scalar_one()
+        distinct_users = (await session.execute(
+            select(func.count(func.distinct(PromoUse.user_id)))
+        )).scalar_one()
+        credited = (await session.execute(
+            select(func.count()).select_from(User).where(User.stars_balance == REWARD)
+        )).scalar_one()
+        overpaid = (await session.execute(
+            select(func.count()).select_from(User).where(User.stars_balance > REWARD)
+        )).scalar_one()
+    await engine.dispose()
+
+    print(f"{len(jobs)} attempts in {elapsed:.2f}s ({len(jobs) / elapsed:.0f}/s): {dict(statuses)}")
+    print(f"usage_count={usage_count} promo_uses={uses} credited={credited} expected={expected}")
+    assert statuses[REDEEM_OK] == expected
+    assert usage_count == uses == distinct_users == credited == expected
+    assert overpaid == 0
+    print("OK")
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.promo_redeem_load")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--limit", type=int, default=2_500, help="0 = unlimited")
+    parser.add_argument("--pool", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.limit or None, args.pool))
+
+
+if __name__ == "__main__":
+    _main()
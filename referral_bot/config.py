@@ -1,25 +1,46 @@
-import os
-from dataclasses import dataclass, field
-from dotenv import load_dotenv
-
-load_dotenv()
-
-
-@dataclass
-class Config:
-    BOT_TOKEN: str = os.getenv("BOT_TOKEN", "")
-    ADMIN_IDS: list[int] = field(
-        default_factory=lambda: list(
-            map(int, filter(None, os.getenv("ADMIN_IDS", "").split(",")))
-        )
-    )
-    ADMIN_CHANNEL_ID: int = int(os.getenv("ADMIN_CHANNEL_ID", "0"))
-    FLYER_KEY: str = os.getenv("FLYER_KEY", "")
-    BOT_USERNAME: str = os.getenv("BOT_USERNAME", "")
-    REFERRAL_REWARD: float = float(os.getenv("REFERRAL_REWARD", "5"))
-    BONUS_COOLDOWN_HOURS: int = int(os.getenv("BONUS_COOLDOWN_HOURS", "24"))
-    BONUS_MIN: float = float(os.getenv("BONUS_MIN", "0.5"))
-    BONUS_MAX: float = float(os.getenv("BONUS_MAX", "1.0"))
-
-
-config = Config()
+import os
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+@dataclass
+class Config:
+    BOT_TOKEN: str = os.getenv("BOT_TOKEN", "")
+    ADMIN_IDS: list[int] = field(
+        default_factory=lambda: list(
+            map(int, filter(None, os.getenv("ADMIN_IDS", "").split(",")))
+        )
+    )
+    ADMIN_CHANNEL_ID: int = int(os.getenv("ADMIN_CHANNEL_ID", "0"))
+    FLYER_KEY: str = os.getenv("FLYER_KEY", "")
+    BOT_USERNAME: str = os.getenv("BOT_USERNAME", "")
+    REFERRAL_REWARD: float = float(os.getenv("REFERRAL_REWARD", "5"))
+    # Commission for referrals of referrals (level 2) and one level further (level 3)
+    REFERRAL_REWARD_L2: float = float(os.getenv("REFERRAL_REWARD_L2", "0"))
+    REFERRAL_REWARD_L3: float = float(os.getenv("REFERRAL_REWARD_L3", "0"))
+    # Referral fraud scoring: flag threshold (0–1), minimum referrals before scoring, hold rewards of flagged
+    FRAUD_FLAG_SCORE: float = float(os.getenv("FRAUD_FLAG_SCORE", "0.6"))
+    FRAUD_MIN_REFERRALS: int = int(os.getenv("FRAUD_MIN_REFERRALS", "5"))
+    FRAUD_HOLD_REWARDS: bool = os.getenv("FRAUD_HOLD_REWARDS", "0") == "1"
+    BONUS_COOLDOWN_HOURS: int = int(os.getenv("BONUS_COOLDOWN_HOURS", "24"))
+    BONUS_MIN: float = float(os.getenv("BONUS_MIN", "0.5"))
+    BONUS_MAX: float = float(os.getenv("BONUS_MAX", "1.0"))
+    ROLLUP_INTERVAL_MINUTES: int = int(os.getenv("ROLLUP_INTERVAL_MINUTES", "5"))
+    # Auto-disable a game when its realised RTP over the last hour exceeds this (0 = never),
+    # once at least GAME_RTP_MIN_WAGERED stars were bet on it in that hour
+    GAME_RTP_LIMIT: float = float(os.getenv("GAME_RTP_LIMIT", "1.2"))
+    GAME_RTP_MIN_WAGERED: float = float(os.getenv("GAME_RTP_MIN_WAGERED", "1000"))
+    GAME_SESSIONS_RETENTION_DAYS: int = int(os.getenv("GAME_SESSIONS_RETENTION_DAYS", "30"))
+    ARCHIVE_DIR: str = os.getenv("ARCHIVE_DIR", "archive")
+    ARCHIVE_BATCH_SIZE: int = int(os.getenv("ARCHIVE_BATCH_SIZE", "2000"))
+    # Re-verification of subscribe task completions: run interval, getChatMember calls per run and
+    # per second, and how many clawed-back lapses exclude a user from subscribe tasks (0 = never)
+    SUBSCRIPTION_VERIFY_INTERVAL_MINUTES: int = int(os.getenv("SUBSCRIPTION_VERIFY_INTERVAL_MINUTES", "30"))
+    SUBSCRIPTION_CHECKS_PER_RUN: int = int(os.getenv("SUBSCRIPTION_CHECKS_PER_RUN", "2000"))
+    SUBSCRIPTION_CHECKS_PER_SECOND: float = float(os.getenv("SUBSCRIPTION_CHECKS_PER_SECOND", "5"))
+    SUBSCRIPTION_OFFENDER_LAPSES: int = int(os.getenv("SUBSCRIPTION_OFFENDER_LAPSES", "2"))
+
+
+config = Config()
@@ -1,10 +1,93 @@
-from database.engine import engine
-from database.models import Base
-
-
-async def init_db() -> None:
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
-
-__all__ = ["init_db"]
+import logging
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex
+
+from database.engine import engine, SessionFactory
+from database.models import Base
+from database.counters import check_counters
+
+logger = logging.getLogger(__name__)
+
+
+# Unique indexes added to tables that may already hold duplicates written before the index
+# existed; those duplicates (every row but the lowest id per key) are deleted first
+_DEDUPE_BEFORE_UNIQUE = {"ux_promo_uses_user_promo", "ux_task_completions_user_task"}
+
+
+def _delete_duplicates(conn, index) -> None:
+    exists = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index.name,)
+    ).first()
+    if exists:
+        return
+    table = index.table.name
+    key = ", ".join(column.name for column in index.columns)
+    result = conn.exec_driver_sql(
+        f"DELETE FROM {table} WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY {key})"
+    )
+    if result.rowcount:
+        logger.warning("Deleted %d duplicate %s rows before creating %s", result.rowcount, table, index.name)
+
+
+def _create_missing_indexes(conn) -> None:
+    # create_all() skips tables that already exist, including indexes added to them later
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name in _DEDUPE_BEFORE_UNIQUE:
+                _delete_duplicates(conn, index)
+            try:
+                # IF NOT EXISTS rather than checkfirst: reflection cannot see expression indexes
+                conn.execute(CreateIndex(index, if_not_exists=True))
+            except DBAPIError as exc:
+                logger.error("Could not create index %s: %s", index.name, exc)
+                # the code relies on unique indexes to reject duplicates: do not run without one
+                if index.unique:
+                    raise
+
+
+# Full-text index over users' names for the admin user search. Its rowid is the user_id;
+# triggers keep it in step with users.
+_USERS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+    "first_name, username, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_fts(rowid, first_name, username) "
+    "VALUES (new.user_id, new.first_name, coalesce(new.username, '')); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF first_name, username ON users BEGIN "
+    "DELETE FROM users_fts WHERE rowid = old.user_id; "
+    "INSERT INTO users_fts(rowid, first_name, username) "
+    "VALUES (new.user_id, new.first_name, coalesce(new.username, '')); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN "
+    "DELETE FROM users_fts WHERE rowid = old.user_id; END",
+)
+
+
+def _create_users_fts(conn) -> None:
+    existed = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'users_fts'").first()
+    try:
+        for statement in _USERS_FTS_DDL:
+            conn.exec_driver_sql(statement)
+    except DBAPIError as exc:
+        # SQLite built without FTS5: user search falls back to username prefixes
+        logger.error("Could not create users_fts: %s", exc)
+        return
+    if not existed:
+        conn.exec_driver_sql(
+            "INSERT INTO users_fts(rowid, first_name, username) "
+            "SELECT user_id, first_name, coalesce(username, '') FROM users"
+        )
+
+
+async def init_db() -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
+        await conn.run_sync(_create_users_fts)
+
+    # Seed the counters row on first start and catch any drift left by a crash
+    async with SessionFactory() as session:
+        await check_counters(session)
+
+
+__all__ = ["init_db"]
@@ -0,0 +1,86 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import StatsCounters, User, Withdrawal
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_ID = 1
+
+
+async def bump_counters(session: AsyncSession, **deltas: float) -> None:
+    """Atomically add deltas to the counters row. Does not commit —
+    call it inside the transaction that changes the source rows."""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    await session.execute(
+        update(StatsCounters)
+        .where(StatsCounters.id == COUNTERS_ID)
+        .values({k: getattr(StatsCounters, k) + v for k, v in deltas.items()})
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def get_counters(session: AsyncSession) -> StatsCounters:
+    row = await session.get(StatsCounters, COUNTERS_ID)
+    if row is None:
+        row = await reconcile_counters(session)
+    return row
+
+
+async def _compute_counters(session: AsyncSession) -> dict[str, float]:
+    users_total = (await session.execute(select(func.count(User.user_id)))).scalar() or 0
+    pending = (await session.execute(
+        select(func.count(Withdrawal.id)).where(Withdrawal.status == "pending")
+    )).scalar() or 0
+    approved_sum = (await session.execute(
+        select(func.sum(Withdrawal.amount)).where(Withdrawal.status == "approved")
+    )).scalar() or 0.0
+    return {
+        "users_total": users_total,
+        "withdrawals_pending": pending,
+        "withdrawals_approved_sum": float(approved_sum),
+    }
+
+
+async def reconcile_counters(
+    session: AsyncSession,
+    drift: dict[str, tuple[float, float]] | None = None,
+) -> StatsCounters:
+    """Recompute counters from the source tables with full scans and overwrite the row.
+    If `drift` is given, it is filled with {counter: (stored, actual)} for every mismatch."""
+    now = datetime.utcnow()
+    # Take the write lock first so no bump can slip in between the scans and the overwrite
+    result = await session.execute(
+        update(StatsCounters)
+        .where(StatsCounters.id == COUNTERS_ID)
+        .values(reconciled_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    created = result.rowcount == 0
+    if created:
+        session.add(StatsCounters(id=COUNTERS_ID, reconciled_at=now))
+        await session.flush()
+    row = await session.get(StatsCounters, COUNTERS_ID, populate_existing=True)
+
+    actual = await _compute_counters(session)
+    for key, value in actual.items():
+        stored = getattr(row, key) or 0
+        if drift is not None and not created and abs(stored - value) > 1e-6:
+            drift[key] = (stored, value)
+        setattr(row, key, value)
+    await session.commit()
+    return row
+
+
+async def check_counters(session: AsyncSession) -> int:
+    """Reconcile the counters, logging every drift found; returns how many counters drifted."""
+    drift: dict[str, tuple[float, float]] = {}
+    await reconcile_counters(session, drift)
+    for key, (stored, actual) in drift.items():
+        logger.warning("Stats counter %s drifted: stored=%s actual=%s", key, stored, actual)
+    return len(drift)
@@ -1,39 +1,70 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-
-from database.models import ButtonContent, BotSettings
-
-DATABASE_URL = "sqlite+aiosqlite:///./database.db"
-
-engine = create_async_engine(DATABASE_URL, echo=False)
-SessionFactory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-
-
-async def set_setting(session: AsyncSession, key: str, value: str) -> None:
-    row = await session.get(BotSettings, key)
-    if row:
-        row.value = value
-    else:
-        session.add(BotSettings(key=key, value=value))
-    await session.commit()
-
-
-async def get_button_content(session: AsyncSession, key: str) -> ButtonContent | None:
-    return await session.get(ButtonContent, key)
-
-
-async def set_button_photo(session: AsyncSession, key: str, file_id: str | None) -> None:
-    row = await session.get(ButtonContent, key)
-    if row:
-        row.photo_file_id = file_id
-    else:
-        session.add(ButtonContent(key=key, photo_file_id=file_id))
-    await session.commit()
-
-
-async def set_button_text(session: AsyncSession, key: str, text: str | None) -> None:
-    row = await session.get(ButtonContent, key)
-    if row:
-        row.text = text
-    else:
-        session.add(ButtonContent(key=key, text=text))
-    await session.commit()
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+
+from database.models import ButtonContent, BotSettings
+
+DATABASE_URL = "sqlite+aiosqlite:///./database.db"
+
+engine = create_async_engine(DATABASE_URL, echo=False)
+SessionFactory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    # WAL lets long readers (exports, archival) run without blocking writers' commits
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+# Bumped by set_setting; in-memory data derived from bot_settings is keyed by it
+_settings_version = 0
+
+
+def get_settings_version() -> int:
+    return _settings_version
+
+
+async def set_setting(session: AsyncSession, key: str, value: str) -> None:
+    global _settings_version
+    row = await session.get(BotSettings, key)
+    if row:
+        row.value = value
+    else:
+        session.add(BotSettings(key=key, value=value))
+    await session.commit()
+    _settings_version += 1
+
+
+# key → detached snapshot (or None when nothing is configured); the set_* helpers keep it fresh
+_button_cache: dict[str, ButtonContent | None] = {}
+
+
+async def get_button_content(session: AsyncSession, key: str) -> ButtonContent | None:
+    if key in _button_cache:
+        return _button_cache[key]
+    row = await session.get(ButtonContent, key)
+    snapshot = ButtonContent(key=key, photo_file_id=row.photo_file_id, text=row.text) if row else None
+    _button_cache[key] = snapshot
+    return snapshot
+
+
+async def set_button_photo(session: AsyncSession, key: str, file_id: str | None) -> None:
+    row = await session.get(ButtonContent, key)
+    if row:
+        row.photo_file_id = file_id
+    else:
+        session.add(ButtonContent(key=key, photo_file_id=file_id))
+    await session.commit()
+    _button_cache.pop(key, None)
+
+
+async def set_button_text(session: AsyncSession, key: str, text: str | None) -> None:
+    row = await session.get(ButtonContent, key)
+    if row:
+        row.text = text
+    else:
+        session.add(ButtonContent(key=key, text=text))
+    await session.commit()
+    _button_cache.pop(key, None)
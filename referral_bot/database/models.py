@@ -1,107 +1,256 @@
-from datetime import datetime
-
-from sqlalchemy import BigInteger, Boolean, DateTime, Float, ForeignKey, Integer, String, Text
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-
-
-class Base(DeclarativeBase):
-    pass
-
-
-class User(Base):
-    __tablename__ = "users"
-
-    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
-    username: Mapped[str | None] = mapped_column(String(64), nullable=True)
-    first_name: Mapped[str] = mapped_column(String(128), default="")
-    stars_balance: Mapped[float] = mapped_column(Float, default=0.0)
-    referrals_count: Mapped[int] = mapped_column(Integer, default=0)
-    referrer_id: Mapped[int | None] = mapped_column(BigInteger, ForeignKey("users.user_id"), nullable=True)
-    last_bonus_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-
-
-class BotSettings(Base):
-    __tablename__ = "bot_settings"
-
-    key: Mapped[str] = mapped_column(String(64), primary_key=True)
-    value: Mapped[str] = mapped_column(Text, default="")
-
-
-class PromoCode(Base):
-    __tablename__ = "promo_codes"
-
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    code: Mapped[str] = mapped_column(String(64), unique=True)
-    reward: Mapped[float] = mapped_column(Float, default=0.0)
-    is_random: Mapped[bool] = mapped_column(Boolean, default=False)
-    reward_min: Mapped[float | None] = mapped_column(Float, nullable=True)
-    reward_max: Mapped[float | None] = mapped_column(Float, nullable=True)
-    usage_limit: Mapped[int | None] = mapped_column(Integer, nullable=True)
-    usage_count: Mapped[int] = mapped_column(Integer, default=0)
-    is_active: Mapped[bool] = mapped_column(Boolean, default=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-
-
-class PromoUse(Base):
-    __tablename__ = "promo_uses"
-
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_id"))
-    promo_id: Mapped[int] = mapped_column(Integer, ForeignKey("promo_codes.id"))
-
-
-class Withdrawal(Base):
-    __tablename__ = "withdrawals"
-
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_id"))
-    amount: Mapped[float] = mapped_column(Float)
-    status: Mapped[str] = mapped_column(String(16), default="pending")
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    processed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
-    channel_message_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
-    payments_message_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
-
-
-class Task(Base):
-    __tablename__ = "tasks"
-
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    task_type: Mapped[str] = mapped_column(String(32))
-    title: Mapped[str] = mapped_column(String(256))
-    description: Mapped[str] = mapped_column(Text, default="")
-    reward: Mapped[float] = mapped_column(Float)
-    channel_id: Mapped[str | None] = mapped_column(String(128), nullable=True)
-    target_value: Mapped[int | None] = mapped_column(Integer, nullable=True)
-    is_active: Mapped[bool] = mapped_column(Boolean, default=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-
-
-class TaskCompletion(Base):
-    __tablename__ = "task_completions"
-
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_id"))
-    task_id: Mapped[int] = mapped_column(Integer, ForeignKey("tasks.id"))
-    completed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-
-
-class GameSession(Base):
-    __tablename__ = "game_sessions"
-
-    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_id"))
-    game_type: Mapped[str] = mapped_column(String(32))
-    bet: Mapped[float] = mapped_column(Float)
-    result: Mapped[str] = mapped_column(String(8))
-    payout: Mapped[float] = mapped_column(Float, default=0.0)
-    played_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-
-
-class ButtonContent(Base):
-    __tablename__ = "button_contents"
-
-    key: Mapped[str] = mapped_column(String(64), primary_key=True)
-    photo_file_id: Mapped[str | None] = mapped_column(String(256), nullable=True)
-    text: Mapped[str | None] = mapped_column(Text, nullable=True)
+from datetime import date, datetime
+
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text, func
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class User(Base):
+    __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_referrer_id", "referrer_id"),
+    )
+
+    user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    username: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    first_name: Mapped[str] = mapped_column(String(128), default="")
+    stars_balance: Mapped[float] = mapped_column(Float, default=0.0)
+    referrals_count: Mapped[int] = mapped_column(Integer, default=0)
+    referrer_id: Mapped[int | None] = mapped_column(BigInteger, ForeignKey("users.user_id"), nullable=True)
+    last_bonus_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+# Case-folded usernames for the admin user search (prefix ranges); names go through users_fts
+Index("ix_users_username_lower", func.lower(User.username))
+
+
+class BotSettings(Base):
+    __tablename__ = "bot_settings"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    value: Mapped[str] = mapped_column(Text, default="")
+
+
+class PromoCode(Base):
+    __tablename__ = "promo_codes"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    code: Mapped[str] = mapped_column(String(64), unique=True)
+    reward: Mapped[float] = mapped_column(Float, default=0.0)
+    is_random: Mapped[bool] = mapped_column(Boolean, default=False)
+    reward_min: Mapped[float | None] = mapped_column(Float, nullable=True)
+    reward_max: Mapped[float | None] = mapped_column(Float, nullable=True)
+    usage_limit: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    usage_count: Mapped[int] = mapped_column(Integer, default=0)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class PromoUse(Base):
+    __tablename__ = "promo_uses"
+    __table_args__ = (
+        Index("ux_promo_uses_user_promo", "user_id", "promo_id", unique=True),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_id"))
+    promo_id: Mapped[int] = mapped_column(Integer, ForeignKey("promo_codes.id"))
+
+
+class Withdrawal(Base):
+    __tablename__ = "withdrawals"
+    __table_args__ = (
+        Index("ix_withdrawals_status_created", "status", "created_at"),
+        Index("ix_withdrawals_user_created", "user_id", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_id"))
+    amount: Mapped[float] = mapped_column(Float)
+    status: Mapped[str] = mapped_column(String(16), default="pending")
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    channel_message_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    payments_message_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+
+class Task(Base):
+    __tablename__ = "tasks"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    task_type: Mapped[str] = mapped_column(String(32))
+    title: Mapped[str] = mapped_column(String(256))
+    description: Mapped[str] = mapped_column(Text, default="")
+    reward: Mapped[float] = mapped_column(Float)
+    channel_id: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    target_value: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class TaskCompletion(Base):
+    __tablename__ = "task_completions"
+    __table_args__ = (
+        Index("ux_task_completions_user_task", "user_id", "task_id", unique=True),
+        # keyset walk over one task's completions by services.subscriptions
+        Index("ix_task_completions_task", "task_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_id"))
+    task_id: Mapped[int] = mapped_column(Integer, ForeignKey("tasks.id"))
+    completed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class GameSession(Base):
+    __tablename__ = "game_sessions"
+    __table_args__ = (
+        Index("ix_game_sessions_user_played", "user_id", "played_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_id"))
+    game_type: Mapped[str] = mapped_column(String(32))
+    bet: Mapped[float] = mapped_column(Float)
+    result: Mapped[str] = mapped_column(String(8))
+    payout: Mapped[float] = mapped_column(Float, default=0.0)
+    played_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class ButtonContent(Base):
+    __tablename__ = "button_contents"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    photo_file_id: Mapped[str | None] = mapped_column(String(256), nullable=True)
+    text: Mapped[str | None] = mapped_column(Text, nullable=True)
+
+
+class StatsCounters(Base):
+    """Single-row aggregate counters, maintained in the same transactions that change the source rows."""
+
+    __tablename__ = "stats_counters"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, default=1)
+    users_total: Mapped[int] = mapped_column(Integer, default=0)
+    withdrawals_pending: Mapped[int] = mapped_column(Integer, default=0)
+    withdrawals_approved_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    reconciled_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class DailyRollup(Base):
+    """Per-day metric totals, filled incrementally by services.rollups."""
+
+    __tablename__ = "daily_rollups"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    metric: Mapped[str] = mapped_column(String(32), primary_key=True)
+    dim: Mapped[str] = mapped_column(String(32), primary_key=True, default="")
+    value: Mapped[float] = mapped_column(Float, default=0.0)
+
+
+class ReferralPath(Base):
+    """Referral closure table: one row per (ancestor, descendant) pair at any depth (1 = direct)."""
+
+    __tablename__ = "referral_paths"
+    __table_args__ = (
+        Index("ix_referral_paths_descendant", "descendant_id", "depth"),
+    )
+
+    ancestor_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    descendant_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    depth: Mapped[int] = mapped_column(Integer)
+
+
+class ReferrerFlag(Base):
+    """Referrer flagged by the fraud scorer, with the features behind the flag and held rewards."""
+
+    __tablename__ = "referrer_flags"
+    __table_args__ = (
+        Index("ix_referrer_flags_status_score", "status", "score"),
+    )
+
+    referrer_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    # flagged → cleared | confirmed
+    status: Mapped[str] = mapped_column(String(16), default="flagged")
+    score: Mapped[float] = mapped_column(Float, default=0.0)
+    burst: Mapped[int] = mapped_column(Integer, default=0)
+    idle_share: Mapped[float] = mapped_column(Float, default=0.0)
+    pattern_share: Mapped[float] = mapped_column(Float, default=0.0)
+    held_amount: Mapped[float] = mapped_column(Float, default=0.0)
+    flagged_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    reviewed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+
+class SubscriptionLapse(Base):
+    """User who left the channel of a subscribe task after being paid for it, found by
+    services.subscriptions."""
+
+    __tablename__ = "subscription_lapses"
+    __table_args__ = (
+        Index("ux_subscription_lapses_user_task", "user_id", "task_id", unique=True),
+        Index("ix_subscription_lapses_status_task", "status", "task_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    task_id: Mapped[int] = mapped_column(Integer)
+    # Task reward at detection, the amount a clawback takes back
+    reward: Mapped[float] = mapped_column(Float)
+    # pending (deleted if the user rejoins) → clawed_back | dismissed
+    status: Mapped[str] = mapped_column(String(16), default="pending")
+    detected_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    resolved_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    resolved_by: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+
+
+class OutboxMessage(Base):
+    """Bot API call queued in the transaction that caused it, delivered by services.outbox."""
+
+    __tablename__ = "outbox"
+    __table_args__ = (
+        Index("ix_outbox_status_due", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # send | edit_text | edit_markup
+    kind: Mapped[str] = mapped_column(String(16))
+    chat_id: Mapped[str] = mapped_column(String(64))
+    message_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    text: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # InlineKeyboardMarkup as JSON; None removes the markup on edit_markup
+    reply_markup: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Withdrawal column the sent message id is written to (send), or read from when message_id is unset (edits)
+    withdrawal_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    withdrawal_field: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    # pending → (deleted once delivered) | failed
+    status: Mapped[str] = mapped_column(String(16), default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class BalanceLedger(Base):
+    """Admin balance adjustments (single credits, bulk CSV uploads, subscription clawbacks),
+    one row per applied change."""
+
+    __tablename__ = "balance_ledger"
+    __table_args__ = (
+        Index("ix_balance_ledger_user_created", "user_id", "created_at"),
+        Index("ix_balance_ledger_batch", "batch_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(BigInteger)
+    amount: Mapped[float] = mapped_column(Float)
+    reason: Mapped[str] = mapped_column(String(256), default="")
+    # admin | bulk_csv | clawback
+    source: Mapped[str] = mapped_column(String(16))
+    # Groups the rows of one bulk upload
+    batch_id: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    admin_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -1,16 +1,15 @@
-from handlers import start, earn, bonus, profile, promo, withdraw, tasks, top, games, admin
-
-routers = [
-    start.router,
-    earn.router,
-    bonus.router,
-    profile.router,
-    promo.router,
-    withdraw.router,
-    tasks.router,
-    top.router,
-    games.router,
-    admin.router,
-]
-
-__all__ = ["routers"]
+from handlers import callback_router, start, earn, bonus, profile, promo, withdraw, tasks, top, games, admin
+
+# Every callback query goes through the single callback router; the per-module routers only
+# carry message handlers. earn, bonus, profile, tasks and top are imported to register their
+# callback routes.
+routers = [
+    callback_router.callbacks.router,
+    start.router,
+    promo.router,
+    withdraw.router,
+    games.router,
+    admin.router,
+]
+
+__all__ = ["routers"]
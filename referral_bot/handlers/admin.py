@@ -1,1234 +1,2107 @@
-from datetime import datetime
-from aiogram import Router, Bot
-from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery
-from aiogram.fsm.context import FSMContext
-from aiogram.fsm.state import State, StatesGroup
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-
-from database.models import User, PromoCode, PromoUse, Withdrawal, BotSettings, Task, TaskCompletion
-from handlers.withdraw import build_withdrawal_msg
-from database.engine import set_setting, get_button_content, set_button_photo, set_button_text
-from keyboards.admin import (
-    admin_main_kb, admin_settings_kb, promo_list_kb,
-    promo_actions_kb, promo_reward_type_kb, admin_back_kb,
-    task_management_kb, task_type_kb, task_list_admin_kb, task_actions_kb,
-    games_list_kb, game_detail_kb,
-    BUTTON_KEYS, button_content_list_kb, button_edit_kb,
-)
-from config import config
-
-router = Router()
-
-
-# ─── FSM States ──────────────────────────────────────────────────────────────
-
-class AdminPromoStates(StatesGroup):
-    code = State()
-    reward_type = State()
-    reward_fixed = State()
-    reward_min = State()
-    reward_max = State()
-    usage_limit = State()
-
-
-class AdminCreditStates(StatesGroup):
-    user_id = State()
-    amount = State()
-
-
-class AdminSettingsStates(StatesGroup):
-    referral_reward = State()
-    bonus_cooldown = State()
-    bonus_min = State()
-    bonus_max = State()
-    payments_channel_id = State()
-    payments_channel_url = State()
-
-
-class AdminBroadcastStates(StatesGroup):
-    text = State()
-
-
-class AdminTaskStates(StatesGroup):
-    task_type = State()
-    title = State()
-    description = State()
-    reward = State()
-    channel_id = State()
-    target_value = State()
-
-
-class AdminGameStates(StatesGroup):
-    set_coeff = State()
-    set_coeff1 = State()
-    set_coeff2 = State()
-    set_min_bet = State()
-    set_daily_limit = State()
-
-
-class AdminButtonContentStates(StatesGroup):
-    set_photo = State()
-    set_text = State()
-
-
-# ─── Guard ───────────────────────────────────────────────────────────────────
-
-def is_admin(user_id: int) -> bool:
-    return user_id in config.ADMIN_IDS
-
-
-# ─── Entry ───────────────────────────────────────────────────────────────────
-
-@router.message(Command("admin"))
-async def cmd_admin(message: Message) -> None:
-    if not is_admin(message.from_user.id):
-        return
-    await message.answer("🛠 <b>Админ-панель</b>", parse_mode="HTML", reply_markup=admin_main_kb())
-
-
-@router.callback_query(lambda c: c.data == "admin:main")
-async def cb_admin_main(callback: CallbackQuery) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    await callback.message.edit_text("🛠 <b>Админ-панель</b>", parse_mode="HTML", reply_markup=admin_main_kb())
-    await callback.answer()
-
-
-# ─── Stats ───────────────────────────────────────────────────────────────────
-
-@router.callback_query(lambda c: c.data == "admin:stats")
-async def cb_stats(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-
-    total_users = (await session.execute(select(func.count(User.user_id)))).scalar()
-    total_pending = (await session.execute(
-        select(func.count(Withdrawal.id)).where(Withdrawal.status == "pending")
-    )).scalar()
-    total_approved = (await session.execute(
-        select(func.sum(Withdrawal.amount)).where(Withdrawal.status == "approved")
-    )).scalar() or 0
-
-    await callback.message.edit_text(
-        f"📊 <b>Статистика</b>\n\n"
-        f"👥 Пользователей: <b>{total_users}</b>\n"
-        f"⏳ Заявок в ожидании: <b>{total_pending}</b>\n"
-        f"✅ Выведено всего: <b>{total_approved:.2f} ⭐</b>",
-        parse_mode="HTML",
-        reply_markup=admin_back_kb(),
-    )
-    await callback.answer()
-
-
-# ─── Promo: Add ──────────────────────────────────────────────────────────────
-
-@router.callback_query(lambda c: c.data == "admin:add_promo")
-async def cb_add_promo(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    await state.set_state(AdminPromoStates.code)
-    await callback.message.edit_text("🎟 Введи код промокода (латиница, без пробелов):")
-    await callback.answer()
-
-
-@router.message(AdminPromoStates.code)
-async def msg_promo_code(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    code = message.text.strip().upper()
-    if " " in code:
-        await message.answer("❌ Код не должен содержать пробелы. Попробуй снова:")
-        return
-    existing = (await session.execute(select(PromoCode).where(PromoCode.code == code))).scalar_one_or_none()
-    if existing:
-        await message.answer("❌ Такой код уже существует. Введи другой:")
-        return
-    await state.update_data(code=code)
-    await state.set_state(AdminPromoStates.reward_type)
-    await message.answer("Выбери тип награды:", reply_markup=promo_reward_type_kb())
-
-
-@router.callback_query(lambda c: c.data in ("promo_type:fixed", "promo_type:random"))
-async def cb_promo_type(callback: CallbackQuery, state: FSMContext) -> None:
-    is_random = callback.data == "promo_type:random"
-    await state.update_data(is_random=is_random)
-    if is_random:
-        await state.set_state(AdminPromoStates.reward_min)
-        await callback.message.edit_text("Введи минимальную награду (число):")
-    else:
-        await state.set_state(AdminPromoStates.reward_fixed)
-        await callback.message.edit_text("Введи фиксированную награду (число):")
-    await callback.answer()
-
-
-@router.message(AdminPromoStates.reward_fixed)
-async def msg_promo_fixed(message: Message, state: FSMContext) -> None:
-    try:
-        reward = float(message.text.strip().replace(",", "."))
-    except ValueError:
-        await message.answer("❌ Введи число, например: 5 или 2.5")
-        return
-    await state.update_data(reward=reward)
-    await state.set_state(AdminPromoStates.usage_limit)
-    await message.answer("Лимит использований (0 = безлимитный):")
-
-
-@router.message(AdminPromoStates.reward_min)
-async def msg_promo_min(message: Message, state: FSMContext) -> None:
-    try:
-        reward_min = float(message.text.strip().replace(",", "."))
-    except ValueError:
-        await message.answer("❌ Введи число:")
-        return
-    await state.update_data(reward_min=reward_min)
-    await state.set_state(AdminPromoStates.reward_max)
-    await message.answer("Введи максимальную награду:")
-
-
-@router.message(AdminPromoStates.reward_max)
-async def msg_promo_max(message: Message, state: FSMContext) -> None:
-    data = await state.get_data()
-    try:
-        reward_max = float(message.text.strip().replace(",", "."))
-    except ValueError:
-        await message.answer("❌ Введи число:")
-        return
-    if reward_max <= data["reward_min"]:
-        await message.answer("❌ Максимум должен быть больше минимума:")
-        return
-    await state.update_data(reward_max=reward_max, reward=0.0)
-    await state.set_state(AdminPromoStates.usage_limit)
-    await message.answer("Лимит использований (0 = безлимитный):")
-
-
-@router.message(AdminPromoStates.usage_limit)
-async def msg_promo_limit(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    try:
-        limit_raw = int(message.text.strip())
-    except ValueError:
-        await message.answer("❌ Введи целое число:")
-        return
-    data = await state.get_data()
-    await state.clear()
-
-    promo = PromoCode(
-        code=data["code"],
-        reward=data.get("reward", 0.0),
-        is_random=data.get("is_random", False),
-        reward_min=data.get("reward_min"),
-        reward_max=data.get("reward_max"),
-        usage_limit=limit_raw if limit_raw > 0 else None,
-    )
-    session.add(promo)
-    await session.commit()
-
-    reward_desc = (
-        f"{data.get('reward_min')}–{data.get('reward_max')} ⭐ (случайно)"
-        if data.get("is_random")
-        else f"{data.get('reward', 0):.2f} ⭐"
-    )
-    limit_desc = str(limit_raw) if limit_raw > 0 else "безлимитный"
-
-    await message.answer(
-        f"✅ Промокод создан!\n\n"
-        f"Код: <code>{promo.code}</code>\n"
-        f"Награда: {reward_desc}\n"
-        f"Лимит: {limit_desc}",
-        parse_mode="HTML",
-        reply_markup=admin_main_kb(),
-    )
-
-
-# ─── Promo: List & Actions ───────────────────────────────────────────────────
-
-@router.callback_query(lambda c: c.data == "admin:list_promos")
-async def cb_list_promos(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    promos = (await session.execute(select(PromoCode).order_by(PromoCode.created_at.desc()))).scalars().all()
-    if not promos:
-        await callback.message.edit_text("Промокодов нет.", reply_markup=admin_back_kb())
-        await callback.answer()
-        return
-    await callback.message.edit_text("🎟 <b>Список промокодов:</b>", parse_mode="HTML", reply_markup=promo_list_kb(promos))
-    await callback.answer()
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("admin:promo_info:"))
-async def cb_promo_info(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    promo_id = int(callback.data.split(":")[2])
-    promo = await session.get(PromoCode, promo_id)
-    if not promo:
-        await callback.answer("Промокод не найден.", show_alert=True)
-        return
-
-    reward_desc = (
-        f"{promo.reward_min}–{promo.reward_max} ⭐ (случайно)"
-        if promo.is_random
-        else f"{promo.reward:.2f} ⭐"
-    )
-    limit_desc = str(promo.usage_limit) if promo.usage_limit else "безлимитный"
-    status = "✅ Активен" if promo.is_active else "❌ Неактивен"
-
-    await callback.message.edit_text(
-        f"🎟 <b>{promo.code}</b>\n\n"
-        f"Статус: {status}\n"
-        f"Награда: {reward_desc}\n"
-        f"Лимит: {limit_desc}\n"
-        f"Использований: {promo.usage_count}",
-        parse_mode="HTML",
-        reply_markup=promo_actions_kb(promo.id, promo.is_active),
-    )
-    await callback.answer()
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("admin:promo_toggle:"))
-async def cb_promo_toggle(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    promo_id = int(callback.data.split(":")[2])
-    promo = await session.get(PromoCode, promo_id)
-    if promo:
-        promo.is_active = not promo.is_active
-        await session.commit()
-        await callback.answer("Статус изменён.")
-        await callback.message.edit_reply_markup(reply_markup=promo_actions_kb(promo.id, promo.is_active))
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("admin:promo_delete:"))
-async def cb_promo_delete(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    promo_id = int(callback.data.split(":")[2])
-    promo = await session.get(PromoCode, promo_id)
-    if promo:
-        await session.delete(promo)
-        await session.commit()
-    await callback.answer("Промокод удалён.")
-    promos = (await session.execute(select(PromoCode).order_by(PromoCode.created_at.desc()))).scalars().all()
-    await callback.message.edit_text("🎟 <b>Список промокодов:</b>", parse_mode="HTML", reply_markup=promo_list_kb(promos))
-
-
-# ─── Credit ──────────────────────────────────────────────────────────────────
-
-@router.callback_query(lambda c: c.data == "admin:credit")
-async def cb_credit(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    await state.set_state(AdminCreditStates.user_id)
-    await callback.message.edit_text("💳 Введи Telegram ID пользователя:")
-    await callback.answer()
-
-
-@router.message(AdminCreditStates.user_id)
-async def msg_credit_user(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    try:
-        uid = int(message.text.strip())
-    except ValueError:
-        await message.answer("❌ Введи числовой ID:")
-        return
-    user = await session.get(User, uid)
-    if not user:
-        await message.answer("❌ Пользователь не найден. Введи другой ID:")
-        return
-    await state.update_data(target_user_id=uid)
-    await state.set_state(AdminCreditStates.amount)
-    await message.answer(f"Пользователь: {user.first_name} (@{user.username})\nВведи сумму для начисления:")
-
-
-@router.message(AdminCreditStates.amount)
-async def msg_credit_amount(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    try:
-        amount = float(message.text.strip().replace(",", "."))
-    except ValueError:
-        await message.answer("❌ Введи число:")
-        return
-    data = await state.get_data()
-    await state.clear()
-
-    user = await session.get(User, data["target_user_id"])
-    user.stars_balance += amount
-    await session.commit()
-
-    await message.answer(
-        f"✅ Начислено <b>{amount} ⭐</b> пользователю {user.first_name}.\n"
-        f"Новый баланс: <b>{user.stars_balance:.2f} ⭐</b>",
-        parse_mode="HTML",
-        reply_markup=admin_main_kb(),
-    )
-
-
-# ─── Settings ────────────────────────────────────────────────────────────────
-
-@router.callback_query(lambda c: c.data == "admin:settings")
-async def cb_settings(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-
-    rr = (await session.get(BotSettings, "referral_reward"))
-    bc = (await session.get(BotSettings, "bonus_cooldown_hours"))
-    bmin = (await session.get(BotSettings, "bonus_min"))
-    bmax = (await session.get(BotSettings, "bonus_max"))
-    pch = (await session.get(BotSettings, "payments_channel_id"))
-    pch_url = (await session.get(BotSettings, "payments_channel_url"))
-
-    await callback.message.edit_text(
-        f"⚙️ <b>Настройки</b>\n\n"
-        f"⭐ Награда за реферала: <b>{rr.value if rr else '?'}</b>\n"
-        f"⏱ Кулдаун бонуса: <b>{bc.value if bc else '?'} ч</b>\n"
-        f"🎁 Бонус мин: <b>{bmin.value if bmin else '?'}</b>\n"
-        f"🎁 Бонус макс: <b>{bmax.value if bmax else '?'}</b>\n"
-        f"📢 ID канала выплат: <b>{pch.value if pch and pch.value else 'не задан'}</b>\n"
-        f"🔗 Ссылка канала: <b>{pch_url.value if pch_url and pch_url.value else 'не задана'}</b>",
-        parse_mode="HTML",
-        reply_markup=admin_settings_kb(),
-    )
-    await callback.answer()
-
-
-async def _ask_setting(callback: CallbackQuery, state: FSMContext, state_obj: State, prompt: str) -> None:
-    await state.set_state(state_obj)
-    await callback.message.edit_text(prompt)
-    await callback.answer()
-
-
-@router.callback_query(lambda c: c.data == "settings:referral_reward")
-async def cb_set_rr(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return
-    await _ask_setting(callback, state, AdminSettingsStates.referral_reward, "Введи новую награду за реферала (число):")
-
-
-@router.callback_query(lambda c: c.data == "settings:bonus_cooldown")
-async def cb_set_cooldown(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return
-    await _ask_setting(callback, state, AdminSettingsStates.bonus_cooldown, "Введи кулдаун бонуса в часах (целое):")
-
-
-@router.callback_query(lambda c: c.data == "settings:bonus_min")
-async def cb_set_bmin(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return
-    await _ask_setting(callback, state, AdminSettingsStates.bonus_min, "Введи минимальный бонус (число):")
-
-
-@router.callback_query(lambda c: c.data == "settings:bonus_max")
-async def cb_set_bmax(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return
-    await _ask_setting(callback, state, AdminSettingsStates.bonus_max, "Введи максимальный бонус (число):")
-
-
-@router.callback_query(lambda c: c.data == "settings:payments_channel_id")
-async def cb_set_payments_channel(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return
-    await state.set_state(AdminSettingsStates.payments_channel_id)
-    await callback.message.edit_text(
-        "📢 Введи ID канала выплат:\n"
-        "Примеры: <code>-1001234567890</code> или <code>@mychannel</code>\n\n"
-        "Бот должен быть администратором этого канала.",
-        parse_mode="HTML",
-    )
-    await callback.answer()
-
-
-async def _save_setting(message: Message, state: FSMContext, session: AsyncSession, key: str) -> None:
-    try:
-        val = float(message.text.strip().replace(",", "."))
-    except ValueError:
-        await message.answer("❌ Введи число:")
-        return
-    await state.clear()
-    await set_setting(session, key, str(val))
-    await message.answer(f"✅ Настройка обновлена: <b>{key}</b> = {val}", parse_mode="HTML", reply_markup=admin_main_kb())
-
-
-@router.message(AdminSettingsStates.referral_reward)
-async def msg_set_rr(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    await _save_setting(message, state, session, "referral_reward")
-
-
-@router.message(AdminSettingsStates.bonus_cooldown)
-async def msg_set_cooldown(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    await _save_setting(message, state, session, "bonus_cooldown_hours")
-
-
-@router.message(AdminSettingsStates.bonus_min)
-async def msg_set_bmin(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    await _save_setting(message, state, session, "bonus_min")
-
-
-@router.message(AdminSettingsStates.bonus_max)
-async def msg_set_bmax(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    await _save_setting(message, state, session, "bonus_max")
-
-
-@router.message(AdminSettingsStates.payments_channel_id)
-async def msg_set_payments_channel(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    await state.clear()
-    value = message.text.strip()
-    await set_setting(session, "payments_channel_id", value)
-    await message.answer(
-        f"✅ ID канала выплат установлен: <code>{value}</code>",
-        parse_mode="HTML",
-        reply_markup=admin_main_kb(),
-    )
-
-
-@router.callback_query(lambda c: c.data == "settings:payments_channel_url")
-async def cb_set_payments_channel_url(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return
-    await state.set_state(AdminSettingsStates.payments_channel_url)
-    await callback.message.edit_text(
-        "🔗 Введи публичную ссылку на канал выплат:\n"
-        "Пример: <code>https://t.me/mychannel</code>",
-        parse_mode="HTML",
-    )
-    await callback.answer()
-
-
-@router.message(AdminSettingsStates.payments_channel_url)
-async def msg_set_payments_channel_url(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    await state.clear()
-    value = message.text.strip()
-    await set_setting(session, "payments_channel_url", value)
-    await message.answer(
-        f"✅ Ссылка на канал выплат установлена: <code>{value}</code>",
-        parse_mode="HTML",
-        reply_markup=admin_main_kb(),
-    )
-
-
-# ─── Broadcast ───────────────────────────────────────────────────────────────
-
-@router.callback_query(lambda c: c.data == "admin:broadcast")
-async def cb_broadcast(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    await state.set_state(AdminBroadcastStates.text)
-    await callback.message.edit_text("📢 Введи текст рассылки (HTML поддерживается):")
-    await callback.answer()
-
-
-@router.message(AdminBroadcastStates.text)
-async def msg_broadcast(message: Message, state: FSMContext, session: AsyncSession, bot: Bot) -> None:
-    await state.clear()
-    text = message.text
-
-    users = (await session.execute(select(User.user_id))).scalars().all()
-    sent, failed = 0, 0
-    for uid in users:
-        try:
-            await bot.send_message(uid, text, parse_mode="HTML")
-            sent += 1
-        except Exception:
-            failed += 1
-
-    await message.answer(
-        f"✅ Рассылка завершена.\nДоставлено: <b>{sent}</b>\nОшибок: <b>{failed}</b>",
-        parse_mode="HTML",
-        reply_markup=admin_main_kb(),
-    )
-
-
-# ─── Withdrawal: Approve / Reject (from admin channel) ───────────────────────
-
-@router.callback_query(lambda c: c.data and c.data.startswith("withdrawal:"))
-async def cb_withdrawal_action(callback: CallbackQuery, session: AsyncSession, bot: Bot) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-
-    parts = callback.data.split(":")
-    action, withdrawal_id = parts[1], int(parts[2])
-
-    withdrawal = await session.get(Withdrawal, withdrawal_id)
-    if not withdrawal:
-        return await callback.answer("Заявка не найдена.", show_alert=True)
-    if withdrawal.status != "pending":
-        return await callback.answer(f"Заявка уже обработана: {withdrawal.status}", show_alert=True)
-
-    withdrawal.status = "approved" if action == "approve" else "rejected"
-    withdrawal.processed_at = datetime.utcnow()
-
-    user = await session.get(User, withdrawal.user_id)
-    if action == "reject" and user:
-        user.stars_balance += withdrawal.amount
-
-    await session.commit()
-
-    status_text = "✅ Принята" if action == "approve" else "❌ Отклонена"
-
-    # Update admin channel message (remove buttons, keep text)
-    try:
-        await callback.message.edit_reply_markup(reply_markup=None)
-    except Exception:
-        pass
-    await callback.answer(status_text)
-
-    # Edit payments channel message with updated status
-    uname = user.username if user else "unknown"
-    uid = withdrawal.user_id
-    if withdrawal.payments_message_id:
-        pch = await session.get(BotSettings, "payments_channel_id")
-        if pch and pch.value:
-            try:
-                await bot.edit_message_text(
-                    chat_id=pch.value,
-                    message_id=withdrawal.payments_message_id,
-                    text=build_withdrawal_msg(withdrawal.id, uname, uid, withdrawal.amount, withdrawal.status),
-                    parse_mode="HTML",
-                )
-            except Exception:
-                pass
-
-    # Notify user
-    try:
-        if user:
-            if action == "approve":
-                notify = f"💸 Ваша заявка на вывод <b>{withdrawal.amount:.0f} ⭐</b> одобрена!"
-            else:
-                notify = f"❌ Ваша заявка на вывод <b>{withdrawal.amount:.0f} ⭐</b> отклонена."
-            await bot.send_message(withdrawal.user_id, notify, parse_mode="HTML")
-    except Exception:
-        pass
-
-
-# ─── Tasks: Management ───────────────────────────────────────────────────────
-
-@router.callback_query(lambda c: c.data == "admin:tasks")
-async def cb_admin_tasks(callback: CallbackQuery) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    await callback.message.edit_text(
-        "📋 <b>Управление заданиями</b>",
-        parse_mode="HTML",
-        reply_markup=task_management_kb(),
-    )
-    await callback.answer()
-
-
-@router.callback_query(lambda c: c.data == "admin:list_tasks")
-async def cb_list_tasks(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    tasks = (await session.execute(select(Task).order_by(Task.created_at.desc()))).scalars().all()
-    if not tasks:
-        await callback.message.edit_text("Заданий нет.", reply_markup=task_management_kb())
-        await callback.answer()
-        return
-    await callback.message.edit_text(
-        "📋 <b>Список заданий:</b>",
-        parse_mode="HTML",
-        reply_markup=task_list_admin_kb(tasks),
-    )
-    await callback.answer()
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("admin:task_info:"))
-async def cb_task_info(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    task_id = int(callback.data.split(":")[2])
-    task = await session.get(Task, task_id)
-    if not task:
-        await callback.answer("Задание не найдено.", show_alert=True)
-        return
-
-    completions_count = (await session.execute(
-        select(func.count(TaskCompletion.id)).where(TaskCompletion.task_id == task_id)
-    )).scalar()
-
-    type_label = {"subscribe": "📢 Подписка на канал", "referrals": "👥 Рефералы"}.get(task.task_type, task.task_type)
-    status = "✅ Активно" if task.is_active else "❌ Неактивно"
-
-    extra = ""
-    if task.task_type == "subscribe":
-        extra = f"\nКанал: <code>{task.channel_id}</code>"
-    elif task.task_type == "referrals":
-        extra = f"\nЦель: {task.target_value} рефералов"
-
-    await callback.message.edit_text(
-        f"📌 <b>{task.title}</b>\n\n"
-        f"{task.description}\n\n"
-        f"Тип: {type_label}\n"
-        f"Награда: <b>{task.reward} ⭐</b>\n"
-        f"Статус: {status}\n"
-        f"Выполнений: <b>{completions_count}</b>"
-        f"{extra}",
-        parse_mode="HTML",
-        reply_markup=task_actions_kb(task.id, task.is_active),
-    )
-    await callback.answer()
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("admin:task_toggle:"))
-async def cb_task_toggle(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    task_id = int(callback.data.split(":")[2])
-    task = await session.get(Task, task_id)
-    if task:
-        task.is_active = not task.is_active
-        await session.commit()
-        await callback.answer("Статус изменён.")
-        await callback.message.edit_reply_markup(reply_markup=task_actions_kb(task.id, task.is_active))
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("admin:task_delete:"))
-async def cb_task_delete(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    task_id = int(callback.data.split(":")[2])
-    task = await session.get(Task, task_id)
-    if task:
-        await session.delete(task)
-        await session.commit()
-    await callback.answer("Задание удалено.")
-    tasks = (await session.execute(select(Task).order_by(Task.created_at.desc()))).scalars().all()
-    if not tasks:
-        await callback.message.edit_text("Заданий нет.", reply_markup=task_management_kb())
-    else:
-        await callback.message.edit_text(
-            "📋 <b>Список заданий:</b>",
-            parse_mode="HTML",
-            reply_markup=task_list_admin_kb(tasks),
-        )
-
-
-# ─── Tasks: Add (FSM) ────────────────────────────────────────────────────────
-
-@router.callback_query(lambda c: c.data == "admin:add_task")
-async def cb_add_task(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    await state.set_state(AdminTaskStates.task_type)
-    await callback.message.edit_text("📋 Выбери тип задания:", reply_markup=task_type_kb())
-    await callback.answer()
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("task_type:"))
-async def cb_task_type_chosen(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    task_type = callback.data.split(":")[1]
-    await state.update_data(task_type=task_type)
-    await state.set_state(AdminTaskStates.title)
-    await callback.message.edit_text("✏️ Введи название задания:")
-    await callback.answer()
-
-
-@router.message(AdminTaskStates.title)
-async def msg_task_title(message: Message, state: FSMContext) -> None:
-    await state.update_data(title=message.text.strip())
-    await state.set_state(AdminTaskStates.description)
-    await message.answer("📝 Введи описание задания:")
-
-
-@router.message(AdminTaskStates.description)
-async def msg_task_description(message: Message, state: FSMContext) -> None:
-    await state.update_data(description=message.text.strip())
-    await state.set_state(AdminTaskStates.reward)
-    await message.answer("💰 Введи награду (число, например: 5 или 2.5):")
-
-
-@router.message(AdminTaskStates.reward)
-async def msg_task_reward(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    try:
-        reward = float(message.text.strip().replace(",", "."))
-    except ValueError:
-        await message.answer("❌ Введи число:")
-        return
-    data = await state.get_data()
-    await state.update_data(reward=reward)
-
-    if data["task_type"] == "subscribe":
-        await state.set_state(AdminTaskStates.channel_id)
-        await message.answer(
-            "📢 Введи ID или username канала:\n"
-            "Примеры: <code>@mychannel</code> или <code>-1001234567890</code>\n\n"
-            "<b>Важно:</b> бот должен быть администратором канала для проверки подписки.",
-            parse_mode="HTML",
-        )
-    elif data["task_type"] == "referrals":
-        await state.set_state(AdminTaskStates.target_value)
-        await message.answer("👥 Введи необходимое количество рефералов (целое число):")
-    else:
-        await _save_task(message, state, session)
-
-
-@router.message(AdminTaskStates.channel_id)
-async def msg_task_channel(message: Message, state: FSMContext, session: AsyncSession, bot: Bot) -> None:
-    channel_id = message.text.strip()
-
-    # Verify bot is an admin of the channel before saving the task
-    try:
-        bot_me = await bot.get_me()
-        member = await bot.get_chat_member(channel_id, bot_me.id)
-        if member.status not in ("administrator", "creator"):
-            await message.answer(
-                "❌ <b>Бот не является администратором канала.</b>\n\n"
-                "Назначьте бота администратором с правом просмотра участников и повторите попытку.",
-                parse_mode="HTML",
-            )
-            return
-    except Exception as e:
-        await message.answer(
-            f"❌ <b>Не удалось получить доступ к каналу</b> <code>{channel_id}</code>\n\n"
-            "Убедитесь, что:\n"
-            "• Бот добавлен в канал\n"
-            "• Бот назначен администратором\n"
-            "• ID канала введён верно (например: <code>@mychannel</code> или <code>-1001234567890</code>)",
-            parse_mode="HTML",
-        )
-        import logging
-        logging.getLogger(__name__).warning("Channel access check failed for %s: %s", channel_id, e)
-        return
-
-    await state.update_data(channel_id=channel_id)
-    await _save_task(message, state, session)
-
-
-@router.message(AdminTaskStates.target_value)
-async def msg_task_target(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    try:
-        target = int(message.text.strip())
-    except ValueError:
-        await message.answer("❌ Введи целое число:")
-        return
-    await state.update_data(target_value=target)
-    await _save_task(message, state, session)
-
-
-async def _save_task(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    data = await state.get_data()
-    await state.clear()
-
-    task = Task(
-        task_type=data["task_type"],
-        title=data["title"],
-        description=data["description"],
-        reward=data["reward"],
-        channel_id=data.get("channel_id"),
-        target_value=data.get("target_value"),
-    )
-    session.add(task)
-    await session.commit()
-
-    type_label = {"subscribe": "📢 Подписка на канал", "referrals": "👥 Рефералы"}.get(data["task_type"], data["task_type"])
-    extra = ""
-    if data.get("channel_id"):
-        extra = f"\nКанал: <code>{data['channel_id']}</code>"
-    elif data.get("target_value"):
-        extra = f"\nЦель: {data['target_value']} рефералов"
-
-    await message.answer(
-        f"✅ Задание создано!\n\n"
-        f"<b>{data['title']}</b>\n"
-        f"Тип: {type_label}\n"
-        f"Награда: <b>{data['reward']} ⭐</b>"
-        f"{extra}",
-        parse_mode="HTML",
-        reply_markup=admin_main_kb(),
-    )
-
-
-# ─── Games: Management ────────────────────────────────────────────────────────
-
-_GAME_LABELS_ADMIN = {
-    "football":   "⚽ Футбол",
-    "basketball": "🏀 Баскетбол",
-    "bowling":    "🎳 Боулинг",
-    "dice":       "🎲 Кубики",
-    "slots":      "🎰 Слоты",
-}
-_GAME_TYPES_ADMIN = ["football", "basketball", "bowling", "dice", "slots"]
-
-
-async def _get_game_float(session: AsyncSession, key: str, default: float) -> float:
-    row = await session.get(BotSettings, key)
-    if row:
-        try:
-            return float(row.value)
-        except ValueError:
-            pass
-    return default
-
-
-@router.callback_query(lambda c: c.data == "admin:games")
-async def cb_admin_games(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-
-    statuses = {}
-    for game in _GAME_TYPES_ADMIN:
-        row = await session.get(BotSettings, f"game_{game}_enabled")
-        statuses[game] = (row.value == "1") if row else True
-
-    await callback.message.edit_text(
-        "🎮 <b>Управление играми</b>\n\nВыбери игру для настройки:",
-        parse_mode="HTML",
-        reply_markup=games_list_kb(statuses),
-    )
-    await callback.answer()
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("agame:info:"))
-async def cb_admin_game_info(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-
-    game_type = callback.data.split(":")[2]
-    label = _GAME_LABELS_ADMIN.get(game_type, game_type)
-
-    enabled_row = await session.get(BotSettings, f"game_{game_type}_enabled")
-    is_enabled = (enabled_row.value == "1") if enabled_row else True
-    min_bet = await _get_game_float(session, f"game_{game_type}_min_bet", 1.0)
-    daily_limit_row = await session.get(BotSettings, f"game_{game_type}_daily_limit")
-    daily_limit = int(daily_limit_row.value) if daily_limit_row else 0
-
-    if game_type == "slots":
-        c1 = await _get_game_float(session, "game_slots_coeff1", 5.0)
-        c2 = await _get_game_float(session, "game_slots_coeff2", 2.0)
-        coeff_line = f"📈 Коэф. Tier 1 (1–3): <b>x{c1}</b>\n📈 Коэф. Tier 2 (4–10): <b>x{c2}</b>"
-    else:
-        coeff = await _get_game_float(session, f"game_{game_type}_coeff", 1.0)
-        coeff_line = f"📈 Коэффициент: <b>x{coeff}</b>"
-
-    status_text = "✅ Включена" if is_enabled else "❌ Отключена"
-    limit_text = str(daily_limit) if daily_limit > 0 else "∞ (без лимита)"
-
-    await callback.message.edit_text(
-        f"🎮 <b>{label}</b>\n\n"
-        f"Статус: {status_text}\n"
-        f"{coeff_line}\n"
-        f"💰 Мин. ставка: <b>{min_bet:.0f} ⭐</b>\n"
-        f"🔢 Лимит в день: <b>{limit_text}</b>",
-        parse_mode="HTML",
-        reply_markup=game_detail_kb(game_type, is_enabled),
-    )
-    await callback.answer()
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("agame:toggle:"))
-async def cb_admin_game_toggle(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-
-    game_type = callback.data.split(":")[2]
-    key = f"game_{game_type}_enabled"
-    row = await session.get(BotSettings, key)
-    new_val = "0" if (row and row.value == "1") else "1"
-    await set_setting(session, key, new_val)
-
-    await callback.answer("Статус изменён.")
-    # Refresh info page
-    callback.data = f"agame:info:{game_type}"
-    await cb_admin_game_info(callback, session)
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("agame:coeff:"))
-async def cb_admin_game_coeff(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    game_type = callback.data.split(":")[2]
-    await state.set_state(AdminGameStates.set_coeff)
-    await state.update_data(game_type=game_type)
-    await callback.message.edit_text(
-        f"📈 Введи новый коэффициент для {_GAME_LABELS_ADMIN[game_type]} (например: 3.0):"
-    )
-    await callback.answer()
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("agame:coeff1:"))
-async def cb_admin_game_coeff1(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    await state.set_state(AdminGameStates.set_coeff1)
-    await state.update_data(game_type="slots")
-    await callback.message.edit_text("📈 Введи коэффициент Tier 1 🎰 (значения 1–3), например: 5.0:")
-    await callback.answer()
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("agame:coeff2:"))
-async def cb_admin_game_coeff2(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    await state.set_state(AdminGameStates.set_coeff2)
-    await state.update_data(game_type="slots")
-    await callback.message.edit_text("📈 Введи коэффициент Tier 2 🎰 (значения 4–10), например: 2.0:")
-    await callback.answer()
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("agame:min_bet:"))
-async def cb_admin_game_min_bet(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    game_type = callback.data.split(":")[2]
-    await state.set_state(AdminGameStates.set_min_bet)
-    await state.update_data(game_type=game_type)
-    await callback.message.edit_text(f"💰 Введи минимальную ставку для {_GAME_LABELS_ADMIN[game_type]} (например: 1):")
-    await callback.answer()
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("agame:daily_limit:"))
-async def cb_admin_game_daily_limit(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    game_type = callback.data.split(":")[2]
-    await state.set_state(AdminGameStates.set_daily_limit)
-    await state.update_data(game_type=game_type)
-    await callback.message.edit_text(
-        f"🔢 Введи лимит игр в день для {_GAME_LABELS_ADMIN[game_type]}:\n(0 = без ограничений)"
-    )
-    await callback.answer()
-
-
-@router.message(AdminGameStates.set_coeff)
-async def msg_admin_game_coeff(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    try:
-        val = float(message.text.strip().replace(",", "."))
-        if val <= 0:
-            raise ValueError
-    except ValueError:
-        await message.answer("❌ Введи положительное число:")
-        return
-    data = await state.get_data()
-    await state.clear()
-    game_type = data["game_type"]
-    await set_setting(session, f"game_{game_type}_coeff", str(val))
-    await message.answer(
-        f"✅ Коэффициент {_GAME_LABELS_ADMIN[game_type]} установлен: <b>x{val}</b>",
-        parse_mode="HTML",
-        reply_markup=admin_main_kb(),
-    )
-
-
-@router.message(AdminGameStates.set_coeff1)
-async def msg_admin_game_coeff1(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    try:
-        val = float(message.text.strip().replace(",", "."))
-        if val <= 0:
-            raise ValueError
-    except ValueError:
-        await message.answer("❌ Введи положительное число:")
-        return
-    await state.clear()
-    await set_setting(session, "game_slots_coeff1", str(val))
-    await message.answer(
-        f"✅ Коэффициент Tier 1 🎰 установлен: <b>x{val}</b>",
-        parse_mode="HTML",
-        reply_markup=admin_main_kb(),
-    )
-
-
-@router.message(AdminGameStates.set_coeff2)
-async def msg_admin_game_coeff2(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    try:
-        val = float(message.text.strip().replace(",", "."))
-        if val <= 0:
-            raise ValueError
-    except ValueError:
-        await message.answer("❌ Введи положительное число:")
-        return
-    await state.clear()
-    await set_setting(session, "game_slots_coeff2", str(val))
-    await message.answer(
-        f"✅ Коэффициент Tier 2 🎰 установлен: <b>x{val}</b>",
-        parse_mode="HTML",
-        reply_markup=admin_main_kb(),
-    )
-
-
-@router.message(AdminGameStates.set_min_bet)
-async def msg_admin_game_min_bet(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    try:
-        val = float(message.text.strip().replace(",", "."))
-        if val <= 0:
-            raise ValueError
-    except ValueError:
-        await message.answer("❌ Введи положительное число:")
-        return
-    data = await state.get_data()
-    await state.clear()
-    game_type = data["game_type"]
-    await set_setting(session, f"game_{game_type}_min_bet", str(val))
-    await message.answer(
-        f"✅ Мин. ставка {_GAME_LABELS_ADMIN[game_type]}: <b>{val:.0f} ⭐</b>",
-        parse_mode="HTML",
-        reply_markup=admin_main_kb(),
-    )
-
-
-@router.message(AdminGameStates.set_daily_limit)
-async def msg_admin_game_daily_limit(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    try:
-        val = int(message.text.strip())
-        if val < 0:
-            raise ValueError
-    except ValueError:
-        await message.answer("❌ Введи целое неотрицательное число (0 = без лимита):")
-        return
-    data = await state.get_data()
-    await state.clear()
-    game_type = data["game_type"]
-    await set_setting(session, f"game_{game_type}_daily_limit", str(val))
-    limit_text = str(val) if val > 0 else "∞ (без лимита)"
-    await message.answer(
-        f"✅ Лимит в день {_GAME_LABELS_ADMIN[game_type]}: <b>{limit_text}</b>",
-        parse_mode="HTML",
-        reply_markup=admin_main_kb(),
-    )
-
-
-# ─── Button Content Management ────────────────────────────────────────────────
-
-async def _show_button_content_list(target, session: AsyncSession) -> None:
-    contents = {}
-    for key in BUTTON_KEYS:
-        row = await get_button_content(session, key)
-        contents[key] = bool(row and (row.photo_file_id or row.text))
-
-    text = (
-        "🖼 <b>Фото и текст кнопок</b>\n\n"
-        "🖼 — настроено  |  ⬜ — пусто\n\n"
-        "Нажми на кнопку, чтобы настроить фото и текст для неё:"
-    )
-    if isinstance(target, CallbackQuery):
-        await target.message.edit_text(text, parse_mode="HTML", reply_markup=button_content_list_kb(contents))
-        await target.answer()
-    else:
-        await target.answer(text, parse_mode="HTML", reply_markup=button_content_list_kb(contents))
-
-
-@router.callback_query(lambda c: c.data == "admin:button_content")
-async def cb_button_content(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    await _show_button_content_list(callback, session)
-
-
-async def _show_button_edit(target, session: AsyncSession, button_key: str) -> None:
-    label = BUTTON_KEYS.get(button_key, button_key)
-    row = await get_button_content(session, button_key)
-    has_photo = bool(row and row.photo_file_id)
-    has_text = bool(row and row.text)
-
-    photo_status = "✅ Установлено" if has_photo else "❌ Не установлено"
-    text_status = f"✅ Установлен ({len(row.text)} симв.)" if has_text else "❌ Не установлен"
-
-    info = (
-        f"🖼 <b>{label}</b>\n\n"
-        f"Фото: {photo_status}\n"
-        f"Текст: {text_status}"
-    )
-
-    send = target.message.edit_text if isinstance(target, CallbackQuery) else target.answer
-    kb = button_edit_kb(button_key, has_photo, has_text)
-    await send(info, parse_mode="HTML", reply_markup=kb)
-    if isinstance(target, CallbackQuery):
-        await target.answer()
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("admin:btn_edit:"))
-async def cb_btn_edit(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    button_key = callback.data[len("admin:btn_edit:"):]
-    if button_key not in BUTTON_KEYS:
-        return await callback.answer("Кнопка не найдена.", show_alert=True)
-    await _show_button_edit(callback, session, button_key)
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("admin:btn_set_photo:"))
-async def cb_btn_set_photo(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    button_key = callback.data[len("admin:btn_set_photo:"):]
-    await state.set_state(AdminButtonContentStates.set_photo)
-    await state.update_data(button_key=button_key)
-    await callback.message.edit_text(
-        f"🖼 Отправь фото для кнопки <b>{BUTTON_KEYS.get(button_key, button_key)}</b>:\n\n"
-        "Просто пришли изображение в этот чат.",
-        parse_mode="HTML",
-    )
-    await callback.answer()
-
-
-@router.message(AdminButtonContentStates.set_photo)
-async def msg_btn_set_photo(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    if not message.photo:
-        await message.answer("❌ Пришли именно фото (изображение), а не файл или текст.")
-        return
-    data = await state.get_data()
-    await state.clear()
-    button_key = data["button_key"]
-    file_id = message.photo[-1].file_id
-    await set_button_photo(session, button_key, file_id)
-    await message.answer(
-        f"✅ Фото для кнопки <b>{BUTTON_KEYS.get(button_key, button_key)}</b> установлено!",
-        parse_mode="HTML",
-        reply_markup=button_edit_kb(
-            button_key,
-            has_photo=True,
-            has_text=bool((await get_button_content(session, button_key)) and
-                          (await get_button_content(session, button_key)).text),
-        ),
-    )
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("admin:btn_set_text:"))
-async def cb_btn_set_text(callback: CallbackQuery, state: FSMContext) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    button_key = callback.data[len("admin:btn_set_text:"):]
-    await state.set_state(AdminButtonContentStates.set_text)
-    await state.update_data(button_key=button_key)
-    await callback.message.edit_text(
-        f"📝 Введи текст для кнопки <b>{BUTTON_KEYS.get(button_key, button_key)}</b>:\n\n"
-        "Поддерживается HTML-разметка: <b>жирный</b>, <i>курсив</i>, <code>моноширинный</code>.",
-        parse_mode="HTML",
-    )
-    await callback.answer()
-
-
-@router.message(AdminButtonContentStates.set_text)
-async def msg_btn_set_text(message: Message, state: FSMContext, session: AsyncSession) -> None:
-    data = await state.get_data()
-    await state.clear()
-    button_key = data["button_key"]
-    await set_button_text(session, button_key, message.text or message.caption or "")
-    row = await get_button_content(session, button_key)
-    await message.answer(
-        f"✅ Текст для кнопки <b>{BUTTON_KEYS.get(button_key, button_key)}</b> установлен!",
-        parse_mode="HTML",
-        reply_markup=button_edit_kb(
-            button_key,
-            has_photo=bool(row and row.photo_file_id),
-            has_text=True,
-        ),
-    )
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("admin:btn_del_photo:"))
-async def cb_btn_del_photo(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    button_key = callback.data[len("admin:btn_del_photo:"):]
-    await set_button_photo(session, button_key, None)
-    await callback.answer("Фото удалено.")
-    await _show_button_edit(callback, session, button_key)
-
-
-@router.callback_query(lambda c: c.data and c.data.startswith("admin:btn_del_text:"))
-async def cb_btn_del_text(callback: CallbackQuery, session: AsyncSession) -> None:
-    if not is_admin(callback.from_user.id):
-        return await callback.answer("Нет доступа.", show_alert=True)
-    button_key = callback.data[len("admin:btn_del_text:"):]
-    await set_button_text(session, button_key, None)
-    await callback.answer("Текст удалён.")
-    await _show_button_edit(callback, session, button_key)
+import asyncio
+import html
+import io
+from datetime import datetime
+from aiogram import Router, Bot
+from aiogram.filters import Command
+from aiogram.types import Message, CallbackQuery, BufferedInputFile, InlineKeyboardMarkup
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, delete
+
+from database.models import (
+    User, PromoCode, PromoUse, Withdrawal, BotSettings, Task, TaskCompletion, ReferrerFlag, BalanceLedger,
+    SubscriptionLapse,
+)
+from handlers.callback_router import callbacks
+from database.engine import set_setting, get_button_content, set_button_photo, set_button_text
+from database.counters import bump_counters, get_counters, reconcile_counters
+from keyboards.admin import (
+    admin_main_kb, admin_settings_kb, promo_list_kb,
+    promo_actions_kb, promo_reward_type_kb, admin_back_kb, admin_stats_kb,
+    admin_trends_kb, TREND_PERIODS, export_kb, bulk_promo_mode_kb, bulk_promo_type_kb,
+    fraud_list_kb, fraud_actions_kb, withdrawal_queue_kb, withdrawal_queue_confirm_kb,
+    user_search_results_kb, user_card_kb, credit_mode_kb, credit_bulk_confirm_kb,
+    task_management_kb, task_type_kb, task_list_admin_kb, task_actions_kb, lapses_kb, lapses_confirm_kb,
+    games_list_kb, game_detail_kb, game_sim_kb,
+    BUTTON_KEYS, button_content_list_kb, button_edit_kb, jobs_kb,
+)
+from services.rollups import load_trends
+from services.fraud import review_flag
+from services.game_monitor import WINDOWS, game_monitor
+from services.games import load_coeffs
+from services.rtp import RUIN_BANKROLL, RUIN_HORIZON, run_simulation
+from services.scheduler import scheduler
+from services.subscriptions import subscription_audit
+from services.task_cache import task_cache
+from services.balance import (
+    BULK_MAX_ROWS, apply_adjustments, parse_adjustments_file, rejected_report,
+)
+from services.user_search import load_user_card, search_users
+from services.withdrawals import pending_ids, pending_page, pending_totals, review_withdrawals
+from services.export import EXPORT_TABLES, EXPORT_FORMATS, run_export_job
+from services.promo import BULK_MAX_CODES, bulk_generate_codes, bulk_insert_codes, parse_codes_file, promo_index
+from config import config
+
+router = Router()
+
+
+# ─── FSM States ──────────────────────────────────────────────────────────────
+
+class AdminPromoStates(StatesGroup):
+    code = State()
+    reward_type = State()
+    reward_fixed = State()
+    reward_min = State()
+    reward_max = State()
+    usage_limit = State()
+
+
+class AdminBulkPromoStates(StatesGroup):
+    count = State()
+    upload = State()
+    reward_type = State()
+    reward_fixed = State()
+    reward_min = State()
+    reward_max = State()
+    usage_limit = State()
+
+
+class AdminCreditStates(StatesGroup):
+    user_id = State()
+    amount = State()
+    bulk_upload = State()
+    bulk_confirm = State()
+
+
+class AdminUserSearchStates(StatesGroup):
+    query = State()
+
+
+class AdminSettingsStates(StatesGroup):
+    referral_reward = State()
+    referral_reward_l2 = State()
+    referral_reward_l3 = State()
+    bonus_cooldown = State()
+    bonus_min = State()
+    bonus_max = State()
+    payments_channel_id = State()
+    payments_channel_url = State()
+
+
+class AdminBroadcastStates(StatesGroup):
+    text = State()
+
+
+class AdminTaskStates(StatesGroup):
+    task_type = State()
+    title = State()
+    description = State()
+    reward = State()
+    channel_id = State()
+    target_value = State()
+
+
+class AdminGameStates(StatesGroup):
+    set_coeff = State()
+    set_coeff1 = State()
+    set_coeff2 = State()
+    set_min_bet = State()
+    set_daily_limit = State()
+
+
+class AdminButtonContentStates(StatesGroup):
+    set_photo = State()
+    set_text = State()
+
+
+# ─── Guard ───────────────────────────────────────────────────────────────────
+
+def is_admin(user_id: int) -> bool:
+    return user_id in config.ADMIN_IDS
+
+
+# ─── Entry ───────────────────────────────────────────────────────────────────
+
+@router.message(Command("admin"))
+async def cmd_admin(message: Message) -> None:
+    if not is_admin(message.from_user.id):
+        return
+    await message.answer("🛠 <b>Админ-панель</b>", parse_mode="HTML", reply_markup=admin_main_kb())
+
+
+@callbacks("admin:main")
+async def cb_admin_main(callback: CallbackQuery) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await callback.message.edit_text("🛠 <b>Админ-панель</b>", parse_mode="HTML", reply_markup=admin_main_kb())
+    await callback.answer()
+
+
+# ─── Stats ───────────────────────────────────────────────────────────────────
+
+def _stats_text(counters) -> str:
+    return (
+        f"📊 <b>Статистика</b>\n\n"
+        f"👥 Пользователей: <b>{counters.users_total}</b>\n"
+        f"⏳ Заявок в ожидании: <b>{counters.withdrawals_pending}</b>\n"
+        f"✅ Выведено всего: <b>{counters.withdrawals_approved_sum:.2f} ⭐</b>"
+    )
+
+
+@callbacks("admin:stats")
+async def cb_stats(callback: CallbackQuery, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+
+    counters = await get_counters(session)
+    await callback.message.edit_text(
+        _stats_text(counters),
+        parse_mode="HTML",
+        reply_markup=admin_stats_kb(),
+    )
+    await callback.answer()
+
+
+@callbacks("admin:stats_reconcile")
+async def cb_stats_reconcile(callback: CallbackQuery, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+
+    drift: dict[str, tuple[float, float]] = {}
+    counters = await reconcile_counters(session, drift)
+    if drift:
+        lines = [f"• {key}: {stored:g} → {actual:g}" for key, (stored, actual) in drift.items()]
+        report = "⚠️ <b>Найдено расхождение:</b>\n" + "\n".join(lines)
+    else:
+        report = "✅ Счётчики сходятся."
+
+    await callback.message.edit_text(
+        f"{_stats_text(counters)}\n\n{report}",
+        parse_mode="HTML",
+        reply_markup=admin_stats_kb(),
+    )
+    await callback.answer()
+
+
+# ─── Trends ──────────────────────────────────────────────────────────────────
+
+_SPARK_BARS = "▁▂▃▄▅▆▇█"
+
+
+def _sparkline(values: list[float], width: int = 30) -> str:
+    if not values:
+        return ""
+    # Squash long periods into `width` buckets so the line fits a phone screen
+    step = max(1, -(-len(values) // width))
+    buckets = [sum(values[i:i + step]) for i in range(0, len(values), step)]
+    top = max(buckets)
+    if top <= 0:
+        return _SPARK_BARS[0] * len(buckets)
+    return "".join(_SPARK_BARS[min(7, int(v / top * 7.999))] for v in buckets)
+
+
+@callbacks("admin:trends:{days:int}")
+async def cb_trends(callback: CallbackQuery, days: int, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    if days not in TREND_PERIODS:
+        return await callback.answer()
+
+    t = await load_trends(session, days, series=("new_users", "games_wagered"))
+
+    new_users = t.total("new_users")
+    referred = t.total("referral_conversions")
+    ref_share = f" ({referred / new_users:.0%})" if new_users else ""
+    lines = [
+        f"📈 <b>Тренды за {days} дн.</b>\n",
+        f"👥 Новые пользователи: <b>{new_users:.0f}</b>",
+        f"<code>{_sparkline(t.daily['new_users'])}</code>",
+        f"🔗 По реф. ссылке: <b>{referred:.0f}</b>{ref_share}",
+        f"🎁 Бонусов: <b>{t.total('bonus_claims'):.0f}</b> ({t.total('bonus_amount'):.2f} ⭐)",
+        "",
+        "🎮 <b>Игры</b>",
+        f"<code>{_sparkline(t.daily['games_wagered'])}</code>",
+    ]
+    for game in _GAME_TYPES_ADMIN:
+        played = t.total("games_played", game)
+        if not played:
+            continue
+        wagered = t.total("games_wagered", game)
+        payout = t.total("games_payout", game)
+        rtp = f"{payout / wagered:.1%}" if wagered else "—"
+        lines.append(
+            f"{_GAME_LABELS_ADMIN[game]}: {played:.0f} игр, "
+            f"ставки {wagered:.0f} ⭐, выплаты {payout:.0f} ⭐, RTP <b>{rtp}</b>"
+        )
+    lines += [
+        "",
+        "💸 <b>Выводы</b>",
+        f"Создано: {t.total('withdrawals_count', 'created'):.0f} ({t.total('withdrawals_amount', 'created'):.0f} ⭐)",
+        f"Одобрено: {t.total('withdrawals_count', 'approved'):.0f} ({t.total('withdrawals_amount', 'approved'):.0f} ⭐)",
+        f"Отклонено: {t.total('withdrawals_count', 'rejected'):.0f} ({t.total('withdrawals_amount', 'rejected'):.0f} ⭐)",
+    ]
+    if t.updated_at:
+        lines.append(f"\n<i>Обновлено: {t.updated_at:%d.%m %H:%M} UTC</i>")
+
+    await callback.message.edit_text("\n".join(lines), parse_mode="HTML", reply_markup=admin_trends_kb(days))
+    await callback.answer()
+
+
+# ─── Referral fraud review ───────────────────────────────────────────────────
+
+async def _show_fraud_list(callback: CallbackQuery, session: AsyncSession) -> None:
+    flags = (await session.execute(
+        select(ReferrerFlag)
+        .where(ReferrerFlag.status == "flagged")
+        .order_by(ReferrerFlag.score.desc())
+        .limit(30)
+    )).scalars().all()
+    hold = "включено" if config.FRAUD_HOLD_REWARDS else "выключено"
+    text = (
+        f"🚩 <b>Подозрительные рефоводы</b>\n\n"
+        f"На проверке: <b>{len(flags)}</b>\n"
+        f"Удержание наград: {hold}"
+    )
+    await callback.message.edit_text(text, parse_mode="HTML", reply_markup=fraud_list_kb(flags))
+
+
+@callbacks("admin:fraud")
+async def cb_fraud_list(callback: CallbackQuery, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await _show_fraud_list(callback, session)
+    await callback.answer()
+
+
+@callbacks("admin:fraud_info:{referrer_id:int}")
+async def cb_fraud_info(callback: CallbackQuery, referrer_id: int, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    flag = await session.get(ReferrerFlag, referrer_id)
+    user = await session.get(User, referrer_id)
+    if not flag:
+        return await callback.answer("Не найдено.", show_alert=True)
+    uname = f"@{user.username}" if user and user.username else "—"
+    await callback.message.edit_text(
+        f"🚩 <b>Рефовод {referrer_id}</b> {uname}\n\n"
+        f"Оценка: <b>{flag.score:.2f}</b>\n"
+        f"Регистраций за 10 мин: <b>{flag.burst}</b>\n"
+        f"Неактивных рефералов: <b>{flag.idle_share:.0%}</b>\n"
+        f"Шаблонные имена: <b>{flag.pattern_share:.0%}</b>\n"
+        f"Всего рефералов: <b>{user.referrals_count if user else 0}</b>\n"
+        f"Удержано наград: <b>{flag.held_amount:.2f} ⭐</b>\n"
+        f"Отмечен: {flag.flagged_at:%d.%m %H:%M} UTC",
+        parse_mode="HTML",
+        reply_markup=fraud_actions_kb(referrer_id),
+    )
+    await callback.answer()
+
+
+@callbacks("admin:{action:fraud_clear|fraud_confirm}:{referrer_id:int}")
+async def cb_fraud_review(callback: CallbackQuery, action: str, referrer_id: int, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    confirm = action == "fraud_confirm"
+    flag = await review_flag(session, referrer_id, confirm)
+    if flag is None:
+        return await callback.answer("Не найдено.", show_alert=True)
+    await callback.answer("Отмечен как фрод." if confirm else "Отмечен как чистый, награды выплачены.")
+    await _show_fraud_list(callback, session)
+
+
+# ─── Promo: Add ──────────────────────────────────────────────────────────────
+
+@callbacks("admin:add_promo")
+async def cb_add_promo(callback: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await state.set_state(AdminPromoStates.code)
+    await callback.message.edit_text("🎟 Введи код промокода (латиница, без пробелов):")
+    await callback.answer()
+
+
+@router.message(AdminPromoStates.code)
+async def msg_promo_code(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    code = message.text.strip().upper()
+    if " " in code:
+        await message.answer("❌ Код не должен содержать пробелы. Попробуй снова:")
+        return
+    existing = (await session.execute(select(PromoCode).where(PromoCode.code == code))).scalar_one_or_none()
+    if existing:
+        await message.answer("❌ Такой код уже существует. Введи другой:")
+        return
+    await state.update_data(code=code)
+    await state.set_state(AdminPromoStates.reward_type)
+    await message.answer("Выбери тип награды:", reply_markup=promo_reward_type_kb())
+
+
+@callbacks("promo_type:{reward_type:fixed|random}")
+async def cb_promo_type(callback: CallbackQuery, reward_type: str, state: FSMContext) -> None:
+    is_random = reward_type == "random"
+    await state.update_data(is_random=is_random)
+    if is_random:
+        await state.set_state(AdminPromoStates.reward_min)
+        await callback.message.edit_text("Введи минимальную награду (число):")
+    else:
+        await state.set_state(AdminPromoStates.reward_fixed)
+        await callback.message.edit_text("Введи фиксированную награду (число):")
+    await callback.answer()
+
+
+@router.message(AdminPromoStates.reward_fixed)
+async def msg_promo_fixed(message: Message, state: FSMContext) -> None:
+    try:
+        reward = float(message.text.strip().replace(",", "."))
+    except ValueError:
+        await message.answer("❌ Введи число, например: 5 или 2.5")
+        return
+    await state.update_data(reward=reward)
+    await state.set_state(AdminPromoStates.usage_limit)
+    await message.answer("Лимит использований (0 = безлимитный):")
+
+
+@router.message(AdminPromoStates.reward_min)
+async def msg_promo_min(message: Message, state: FSMContext) -> None:
+    try:
+        reward_min = float(message.text.strip().replace(",", "."))
+    except ValueError:
+        await message.answer("❌ Введи число:")
+        return
+    await state.update_data(reward_min=reward_min)
+    await state.set_state(AdminPromoStates.reward_max)
+    await message.answer("Введи максимальную награду:")
+
+
+@router.message(AdminPromoStates.reward_max)
+async def msg_promo_max(message: Message, state: FSMContext) -> None:
+    data = await state.get_data()
+    try:
+        reward_max = float(message.text.strip().replace(",", "."))
+    except ValueError:
+        await message.answer("❌ Введи число:")
+        return
+    if reward_max <= data["reward_min"]:
+        await message.answer("❌ Максимум должен быть больше минимума:")
+        return
+    await state.update_data(reward_max=reward_max, reward=0.0)
+    await state.set_state(AdminPromoStates.usage_limit)
+    await message.answer("Лимит использований (0 = безлимитный):")
+
+
+@router.message(AdminPromoStates.usage_limit)
+async def msg_promo_limit(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    try:
+        limit_raw = int(message.text.strip())
+    except ValueError:
+        await message.answer("❌ Введи целое число:")
+        return
+    data = await state.get_data()
+    await state.clear()
+
+    promo = PromoCode(
+        code=data["code"],
+        reward=data.get("reward", 0.0),
+        is_random=data.get("is_random", False),
+        reward_min=data.get("reward_min"),
+        reward_max=data.get("reward_max"),
+        usage_limit=limit_raw if limit_raw > 0 else None,
+    )
+    session.add(promo)
+    await session.commit()
+    promo_index.put(promo)
+
+    reward_desc = (
+        f"{data.get('reward_min')}–{data.get('reward_max')} ⭐ (случайно)"
+        if data.get("is_random")
+        else f"{data.get('reward', 0):.2f} ⭐"
+    )
+    limit_desc = str(limit_raw) if limit_raw > 0 else "безлимитный"
+
+    await message.answer(
+        f"✅ Промокод создан!\n\n"
+        f"Код: <code>{promo.code}</code>\n"
+        f"Награда: {reward_desc}\n"
+        f"Лимит: {limit_desc}",
+        parse_mode="HTML",
+        reply_markup=admin_main_kb(),
+    )
+
+
+# ─── Promo: List & Actions ───────────────────────────────────────────────────
+
+@callbacks("admin:list_promos")
+async def cb_list_promos(callback: CallbackQuery, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    promos = (await session.execute(select(PromoCode).order_by(PromoCode.created_at.desc()))).scalars().all()
+    if not promos:
+        await callback.message.edit_text("Промокодов нет.", reply_markup=admin_back_kb())
+        await callback.answer()
+        return
+    await callback.message.edit_text("🎟 <b>Список промокодов:</b>", parse_mode="HTML", reply_markup=promo_list_kb(promos))
+    await callback.answer()
+
+
+@callbacks("admin:promo_info:{promo_id:int}")
+async def cb_promo_info(callback: CallbackQuery, promo_id: int, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    promo = await session.get(PromoCode, promo_id)
+    if not promo:
+        await callback.answer("Промокод не найден.", show_alert=True)
+        return
+
+    reward_desc = (
+        f"{promo.reward_min}–{promo.reward_max} ⭐ (случайно)"
+        if promo.is_random
+        else f"{promo.reward:.2f} ⭐"
+    )
+    limit_desc = str(promo.usage_limit) if promo.usage_limit else "безлимитный"
+    status = "✅ Активен" if promo.is_active else "❌ Неактивен"
+
+    await callback.message.edit_text(
+        f"🎟 <b>{promo.code}</b>\n\n"
+        f"Статус: {status}\n"
+        f"Награда: {reward_desc}\n"
+        f"Лимит: {limit_desc}\n"
+        f"Использований: {promo.usage_count}",
+        parse_mode="HTML",
+        reply_markup=promo_actions_kb(promo.id, promo.is_active),
+    )
+    await callback.answer()
+
+
+@callbacks("admin:promo_toggle:{promo_id:int}")
+async def cb_promo_toggle(callback: CallbackQuery, promo_id: int, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    promo = await session.get(PromoCode, promo_id)
+    if promo:
+        promo.is_active = not promo.is_active
+        await session.commit()
+        promo_index.put(promo)
+        await callback.answer("Статус изменён.")
+        await callback.message.edit_reply_markup(reply_markup=promo_actions_kb(promo.id, promo.is_active))
+
+
+@callbacks("admin:promo_delete:{promo_id:int}")
+async def cb_promo_delete(callback: CallbackQuery, promo_id: int, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    promo = await session.get(PromoCode, promo_id)
+    if promo:
+        await session.delete(promo)
+        await session.commit()
+        promo_index.discard(promo.code)
+    await callback.answer("Промокод удалён.")
+    promos = (await session.execute(select(PromoCode).order_by(PromoCode.created_at.desc()))).scalars().all()
+    await callback.message.edit_text("🎟 <b>Список промокодов:</b>", parse_mode="HTML", reply_markup=promo_list_kb(promos))
+
+
+# ─── Promo: Bulk ─────────────────────────────────────────────────────────────
+
+@callbacks("admin:bulk_promo")
+async def cb_bulk_promo(callback: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await state.clear()
+    await callback.message.edit_text(
+        "📦 <b>Массовые промокоды</b>\n\n"
+        "Сгенерируй пачку одноразовых кодов или загрузи свой список.",
+        parse_mode="HTML",
+        reply_markup=bulk_promo_mode_kb(),
+    )
+    await callback.answer()
+
+
+@callbacks("bulk_promo:{mode:generate|import}")
+async def cb_bulk_promo_mode(callback: CallbackQuery, mode: str, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    if mode == "generate":
+        await state.set_state(AdminBulkPromoStates.count)
+        await callback.message.edit_text(f"🎲 Сколько кодов сгенерировать? (1–{BULK_MAX_CODES})")
+    else:
+        await state.set_state(AdminBulkPromoStates.upload)
+        await callback.message.edit_text(
+            "📄 Пришли файл .txt (по коду в строке) или .csv (код в первой колонке)."
+        )
+    await callback.answer()
+
+
+@router.message(AdminBulkPromoStates.count)
+async def msg_bulk_promo_count(message: Message, state: FSMContext) -> None:
+    try:
+        count = int(message.text.strip())
+        if not 1 <= count <= BULK_MAX_CODES:
+            raise ValueError
+    except (ValueError, AttributeError):
+        await message.answer(f"❌ Введи целое число от 1 до {BULK_MAX_CODES}:")
+        return
+    await state.update_data(count=count)
+    await state.set_state(AdminBulkPromoStates.reward_type)
+    await message.answer("Выбери тип награды:", reply_markup=bulk_promo_type_kb())
+
+
+@router.message(AdminBulkPromoStates.upload)
+async def msg_bulk_promo_upload(message: Message, state: FSMContext, bot: Bot) -> None:
+    if not message.document:
+        await message.answer("❌ Пришли именно файл (.txt или .csv).")
+        return
+    if message.document.file_size and message.document.file_size > 2 * 1024 * 1024:
+        await message.answer("❌ Файл слишком большой (максимум 2 МБ).")
+        return
+    buf = io.BytesIO()
+    await bot.download(message.document, destination=buf)
+    codes, rejected = parse_codes_file(buf.getvalue())
+    if not codes:
+        await message.answer("❌ В файле не найдено ни одного корректного кода. Пришли другой файл:")
+        return
+    if len(codes) > BULK_MAX_CODES:
+        await message.answer(f"❌ Слишком много кодов ({len(codes)}), максимум {BULK_MAX_CODES}.")
+        return
+    await state.update_data(codes=codes)
+    await state.set_state(AdminBulkPromoStates.reward_type)
+    rejected_note = f"\nОтброшено некорректных строк: {len(rejected)}" if rejected else ""
+    await message.answer(
+        f"✅ Найдено кодов: <b>{len(codes)}</b>{rejected_note}\n\nВыбери тип награды:",
+        parse_mode="HTML",
+        reply_markup=bulk_promo_type_kb(),
+    )
+
+
+@callbacks("bulk_promo_type:{reward_type}", state=AdminBulkPromoStates.reward_type)
+async def cb_bulk_promo_type(callback: CallbackQuery, reward_type: str, state: FSMContext) -> None:
+    is_random = reward_type == "random"
+    await state.update_data(is_random=is_random)
+    if is_random:
+        await state.set_state(AdminBulkPromoStates.reward_min)
+        await callback.message.edit_text("Введи минимальную награду (число):")
+    else:
+        await state.set_state(AdminBulkPromoStates.reward_fixed)
+        await callback.message.edit_text("Введи фиксированную награду (число):")
+    await callback.answer()
+
+
+@router.message(AdminBulkPromoStates.reward_fixed)
+async def msg_bulk_promo_fixed(message: Message, state: FSMContext) -> None:
+    try:
+        reward = float(message.text.strip().replace(",", "."))
+    except ValueError:
+        await message.answer("❌ Введи число, например: 5 или 2.5")
+        return
+    await state.update_data(reward=reward)
+    await state.set_state(AdminBulkPromoStates.usage_limit)
+    await message.answer("Лимит использований каждого кода (1 = одноразовый, 0 = безлимитный):")
+
+
+@router.message(AdminBulkPromoStates.reward_min)
+async def msg_bulk_promo_min(message: Message, state: FSMContext) -> None:
+    try:
+        reward_min = float(message.text.strip().replace(",", "."))
+    except ValueError:
+        await message.answer("❌ Введи число:")
+        return
+    await state.update_data(reward_min=reward_min)
+    await state.set_state(AdminBulkPromoStates.reward_max)
+    await message.answer("Введи максимальную награду:")
+
+
+@router.message(AdminBulkPromoStates.reward_max)
+async def msg_bulk_promo_max(message: Message, state: FSMContext) -> None:
+    data = await state.get_data()
+    try:
+        reward_max = float(message.text.strip().replace(",", "."))
+    except ValueError:
+        await message.answer("❌ Введи число:")
+        return
+    if reward_max <= data["reward_min"]:
+        await message.answer("❌ Максимум должен быть больше минимума:")
+        return
+    await state.update_data(reward_max=reward_max, reward=0.0)
+    await state.set_state(AdminBulkPromoStates.usage_limit)
+    await message.answer("Лимит использований каждого кода (1 = одноразовый, 0 = безлимитный):")
+
+
+@router.message(AdminBulkPromoStates.usage_limit)
+async def msg_bulk_promo_limit(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    try:
+        limit_raw = int(message.text.strip())
+        if limit_raw < 0:
+            raise ValueError
+    except ValueError:
+        await message.answer("❌ Введи целое неотрицательное число:")
+        return
+    data = await state.get_data()
+    await state.clear()
+
+    reward = {
+        "reward": data.get("reward", 0.0),
+        "is_random": data.get("is_random", False),
+        "reward_min": data.get("reward_min"),
+        "reward_max": data.get("reward_max"),
+        "usage_limit": limit_raw if limit_raw > 0 else None,
+    }
+    if "codes" in data:
+        requested = len(data["codes"])
+        created = await bulk_insert_codes(session, data["codes"], **reward)
+    else:
+        requested = data["count"]
+        created = await bulk_generate_codes(session, requested, **reward)
+
+    reward_desc = (
+        f"{reward['reward_min']}–{reward['reward_max']} ⭐ (случайно)"
+        if reward["is_random"]
+        else f"{reward['reward']:.2f} ⭐"
+    )
+    limit_desc = str(limit_raw) if limit_raw > 0 else "безлимитный"
+    skipped = requested - len(created)
+    summary = (
+        f"✅ Создано промокодов: <b>{len(created)}</b>\n"
+        f"Награда: {reward_desc}\n"
+        f"Лимит на код: {limit_desc}"
+    )
+    if skipped:
+        summary += f"\nПропущено (уже существуют): {skipped}"
+
+    if created:
+        filename = f"promo_codes_{datetime.utcnow():%Y%m%d_%H%M}.txt"
+        await message.answer_document(
+            BufferedInputFile("\n".join(created).encode(), filename=filename),
+            caption=summary,
+            parse_mode="HTML",
+        )
+        await message.answer("🛠 <b>Админ-панель</b>", parse_mode="HTML", reply_markup=admin_main_kb())
+    else:
+        await message.answer(summary, parse_mode="HTML", reply_markup=admin_main_kb())
+
+
+# ─── Credit ──────────────────────────────────────────────────────────────────
+
+@callbacks("admin:credit")
+async def cb_credit(callback: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await state.set_state(AdminCreditStates.user_id)
+    await callback.message.edit_text("💳 Введи Telegram ID пользователя:", reply_markup=credit_mode_kb())
+    await callback.answer()
+
+
+@router.message(AdminCreditStates.user_id)
+async def msg_credit_user(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    try:
+        uid = int(message.text.strip())
+    except ValueError:
+        await message.answer("❌ Введи числовой ID:")
+        return
+    user = await session.get(User, uid)
+    if not user:
+        await message.answer("❌ Пользователь не найден. Введи другой ID:")
+        return
+    await state.update_data(target_user_id=uid)
+    await state.set_state(AdminCreditStates.amount)
+    await message.answer(f"Пользователь: {user.first_name} (@{user.username})\nВведи сумму для начисления:")
+
+
+@router.message(AdminCreditStates.amount)
+async def msg_credit_amount(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    try:
+        amount = float(message.text.strip().replace(",", "."))
+    except ValueError:
+        await message.answer("❌ Введи число:")
+        return
+    data = await state.get_data()
+    await state.clear()
+
+    user = await session.get(User, data["target_user_id"])
+    user.stars_balance += amount
+    session.add(BalanceLedger(user_id=user.user_id, amount=amount, source="admin", admin_id=message.from_user.id))
+    await session.commit()
+
+    await message.answer(
+        f"✅ Начислено <b>{amount} ⭐</b> пользователю {user.first_name}.\n"
+        f"Новый баланс: <b>{user.stars_balance:.2f} ⭐</b>",
+        parse_mode="HTML",
+        reply_markup=admin_main_kb(),
+    )
+
+
+# ─── Credit: bulk CSV ────────────────────────────────────────────────────────
+# Only the file_id is kept between preview and apply; the file is downloaded and validated again.
+
+async def _download_adjustments(bot: Bot, file_id: str):
+    buf = io.BytesIO()
+    await bot.download(file_id, destination=buf)
+    return parse_adjustments_file(buf.getvalue())
+
+
+@callbacks("admin:credit_bulk")
+async def cb_credit_bulk(callback: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await state.set_state(AdminCreditStates.bulk_upload)
+    await callback.message.edit_text(
+        "📄 <b>Массовое начисление</b>\n\n"
+        "Пришли CSV-файл со строками <code>user_id,amount,reason</code>\n"
+        "(заголовок необязателен, отрицательная сумма — списание).\n"
+        f"Максимум {BULK_MAX_ROWS} строк, 2 МБ.",
+        parse_mode="HTML",
+        reply_markup=admin_back_kb(),
+    )
+    await callback.answer()
+
+
+@router.message(AdminCreditStates.bulk_upload)
+async def msg_credit_bulk_upload(message: Message, state: FSMContext, bot: Bot) -> None:
+    if not message.document:
+        await message.answer("❌ Пришли именно файл (.csv).")
+        return
+    if message.document.file_size and message.document.file_size > 2 * 1024 * 1024:
+        await message.answer("❌ Файл слишком большой (максимум 2 МБ).")
+        return
+    rows, rejected = await _download_adjustments(bot, message.document.file_id)
+    if not rows:
+        await message.answer("❌ В файле нет ни одной корректной строки. Пришли другой файл:")
+        return
+    if len(rows) > BULK_MAX_ROWS:
+        await message.answer(f"❌ Слишком много строк ({len(rows)}), максимум {BULK_MAX_ROWS}.")
+        return
+    await state.update_data(bulk_file_id=message.document.file_id, bulk_upload_id=message.message_id)
+    await state.set_state(AdminCreditStates.bulk_confirm)
+    credit = sum(r.amount for r in rows if r.amount > 0)
+    debit = -sum(r.amount for r in rows if r.amount < 0)
+    lines = [
+        "📄 <b>Проверка файла</b>\n",
+        f"Строк: <b>{len(rows)}</b> | Пользователей: <b>{len({r.user_id for r in rows})}</b>",
+        f"Начислить: <b>{credit:.2f} ⭐</b> | Списать: <b>{debit:.2f} ⭐</b>",
+    ]
+    if rejected:
+        lines.append(f"\nОтброшено строк: <b>{len(rejected)}</b>")
+        lines += [f"• стр. {r.line}: {html.escape(r.error)}" for r in rejected[:5]]
+    lines.append("\nНеизвестные пользователи и уход баланса в минус проверяются при применении.")
+    await message.answer("\n".join(lines), parse_mode="HTML", reply_markup=credit_bulk_confirm_kb())
+
+
+@callbacks("credit_bulk:apply", state=AdminCreditStates.bulk_confirm)
+async def cb_credit_bulk_apply(callback: CallbackQuery, state: FSMContext, session: AsyncSession, bot: Bot) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    data = await state.get_data()
+    file_id, upload_id = data.get("bulk_file_id"), data.get("bulk_upload_id")
+    if not file_id or not upload_id:
+        return await callback.answer("Файл не найден, загрузи его заново.", show_alert=True)
+    await state.clear()
+    await callback.answer()
+    await callback.message.edit_text("⏳ Применяю…")
+    # One batch per upload: a second tap on "apply" finds it in the ledger and changes nothing
+    batch_id = f"{callback.from_user.id}-{upload_id}"
+    try:
+        rows, rejected = await _download_adjustments(bot, file_id)
+        result = await apply_adjustments(session, rows, callback.from_user.id, batch_id)
+    except Exception:
+        # nothing was applied: keep the upload so the admin can tap "apply" again
+        await state.set_state(AdminCreditStates.bulk_confirm)
+        await state.update_data(bulk_file_id=file_id, bulk_upload_id=upload_id)
+        await callback.message.edit_text(
+            "⚠️ Не удалось применить файл. Попробуй ещё раз.", reply_markup=credit_bulk_confirm_kb(),
+        )
+        raise
+    if result.duplicate:
+        await callback.message.edit_text(
+            f"ℹ️ Этот файл уже применён, пакет <code>{batch_id}</code>.",
+            parse_mode="HTML",
+            reply_markup=admin_main_kb(),
+        )
+        return
+    rejected = sorted(rejected + result.rejected, key=lambda r: r.line)
+    summary = (
+        f"✅ <b>Массовое начисление применено</b>\n\n"
+        f"Строк: <b>{result.applied}</b> | Пользователей: <b>{result.users}</b>\n"
+        f"Начислено: <b>{result.credited:.2f} ⭐</b> | Списано: <b>{result.debited:.2f} ⭐</b>\n"
+        f"Отклонено строк: <b>{len(rejected)}</b>\n"
+        f"Пакет: <code>{result.batch_id}</code>"
+    )
+    await callback.message.edit_text(summary, parse_mode="HTML")
+    if rejected:
+        await callback.message.answer_document(
+            BufferedInputFile(rejected_report(rejected), filename=f"rejected_{result.batch_id}.csv"),
+            caption="Отклонённые строки",
+        )
+    await callback.message.answer("🛠 <b>Админ-панель</b>", parse_mode="HTML", reply_markup=admin_main_kb())
+
+
+# ─── User search ─────────────────────────────────────────────────────────────
+# The query stays in the admin's FSM data after the search, for paging and "back to results".
+
+_GAME_RESULT_ICONS = {"win": "✅", "lose": "❌"}
+_WITHDRAWAL_STATUS_ICONS = {"pending": "⏳", "approved": "✅", "rejected": "❌"}
+
+
+@callbacks("admin:user_search")
+async def cb_user_search(callback: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await state.set_state(AdminUserSearchStates.query)
+    await callback.message.edit_text(
+        "🔎 Введи ID, @username или часть имени пользователя:",
+        reply_markup=admin_back_kb(),
+    )
+    await callback.answer()
+
+
+async def _user_search_page(session: AsyncSession, query: str, after: int) -> tuple[str, InlineKeyboardMarkup]:
+    users, has_more = await search_users(session, query, after)
+    if not users:
+        text = f"🔎 По запросу <b>{html.escape(query)}</b> никого не нашлось."
+    else:
+        text = f"🔎 Результаты по запросу <b>{html.escape(query)}</b>:"
+    return text, user_search_results_kb(users, after, users[-1].user_id if has_more else None)
+
+
+@router.message(AdminUserSearchStates.query)
+async def msg_user_search(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    query = (message.text or "").strip()
+    if not query.lstrip("@"):
+        await message.answer("❌ Введи ID, @username или часть имени:")
+        return
+    await state.set_state(None)
+    await state.update_data(user_search_query=query)
+    text, kb = await _user_search_page(session, query, 0)
+    await message.answer(text, parse_mode="HTML", reply_markup=kb)
+
+
+@callbacks("usearch:page:{after:int}")
+async def cb_user_search_page(callback: CallbackQuery, after: int, session: AsyncSession, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    query = (await state.get_data()).get("user_search_query")
+    if not query:
+        return await cb_user_search(callback, state)
+    text, kb = await _user_search_page(session, query, after)
+    await callback.message.edit_text(text, parse_mode="HTML", reply_markup=kb)
+    await callback.answer()
+
+
+@callbacks("usearch:user:{user_id:int}:{after:int}")
+async def cb_user_card(callback: CallbackQuery, user_id: int, after: int, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    card = await load_user_card(session, user_id)
+    if card is None:
+        return await callback.answer("Пользователь не найден.", show_alert=True)
+    user = card.user
+    uname = f"@{user.username}" if user.username else "—"
+    lines = [
+        f"👤 <b>{html.escape(user.first_name)}</b> {uname}",
+        f"ID: <code>{user.user_id}</code>",
+        f"Баланс: <b>{user.stars_balance:.2f} ⭐</b>",
+        f"Рефералов: <b>{user.referrals_count}</b>",
+        f"Пригласил: <code>{user.referrer_id}</code>" if user.referrer_id else "Пригласил: —",
+        f"Регистрация: {user.created_at:%d.%m.%Y %H:%M} UTC",
+        "",
+        "🎮 <b>Последние игры</b>",
+    ]
+    lines += [
+        f"{_GAME_RESULT_ICONS.get(g.result, g.result)} {g.game_type} · ставка {g.bet:.2f} · "
+        f"выплата {g.payout:.2f} · {g.played_at:%d.%m %H:%M}"
+        for g in card.games
+    ] or ["—"]
+    lines += ["", "💸 <b>Последние выводы</b>"]
+    lines += [
+        f"{_WITHDRAWAL_STATUS_ICONS.get(w.status, w.status)} #{w.id} · {w.amount:.0f} ⭐ · {w.created_at:%d.%m %H:%M}"
+        for w in card.withdrawals
+    ] or ["—"]
+    await callback.message.edit_text("\n".join(lines), parse_mode="HTML", reply_markup=user_card_kb(user_id, after))
+    await callback.answer()
+
+
+@callbacks("usearch:credit:{user_id:int}")
+async def cb_user_card_credit(callback: CallbackQuery, user_id: int, session: AsyncSession, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    user = await session.get(User, user_id)
+    if not user:
+        return await callback.answer("Пользователь не найден.", show_alert=True)
+    await state.update_data(target_user_id=user_id)
+    await state.set_state(AdminCreditStates.amount)
+    await callback.message.answer(f"Пользователь: {user.first_name} (@{user.username})\nВведи сумму для начисления:")
+    await callback.answer()
+
+
+# ─── Settings ────────────────────────────────────────────────────────────────
+
+@callbacks("admin:settings")
+async def cb_settings(callback: CallbackQuery, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+
+    rr = (await session.get(BotSettings, "referral_reward"))
+    rr2 = (await session.get(BotSettings, "referral_reward_l2"))
+    rr3 = (await session.get(BotSettings, "referral_reward_l3"))
+    bc = (await session.get(BotSettings, "bonus_cooldown_hours"))
+    bmin = (await session.get(BotSettings, "bonus_min"))
+    bmax = (await session.get(BotSettings, "bonus_max"))
+    pch = (await session.get(BotSettings, "payments_channel_id"))
+    pch_url = (await session.get(BotSettings, "payments_channel_url"))
+
+    await callback.message.edit_text(
+        f"⚙️ <b>Настройки</b>\n\n"
+        f"⭐ Награда за реферала: <b>{rr.value if rr else '?'}</b>\n"
+        f"🥈 Реферал 2-го уровня: <b>{rr2.value if rr2 else config.REFERRAL_REWARD_L2}</b>\n"
+        f"🥉 Реферал 3-го уровня: <b>{rr3.value if rr3 else config.REFERRAL_REWARD_L3}</b>\n"
+        f"⏱ Кулдаун бонуса: <b>{bc.value if bc else '?'} ч</b>\n"
+        f"🎁 Бонус мин: <b>{bmin.value if bmin else '?'}</b>\n"
+        f"🎁 Бонус макс: <b>{bmax.value if bmax else '?'}</b>\n"
+        f"📢 ID канала выплат: <b>{pch.value if pch and pch.value else 'не задан'}</b>\n"
+        f"🔗 Ссылка канала: <b>{pch_url.value if pch_url and pch_url.value else 'не задана'}</b>",
+        parse_mode="HTML",
+        reply_markup=admin_settings_kb(),
+    )
+    await callback.answer()
+
+
+async def _ask_setting(callback: CallbackQuery, state: FSMContext, state_obj: State, prompt: str) -> None:
+    await state.set_state(state_obj)
+    await callback.message.edit_text(prompt)
+    await callback.answer()
+
+
+@callbacks("settings:referral_reward")
+async def cb_set_rr(callback: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return
+    await _ask_setting(callback, state, AdminSettingsStates.referral_reward, "Введи новую награду за реферала (число):")
+
+
+@callbacks("settings:{key:referral_reward_l2|referral_reward_l3}")
+async def cb_set_rr_tier(callback: CallbackQuery, key: str, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return
+    level = key[-1]
+    state_obj = AdminSettingsStates.referral_reward_l2 if level == "2" else AdminSettingsStates.referral_reward_l3
+    await _ask_setting(callback, state, state_obj, f"Введи награду за реферала {level}-го уровня (число, 0 = выкл):")
+
+
+@callbacks("settings:bonus_cooldown")
+async def cb_set_cooldown(callback: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return
+    await _ask_setting(callback, state, AdminSettingsStates.bonus_cooldown, "Введи кулдаун бонуса в часах (целое):")
+
+
+@callbacks("settings:bonus_min")
+async def cb_set_bmin(callback: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return
+    await _ask_setting(callback, state, AdminSettingsStates.bonus_min, "Введи минимальный бонус (число):")
+
+
+@callbacks("settings:bonus_max")
+async def cb_set_bmax(callback: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return
+    await _ask_setting(callback, state, AdminSettingsStates.bonus_max, "Введи максимальный бонус (число):")
+
+
+@callbacks("settings:payments_channel_id")
+async def cb_set_payments_channel(callback: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return
+    await state.set_state(AdminSettingsStates.payments_channel_id)
+    await callback.message.edit_text(
+        "📢 Введи ID канала выплат:\n"
+        "Примеры: <code>-1001234567890</code> или <code>@mychannel</code>\n\n"
+        "Бот должен быть администратором этого канала.",
+        parse_mode="HTML",
+    )
+    await callback.answer()
+
+
+async def _save_setting(message: Message, state: FSMContext, session: AsyncSession, key: str) -> None:
+    try:
+        val = float(message.text.strip().replace(",", "."))
+    except ValueError:
+        await message.answer("❌ Введи число:")
+        return
+    await state.clear()
+    await set_setting(session, key, str(val))
+    await message.answer(f"✅ Настройка обновлена: <b>{key}</b> = {val}", parse_mode="HTML", reply_markup=admin_main_kb())
+
+
+@router.message(AdminSettingsStates.referral_reward)
+async def msg_set_rr(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    await _save_setting(message, state, session, "referral_reward")
+
+
+@router.message(AdminSettingsStates.referral_reward_l2)
+async def msg_set_rr_l2(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    await _save_setting(message, state, session, "referral_reward_l2")
+
+
+@router.message(AdminSettingsStates.referral_reward_l3)
+async def msg_set_rr_l3(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    await _save_setting(message, state, session, "referral_reward_l3")
+
+
+@router.message(AdminSettingsStates.bonus_cooldown)
+async def msg_set_cooldown(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    await _save_setting(message, state, session, "bonus_cooldown_hours")
+
+
+@router.message(AdminSettingsStates.bonus_min)
+async def msg_set_bmin(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    await _save_setting(message, state, session, "bonus_min")
+
+
+@router.message(AdminSettingsStates.bonus_max)
+async def msg_set_bmax(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    await _save_setting(message, state, session, "bonus_max")
+
+
+@router.message(AdminSettingsStates.payments_channel_id)
+async def msg_set_payments_channel(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    await state.clear()
+    value = message.text.strip()
+    await set_setting(session, "payments_channel_id", value)
+    await message.answer(
+        f"✅ ID канала выплат установлен: <code>{value}</code>",
+        parse_mode="HTML",
+        reply_markup=admin_main_kb(),
+    )
+
+
+@callbacks("settings:payments_channel_url")
+async def cb_set_payments_channel_url(callback: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return
+    await state.set_state(AdminSettingsStates.payments_channel_url)
+    await callback.message.edit_text(
+        "🔗 Введи публичную ссылку на канал выплат:\n"
+        "Пример: <code>https://t.me/mychannel</code>",
+        parse_mode="HTML",
+    )
+    await callback.answer()
+
+
+@router.message(AdminSettingsStates.payments_channel_url)
+async def msg_set_payments_channel_url(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    await state.clear()
+    value = message.text.strip()
+    await set_setting(session, "payments_channel_url", value)
+    await message.answer(
+        f"✅ Ссылка на канал выплат установлена: <code>{value}</code>",
+        parse_mode="HTML",
+        reply_markup=admin_main_kb(),
+    )
+
+
+# ─── Broadcast ───────────────────────────────────────────────────────────────
+
+@callbacks("admin:broadcast")
+async def cb_broadcast(callback: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await state.set_state(AdminBroadcastStates.text)
+    await callback.message.edit_text("📢 Введи текст рассылки (HTML поддерживается):")
+    await callback.answer()
+
+
+@router.message(AdminBroadcastStates.text)
+async def msg_broadcast(message: Message, state: FSMContext, session: AsyncSession, bot: Bot) -> None:
+    await state.clear()
+    text = message.text
+
+    users = (await session.execute(select(User.user_id))).scalars().all()
+    sent, failed = 0, 0
+    for uid in users:
+        try:
+            await bot.send_message(uid, text, parse_mode="HTML")
+            sent += 1
+        except Exception:
+            failed += 1
+
+    await message.answer(
+        f"✅ Рассылка завершена.\nДоставлено: <b>{sent}</b>\nОшибок: <b>{failed}</b>",
+        parse_mode="HTML",
+        reply_markup=admin_main_kb(),
+    )
+
+
+# ─── Export ──────────────────────────────────────────────────────────────────
+
+# admin_id -> running export; also keeps a strong reference so the task is not garbage-collected
+_export_tasks: dict[int, asyncio.Task] = {}
+
+
+@callbacks("admin:export")
+async def cb_export_menu(callback: CallbackQuery) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await callback.message.edit_text(
+        "📤 <b>Экспорт данных</b>\n\nФайл будет сжат gzip и отправлен в этот чат.",
+        parse_mode="HTML",
+        reply_markup=export_kb(),
+    )
+    await callback.answer()
+
+
+@callbacks("admin:export:{table}:{fmt}")
+async def cb_export_run(callback: CallbackQuery, table: str, fmt: str, bot: Bot) -> None:
+    admin_id = callback.from_user.id
+    if not is_admin(admin_id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    if table not in EXPORT_TABLES or fmt not in EXPORT_FORMATS:
+        return await callback.answer()
+    if admin_id in _export_tasks:
+        return await callback.answer("Экспорт уже выполняется, дождись файла.", show_alert=True)
+
+    status = await callback.message.answer(f"⏳ Экспорт <b>{table}</b> ({fmt}) запущен…", parse_mode="HTML")
+    task = asyncio.create_task(run_export_job(bot, status.chat.id, status.message_id, table, fmt))
+    _export_tasks[admin_id] = task
+    task.add_done_callback(lambda _: _export_tasks.pop(admin_id, None))
+    await callback.answer()
+
+
+# ─── Background jobs ─────────────────────────────────────────────────────────
+
+_JOB_STATUS_ICONS = {"ok": "✅", "error": "❌", "cancelled": "⏹", None: "⏳"}
+
+
+def _ago(moment: datetime | None) -> str:
+    if moment is None:
+        return "—"
+    seconds = int((datetime.utcnow() - moment).total_seconds())
+    span = abs(seconds)
+    if span >= 3600:
+        span_text = f"{span // 3600} ч {span % 3600 // 60} мин"
+    elif span >= 60:
+        span_text = f"{span // 60} мин"
+    else:
+        span_text = f"{span} с"
+    return f"{span_text} назад" if seconds >= 0 else f"через {span_text}"
+
+
+def _jobs_text() -> str:
+    lines = ["⏱ <b>Фоновые задачи</b> (время UTC)\n"]
+    for job in scheduler.jobs.values():
+        icon = "🔄" if job.running else _JOB_STATUS_ICONS.get(job.last_status, "❔")
+        duration = f"{job.last_duration:.1f} с" if job.last_duration is not None else "—"
+        lines.append(
+            f"{icon} <b>{job.name}</b> — {job.trigger}\n"
+            f"   последний запуск: {_ago(job.last_started)}, {duration}\n"
+            f"   запусков: {job.runs}, ошибок: {job.failures}, пропущено: {job.skipped}\n"
+            f"   следующий: {_ago(job.next_run)}"
+        )
+        if job.last_status == "error" and job.last_error:
+            lines.append(f"   <code>{html.escape(job.last_error[:200])}</code>")
+    if len(lines) == 1:
+        lines.append("Задачи не зарегистрированы.")
+    return "\n".join(lines)
+
+
+@callbacks("admin:jobs")
+async def cb_jobs(callback: CallbackQuery) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await callback.message.edit_text(
+        _jobs_text(), parse_mode="HTML", reply_markup=jobs_kb(tuple(scheduler.jobs)),
+    )
+    await callback.answer()
+
+
+@callbacks("admin:job_run:{name}")
+async def cb_job_run(callback: CallbackQuery, name: str) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    if name not in scheduler.jobs:
+        return await callback.answer("Задача не найдена.", show_alert=True)
+    if not scheduler.run_now(name):
+        return await callback.answer("Задача уже выполняется.", show_alert=True)
+    # let a short job finish so the screen shows its result
+    await asyncio.sleep(0.5)
+    await callback.message.edit_text(
+        _jobs_text(), parse_mode="HTML", reply_markup=jobs_kb(tuple(scheduler.jobs)),
+    )
+    await callback.answer(f"▶️ {name} запущена")
+
+
+# ─── Withdrawal: Approve / Reject (from admin channel) ───────────────────────
+
+@callbacks("withdrawal:{action:approve|reject}:{withdrawal_id:int}")
+async def cb_withdrawal_action(
+    callback: CallbackQuery, action: str, withdrawal_id: int, session: AsyncSession,
+) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+
+    withdrawal = await session.get(Withdrawal, withdrawal_id)
+    if not withdrawal:
+        return await callback.answer("Заявка не найдена.", show_alert=True)
+    if withdrawal.status != "pending":
+        return await callback.answer(f"Заявка уже обработана: {withdrawal.status}", show_alert=True)
+
+    # another admin may have settled it since the check above
+    if not await review_withdrawals(session, [withdrawal_id], approve=action == "approve"):
+        return await callback.answer("Заявка уже обработана.", show_alert=True)
+    await callback.answer("✅ Принята" if action == "approve" else "❌ Отклонена")
+
+
+# ─── Withdrawal review queue (bulk approve / reject) ─────────────────────────
+# The selection lives in the admin's FSM data, so it survives paging.
+
+async def _queue_selection(state: FSMContext) -> set[int]:
+    return set((await state.get_data()).get("wdq_selected", []))
+
+
+async def _show_withdrawal_queue(
+    callback: CallbackQuery, session: AsyncSession, state: FSMContext, after: int,
+) -> None:
+    page, has_more = await pending_page(session, after)
+    selected = await _queue_selection(state)
+    pending_count, pending_sum = await pending_totals(session)
+    sel_count, sel_sum = await pending_totals(session, list(selected))
+    lines = [
+        "💸 <b>Заявки на вывод</b>\n",
+        f"Ожидают: <b>{pending_count}</b> на <b>{pending_sum:.0f} ⭐</b>",
+        f"Выбрано: <b>{sel_count}</b> на <b>{sel_sum:.0f} ⭐</b>\n",
+    ]
+    for w in page:
+        uname = f"@{w.username}" if w.username else "—"
+        lines.append(f"#{w.id} · {uname} · <code>{w.user_id}</code> · {w.amount:.0f} ⭐ · {w.created_at:%d.%m %H:%M}")
+    if not page:
+        lines.append("Заявок на рассмотрении нет.")
+    await callback.message.edit_text(
+        "\n".join(lines),
+        parse_mode="HTML",
+        reply_markup=withdrawal_queue_kb(page, selected, after, page[-1].id if has_more else None),
+    )
+
+
+@callbacks("wdq:page:{after:int}")
+async def cb_withdrawal_queue(callback: CallbackQuery, after: int, session: AsyncSession, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await _show_withdrawal_queue(callback, session, state, after)
+    await callback.answer()
+
+
+@callbacks("wdq:sel:{withdrawal_id:int}:{after:int}", "wdq:{scope:page_all|all|clear}:{after:int}")
+async def cb_withdrawal_queue_select(
+    callback: CallbackQuery,
+    after: int,
+    session: AsyncSession,
+    state: FSMContext,
+    withdrawal_id: int | None = None,
+    scope: str | None = None,
+) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    selected = await _queue_selection(state)
+    if withdrawal_id is not None:
+        selected ^= {withdrawal_id}
+    elif scope == "page_all":
+        page, _ = await pending_page(session, after)
+        selected |= {w.id for w in page}
+    elif scope == "all":
+        selected = set(await pending_ids(session))
+    else:
+        selected = set()
+    await state.update_data(wdq_selected=sorted(selected))
+    await _show_withdrawal_queue(callback, session, state, after)
+    await callback.answer()
+
+
+@callbacks("wdq:{action:approve|reject}:{after:int}")
+async def cb_withdrawal_queue_confirm(
+    callback: CallbackQuery, action: str, after: int, session: AsyncSession, state: FSMContext,
+) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    count, amount = await pending_totals(session, list(await _queue_selection(state)))
+    if not count:
+        return await callback.answer("Выбранные заявки уже обработаны.", show_alert=True)
+    verb = "Одобрить" if action == "approve" else "Отклонить (звёзды вернутся пользователям)"
+    await callback.message.edit_text(
+        f"{verb}: <b>{count}</b> заявок на <b>{amount:.0f} ⭐</b>?",
+        parse_mode="HTML",
+        reply_markup=withdrawal_queue_confirm_kb(action, after),
+    )
+    await callback.answer()
+
+
+@callbacks("wdq:do:{action:approve|reject}")
+async def cb_withdrawal_queue_apply(
+    callback: CallbackQuery, action: str, session: AsyncSession, state: FSMContext,
+) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    done = await review_withdrawals(session, sorted(await _queue_selection(state)), approve=action == "approve")
+    await state.update_data(wdq_selected=[])
+    verb = "Одобрено" if action == "approve" else "Отклонено"
+    await callback.answer(
+        f"{verb}: {len(done)} заявок на {sum(w.amount for w in done):.0f} ⭐.\n"
+        f"Уведомления отправляются в фоне.",
+        show_alert=True,
+    )
+    await _show_withdrawal_queue(callback, session, state, 0)
+
+
+# ─── Tasks: Management ───────────────────────────────────────────────────────
+
+@callbacks("admin:tasks")
+async def cb_admin_tasks(callback: CallbackQuery) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await callback.message.edit_text(
+        "📋 <b>Управление заданиями</b>",
+        parse_mode="HTML",
+        reply_markup=task_management_kb(),
+    )
+    await callback.answer()
+
+
+@callbacks("admin:list_tasks")
+async def cb_list_tasks(callback: CallbackQuery, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    tasks = (await session.execute(select(Task).order_by(Task.created_at.desc()))).scalars().all()
+    if not tasks:
+        await callback.message.edit_text("Заданий нет.", reply_markup=task_management_kb())
+        await callback.answer()
+        return
+    await callback.message.edit_text(
+        "📋 <b>Список заданий:</b>",
+        parse_mode="HTML",
+        reply_markup=task_list_admin_kb(tasks),
+    )
+    await callback.answer()
+
+
+@callbacks("admin:task_info:{task_id:int}")
+async def cb_task_info(callback: CallbackQuery, task_id: int, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    task = await session.get(Task, task_id)
+    if not task:
+        await callback.answer("Задание не найдено.", show_alert=True)
+        return
+
+    completions_count = (await session.execute(
+        select(func.count(TaskCompletion.id)).where(TaskCompletion.task_id == task_id)
+    )).scalar()
+
+    type_label = {"subscribe": "📢 Подписка на канал", "referrals": "👥 Рефералы"}.get(task.task_type, task.task_type)
+    status = "✅ Активно" if task.is_active else "❌ Неактивно"
+
+    extra = ""
+    if task.task_type == "subscribe":
+        extra = f"\nКанал: <code>{task.channel_id}</code>"
+    elif task.task_type == "referrals":
+        extra = f"\nЦель: {task.target_value} рефералов"
+
+    await callback.message.edit_text(
+        f"📌 <b>{task.title}</b>\n\n"
+        f"{task.description}\n\n"
+        f"Тип: {type_label}\n"
+        f"Награда: <b>{task.reward} ⭐</b>\n"
+        f"Статус: {status}\n"
+        f"Выполнений: <b>{completions_count}</b>"
+        f"{extra}",
+        parse_mode="HTML",
+        reply_markup=task_actions_kb(task.id, task.is_active),
+    )
+    await callback.answer()
+
+
+@callbacks("admin:task_toggle:{task_id:int}")
+async def cb_task_toggle(callback: CallbackQuery, task_id: int, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    task = await session.get(Task, task_id)
+    if task:
+        task.is_active = not task.is_active
+        await session.commit()
+        task_cache.bump()
+        await callback.answer("Статус изменён.")
+        await callback.message.edit_reply_markup(reply_markup=task_actions_kb(task.id, task.is_active))
+
+
+@callbacks("admin:task_delete:{task_id:int}")
+async def cb_task_delete(callback: CallbackQuery, task_id: int, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    task = await session.get(Task, task_id)
+    if task:
+        await session.delete(task)
+        # SQLite may hand the id to the next task; its completions must not carry over
+        await session.execute(delete(TaskCompletion).where(TaskCompletion.task_id == task_id))
+        await session.execute(delete(SubscriptionLapse).where(SubscriptionLapse.task_id == task_id))
+        await session.commit()
+        task_cache.forget_task(task_id)
+    await callback.answer("Задание удалено.")
+    tasks = (await session.execute(select(Task).order_by(Task.created_at.desc()))).scalars().all()
+    if not tasks:
+        await callback.message.edit_text("Заданий нет.", reply_markup=task_management_kb())
+    else:
+        await callback.message.edit_text(
+            "📋 <b>Список заданий:</b>",
+            parse_mode="HTML",
+            reply_markup=task_list_admin_kb(tasks),
+        )
+
+
+# ─── Tasks: Subscription lapses (clawbacks) ──────────────────────────────────
+
+async def _show_lapses(callback: CallbackQuery, session: AsyncSession) -> None:
+    summary = await subscription_audit.pending_summary(session)
+    job = scheduler.jobs.get("subscriptions")
+    last_check = f"{job.last_started:%d.%m %H:%M} UTC" if job and job.last_started else "—"
+    users = sum(item.users for item in summary)
+    amount = sum(item.amount for item in summary)
+    await callback.message.edit_text(
+        f"📉 <b>Отписки после награды</b>\n\n"
+        f"Ожидают решения: <b>{users}</b> на <b>{amount:.2f} ⭐</b>\n"
+        f"Исключены из заданий на подписку: <b>{subscription_audit.offenders}</b>\n"
+        f"Последняя проверка: {last_check}",
+        parse_mode="HTML",
+        reply_markup=lapses_kb(summary),
+    )
+
+
+@callbacks("admin:lapses")
+async def cb_lapses(callback: CallbackQuery, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await _show_lapses(callback, session)
+    await callback.answer()
+
+
+@callbacks("lapses:view:{task_id:int}")
+async def cb_lapses_view(callback: CallbackQuery, task_id: int, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    summary = await subscription_audit.pending_summary(session)
+    if task_id:
+        summary = [item for item in summary if item.task_id == task_id]
+    if not summary:
+        return await callback.answer("Нет отписок, ожидающих решения.", show_alert=True)
+    title = html.escape(summary[0].title) if task_id else "все задания"
+    await callback.message.edit_text(
+        f"📉 <b>{title}</b>\n\n"
+        f"Отписались: <b>{sum(item.users for item in summary)}</b>\n"
+        f"К списанию: <b>{sum(item.amount for item in summary):.2f} ⭐</b> "
+        f"(не больше текущего баланса каждого)\n\n"
+        f"Списать награды или простить?",
+        parse_mode="HTML",
+        reply_markup=lapses_confirm_kb(task_id),
+    )
+    await callback.answer()
+
+
+@callbacks("lapses:{action:clawback|dismiss}:{task_id:int}")
+async def cb_lapses_resolve(callback: CallbackQuery, action: str, task_id: int, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    result = await subscription_audit.resolve(
+        session, task_id or None, callback.from_user.id, clawback=action == "clawback",
+    )
+    if not result.lapses:
+        await callback.answer("Нет отписок, ожидающих решения.", show_alert=True)
+    elif action == "clawback":
+        await callback.answer(
+            f"Списано {result.amount:.2f} ⭐ у {result.users} польз.; "
+            f"новых исключённых: {result.new_offenders}",
+            show_alert=True,
+        )
+    else:
+        await callback.answer(f"Прощено отписок: {result.lapses}")
+    await _show_lapses(callback, session)
+
+
+# ─── Tasks: Add (FSM) ────────────────────────────────────────────────────────
+
+@callbacks("admin:add_task")
+async def cb_add_task(callback: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await state.set_state(AdminTaskStates.task_type)
+    await callback.message.edit_text("📋 Выбери тип задания:", reply_markup=task_type_kb())
+    await callback.answer()
+
+
+@callbacks("task_type:{task_type}")
+async def cb_task_type_chosen(callback: CallbackQuery, task_type: str, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await state.update_data(task_type=task_type)
+    await state.set_state(AdminTaskStates.title)
+    await callback.message.edit_text("✏️ Введи название задания:")
+    await callback.answer()
+
+
+@router.message(AdminTaskStates.title)
+async def msg_task_title(message: Message, state: FSMContext) -> None:
+    await state.update_data(title=message.text.strip())
+    await state.set_state(AdminTaskStates.description)
+    await message.answer("📝 Введи описание задания:")
+
+
+@router.message(AdminTaskStates.description)
+async def msg_task_description(message: Message, state: FSMContext) -> None:
+    await state.update_data(description=message.text.strip())
+    await state.set_state(AdminTaskStates.reward)
+    await message.answer("💰 Введи награду (число, например: 5 или 2.5):")
+
+
+@router.message(AdminTaskStates.reward)
+async def msg_task_reward(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    try:
+        reward = float(message.text.strip().replace(",", "."))
+    except ValueError:
+        await message.answer("❌ Введи число:")
+        return
+    data = await state.get_data()
+    await state.update_data(reward=reward)
+
+    if data["task_type"] == "subscribe":
+        await state.set_state(AdminTaskStates.channel_id)
+        await message.answer(
+            "📢 Введи ID или username канала:\n"
+            "Примеры: <code>@mychannel</code> или <code>-1001234567890</code>\n\n"
+            "<b>Важно:</b> бот должен быть администратором канала для проверки подписки.",
+            parse_mode="HTML",
+        )
+    elif data["task_type"] == "referrals":
+        await state.set_state(AdminTaskStates.target_value)
+        await message.answer("👥 Введи необходимое количество рефералов (целое число):")
+    else:
+        await _save_task(message, state, session)
+
+
+@router.message(AdminTaskStates.channel_id)
+async def msg_task_channel(message: Message, state: FSMContext, session: AsyncSession, bot: Bot) -> None:
+    channel_id = message.text.strip()
+
+    # Verify bot is an admin of the channel before saving the task
+    try:
+        bot_me = await bot.get_me()
+        member = await bot.get_chat_member(channel_id, bot_me.id)
+        if member.status not in ("administrator", "creator"):
+            await message.answer(
+                "❌ <b>Бот не является администратором канала.</b>\n\n"
+                "Назначьте бота администратором с правом просмотра участников и повторите попытку.",
+                parse_mode="HTML",
+            )
+            return
+    except Exception as e:
+        await message.answer(
+            f"❌ <b>Не удалось получить доступ к каналу</b> <code>{channel_id}</code>\n\n"
+            "Убедитесь, что:\n"
+            "• Бот добавлен в канал\n"
+            "• Бот назначен администратором\n"
+            "• ID канала введён верно (например: <code>@mychannel</code> или <code>-1001234567890</code>)",
+            parse_mode="HTML",
+        )
+        import logging
+        logging.getLogger(__name__).warning("Channel access check failed for %s: %s", channel_id, e)
+        return
+
+    await state.update_data(channel_id=channel_id)
+    await _save_task(message, state, session)
+
+
+@router.message(AdminTaskStates.target_value)
+async def msg_task_target(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    try:
+        target = int(message.text.strip())
+    except ValueError:
+        await message.answer("❌ Введи целое число:")
+        return
+    await state.update_data(target_value=target)
+    await _save_task(message, state, session)
+
+
+async def _save_task(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    data = await state.get_data()
+    await state.clear()
+
+    task = Task(
+        task_type=data["task_type"],
+        title=data["title"],
+        description=data["description"],
+        reward=data["reward"],
+        channel_id=data.get("channel_id"),
+        target_value=data.get("target_value"),
+    )
+    session.add(task)
+    await session.commit()
+    task_cache.bump()
+
+    type_label = {"subscribe": "📢 Подписка на канал", "referrals": "👥 Рефералы"}.get(data["task_type"], data["task_type"])
+    extra = ""
+    if data.get("channel_id"):
+        extra = f"\nКанал: <code>{data['channel_id']}</code>"
+    elif data.get("target_value"):
+        extra = f"\nЦель: {data['target_value']} рефералов"
+
+    await message.answer(
+        f"✅ Задание создано!\n\n"
+        f"<b>{data['title']}</b>\n"
+        f"Тип: {type_label}\n"
+        f"Награда: <b>{data['reward']} ⭐</b>"
+        f"{extra}",
+        parse_mode="HTML",
+        reply_markup=admin_main_kb(),
+    )
+
+
+# ─── Games: Management ────────────────────────────────────────────────────────
+
+_GAME_LABELS_ADMIN = {
+    "football":   "⚽ Футбол",
+    "basketball": "🏀 Баскетбол",
+    "bowling":    "🎳 Боулинг",
+    "dice":       "🎲 Кубики",
+    "slots":      "🎰 Слоты",
+}
+_GAME_TYPES_ADMIN = ["football", "basketball", "bowling", "dice", "slots"]
+
+
+async def _get_game_float(session: AsyncSession, key: str, default: float) -> float:
+    row = await session.get(BotSettings, key)
+    if row:
+        try:
+            return float(row.value)
+        except ValueError:
+            pass
+    return default
+
+
+@callbacks("admin:games")
+async def cb_admin_games(callback: CallbackQuery, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+
+    statuses = {}
+    for game in _GAME_TYPES_ADMIN:
+        row = await session.get(BotSettings, f"game_{game}_enabled")
+        statuses[game] = (row.value == "1") if row else True
+
+    lines = []
+    for game in _GAME_TYPES_ADMIN:
+        parts = []
+        for name, window in WINDOWS.items():
+            w = game_monitor.stats(game, window, top=0)
+            rtp = f"{w.rtp:.0%}" if w.rtp is not None else "—"
+            parts.append(f"{name}: RTP <b>{rtp}</b> ({w.paid:.0f}/{w.wagered:.0f} ⭐)")
+        lines.append(f"{_GAME_LABELS_ADMIN[game]}\n  " + " | ".join(parts))
+
+    await callback.message.edit_text(
+        "🎮 <b>Управление играми</b>\n\n"
+        "📡 <b>Live: выплаты/ставки</b>\n" + "\n".join(lines) + "\n\n"
+        "Выбери игру для настройки:",
+        parse_mode="HTML",
+        reply_markup=games_list_kb(statuses),
+    )
+    await callback.answer()
+
+
+@callbacks("agame:info:{game_type}")
+async def cb_admin_game_info(callback: CallbackQuery, game_type: str, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+
+    label = _GAME_LABELS_ADMIN.get(game_type, game_type)
+
+    enabled_row = await session.get(BotSettings, f"game_{game_type}_enabled")
+    is_enabled = (enabled_row.value == "1") if enabled_row else True
+    min_bet = await _get_game_float(session, f"game_{game_type}_min_bet", 1.0)
+    daily_limit_row = await session.get(BotSettings, f"game_{game_type}_daily_limit")
+    daily_limit = int(daily_limit_row.value) if daily_limit_row else 0
+
+    if game_type == "slots":
+        c1 = await _get_game_float(session, "game_slots_coeff1", 5.0)
+        c2 = await _get_game_float(session, "game_slots_coeff2", 2.0)
+        coeff_line = f"📈 Коэф. Tier 1 (1–3): <b>x{c1}</b>\n📈 Коэф. Tier 2 (4–10): <b>x{c2}</b>"
+    else:
+        coeff = await _get_game_float(session, f"game_{game_type}_coeff", 1.0)
+        coeff_line = f"📈 Коэффициент: <b>x{coeff}</b>"
+
+    status_text = "✅ Включена" if is_enabled else "❌ Отключена"
+    limit_text = str(daily_limit) if daily_limit > 0 else "∞ (без лимита)"
+
+    live = {name: game_monitor.stats(game_type, window) for name, window in WINDOWS.items()}
+    live_lines = []
+    for name, w in live.items():
+        rtp = f"{w.rtp:.1%}" if w.rtp is not None else "—"
+        live_lines.append(
+            f"⏱ {name}: {w.rounds} игр | ставки {w.wagered:.2f} ⭐ | выплаты {w.paid:.2f} ⭐ | RTP <b>{rtp}</b>"
+        )
+    winners = live["24ч"].top_winners
+    if winners:
+        live_lines.append("🏆 Крупнейшие выигрыши (24ч): " + ", ".join(
+            f"<code>{user_id}</code> +{amount:.2f} ⭐" for user_id, amount in winners
+        ))
+
+    await callback.message.edit_text(
+        f"🎮 <b>{label}</b>\n\n"
+        f"Статус: {status_text}\n"
+        f"{coeff_line}\n"
+        f"💰 Мин. ставка: <b>{min_bet:.0f} ⭐</b>\n"
+        f"🔢 Лимит в день: <b>{limit_text}</b>\n\n"
+        + "\n".join(live_lines),
+        parse_mode="HTML",
+        reply_markup=game_detail_kb(game_type, is_enabled),
+    )
+    await callback.answer()
+
+
+@callbacks("agame:sim:{game_type}")
+async def cb_admin_game_sim(callback: CallbackQuery, game_type: str, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+
+    if game_type not in _GAME_TYPES_ADMIN:
+        return await callback.answer()
+    label = _GAME_LABELS_ADMIN[game_type]
+    coeffs = await load_coeffs(session, game_type)
+    await callback.answer()
+    await callback.message.edit_text(f"⏳ Симуляция {label}…")
+
+    try:
+        report = await run_simulation(game_type, coeffs)
+    except Exception as e:
+        await callback.message.edit_text(f"❌ Ошибка симуляции: {html.escape(str(e))}", reply_markup=game_sim_kb(game_type))
+        return
+
+    coeff_text = ", ".join(f"{name} x{value:g}" for name, value in coeffs.items())
+    edge = 1 - report.exact_rtp
+    rounds = f"{report.rounds:,}".replace(",", " ")
+    await callback.message.edit_text(
+        f"🧮 <b>RTP — {label}</b>\n\n"
+        f"Коэффициенты: <b>{coeff_text}</b>\n"
+        f"Раундов: <b>{rounds}</b>\n\n"
+        f"🎯 RTP (симуляция): <b>{report.rtp:.2%}</b> ± {report.rtp_ci:.2%}\n"
+        f"📐 RTP (точный): <b>{report.exact_rtp:.2%}</b>\n"
+        f"🏦 Преимущество казино: <b>{edge:.2%}</b>{' ⚠️' if edge < 0 else ''}\n"
+        f"🎲 Частота выигрыша: <b>{report.hit_rate:.2%}</b>\n"
+        f"📊 Дисперсия раунда: <b>{report.variance:.3f}</b> (ставок²)\n"
+        f"💀 Разорение игрока ({RUIN_BANKROLL} ставок за {RUIN_HORIZON} раундов): "
+        f"<b>{report.ruin_probability:.1%}</b>",
+        parse_mode="HTML",
+        reply_markup=game_sim_kb(game_type),
+    )
+
+
+@callbacks("agame:toggle:{game_type}")
+async def cb_admin_game_toggle(callback: CallbackQuery, game_type: str, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+
+    key = f"game_{game_type}_enabled"
+    row = await session.get(BotSettings, key)
+    new_val = "0" if (row and row.value == "1") else "1"
+    await set_setting(session, key, new_val)
+    if new_val == "1":
+        game_monitor.rearm(game_type)
+
+    await callback.answer("Статус изменён.")
+    # Refresh info page
+    await cb_admin_game_info(callback, game_type, session)
+
+
+@callbacks("agame:coeff:{game_type}")
+async def cb_admin_game_coeff(callback: CallbackQuery, game_type: str, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await state.set_state(AdminGameStates.set_coeff)
+    await state.update_data(game_type=game_type)
+    await callback.message.edit_text(
+        f"📈 Введи новый коэффициент для {_GAME_LABELS_ADMIN[game_type]} (например: 3.0):"
+    )
+    await callback.answer()
+
+
+@callbacks("agame:coeff1:{game_type}")
+async def cb_admin_game_coeff1(callback: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await state.set_state(AdminGameStates.set_coeff1)
+    await state.update_data(game_type="slots")
+    await callback.message.edit_text("📈 Введи коэффициент Tier 1 🎰 (значения 1–3), например: 5.0:")
+    await callback.answer()
+
+
+@callbacks("agame:coeff2:{game_type}")
+async def cb_admin_game_coeff2(callback: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await state.set_state(AdminGameStates.set_coeff2)
+    await state.update_data(game_type="slots")
+    await callback.message.edit_text("📈 Введи коэффициент Tier 2 🎰 (значения 4–10), например: 2.0:")
+    await callback.answer()
+
+
+@callbacks("agame:min_bet:{game_type}")
+async def cb_admin_game_min_bet(callback: CallbackQuery, game_type: str, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await state.set_state(AdminGameStates.set_min_bet)
+    await state.update_data(game_type=game_type)
+    await callback.message.edit_text(f"💰 Введи минимальную ставку для {_GAME_LABELS_ADMIN[game_type]} (например: 1):")
+    await callback.answer()
+
+
+@callbacks("agame:daily_limit:{game_type}")
+async def cb_admin_game_daily_limit(callback: CallbackQuery, game_type: str, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await state.set_state(AdminGameStates.set_daily_limit)
+    await state.update_data(game_type=game_type)
+    await callback.message.edit_text(
+        f"🔢 Введи лимит игр в день для {_GAME_LABELS_ADMIN[game_type]}:\n(0 = без ограничений)"
+    )
+    await callback.answer()
+
+
+@router.message(AdminGameStates.set_coeff)
+async def msg_admin_game_coeff(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    try:
+        val = float(message.text.strip().replace(",", "."))
+        if val <= 0:
+            raise ValueError
+    except ValueError:
+        await message.answer("❌ Введи положительное число:")
+        return
+    data = await state.get_data()
+    await state.clear()
+    game_type = data["game_type"]
+    await set_setting(session, f"game_{game_type}_coeff", str(val))
+    await message.answer(
+        f"✅ Коэффициент {_GAME_LABELS_ADMIN[game_type]} установлен: <b>x{val}</b>",
+        parse_mode="HTML",
+        reply_markup=admin_main_kb(),
+    )
+
+
+@router.message(AdminGameStates.set_coeff1)
+async def msg_admin_game_coeff1(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    try:
+        val = float(message.text.strip().replace(",", "."))
+        if val <= 0:
+            raise ValueError
+    except ValueError:
+        await message.answer("❌ Введи положительное число:")
+        return
+    await state.clear()
+    await set_setting(session, "game_slots_coeff1", str(val))
+    await message.answer(
+        f"✅ Коэффициент Tier 1 🎰 установлен: <b>x{val}</b>",
+        parse_mode="HTML",
+        reply_markup=admin_main_kb(),
+    )
+
+
+@router.message(AdminGameStates.set_coeff2)
+async def msg_admin_game_coeff2(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    try:
+        val = float(message.text.strip().replace(",", "."))
+        if val <= 0:
+            raise ValueError
+    except ValueError:
+        await message.answer("❌ Введи положительное число:")
+        return
+    await state.clear()
+    await set_setting(session, "game_slots_coeff2", str(val))
+    await message.answer(
+        f"✅ Коэффициент Tier 2 🎰 установлен: <b>x{val}</b>",
+        parse_mode="HTML",
+        reply_markup=admin_main_kb(),
+    )
+
+
+@router.message(AdminGameStates.set_min_bet)
+async def msg_admin_game_min_bet(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    try:
+        val = float(message.text.strip().replace(",", "."))
+        if val <= 0:
+            raise ValueError
+    except ValueError:
+        await message.answer("❌ Введи положительное число:")
+        return
+    data = await state.get_data()
+    await state.clear()
+    game_type = data["game_type"]
+    await set_setting(session, f"game_{game_type}_min_bet", str(val))
+    await message.answer(
+        f"✅ Мин. ставка {_GAME_LABELS_ADMIN[game_type]}: <b>{val:.0f} ⭐</b>",
+        parse_mode="HTML",
+        reply_markup=admin_main_kb(),
+    )
+
+
+@router.message(AdminGameStates.set_daily_limit)
+async def msg_admin_game_daily_limit(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    try:
+        val = int(message.text.strip())
+        if val < 0:
+            raise ValueError
+    except ValueError:
+        await message.answer("❌ Введи целое неотрицательное число (0 = без лимита):")
+        return
+    data = await state.get_data()
+    await state.clear()
+    game_type = data["game_type"]
+    await set_setting(session, f"game_{game_type}_daily_limit", str(val))
+    limit_text = str(val) if val > 0 else "∞ (без лимита)"
+    await message.answer(
+        f"✅ Лимит в день {_GAME_LABELS_ADMIN[game_type]}: <b>{limit_text}</b>",
+        parse_mode="HTML",
+        reply_markup=admin_main_kb(),
+    )
+
+
+# ─── Button Content Management ────────────────────────────────────────────────
+
+async def _show_button_content_list(target, session: AsyncSession) -> None:
+    contents = {}
+    for key in BUTTON_KEYS:
+        row = await get_button_content(session, key)
+        contents[key] = bool(row and (row.photo_file_id or row.text))
+
+    text = (
+        "🖼 <b>Фото и текст кнопок</b>\n\n"
+        "🖼 — настроено  |  ⬜ — пусто\n\n"
+        "Нажми на кнопку, чтобы настроить фото и текст для неё:"
+    )
+    if isinstance(target, CallbackQuery):
+        await target.message.edit_text(text, parse_mode="HTML", reply_markup=button_content_list_kb(contents))
+        await target.answer()
+    else:
+        await target.answer(text, parse_mode="HTML", reply_markup=button_content_list_kb(contents))
+
+
+@callbacks("admin:button_content")
+async def cb_button_content(callback: CallbackQuery, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await _show_button_content_list(callback, session)
+
+
+async def _show_button_edit(target, session: AsyncSession, button_key: str) -> None:
+    label = BUTTON_KEYS.get(button_key, button_key)
+    row = await get_button_content(session, button_key)
+    has_photo = bool(row and row.photo_file_id)
+    has_text = bool(row and row.text)
+
+    photo_status = "✅ Установлено" if has_photo else "❌ Не установлено"
+    text_status = f"✅ Установлен ({len(row.text)} симв.)" if has_text else "❌ Не установлен"
+
+    info = (
+        f"🖼 <b>{label}</b>\n\n"
+        f"Фото: {photo_status}\n"
+        f"Текст: {text_status}"
+    )
+
+    send = target.message.edit_text if isinstance(target, CallbackQuery) else target.answer
+    kb = button_edit_kb(button_key, has_photo, has_text)
+    await send(info, parse_mode="HTML", reply_markup=kb)
+    if isinstance(target, CallbackQuery):
+        await target.answer()
+
+
+@callbacks("admin:btn_edit:{button_key:path}")
+async def cb_btn_edit(callback: CallbackQuery, button_key: str, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    if button_key not in BUTTON_KEYS:
+        return await callback.answer("Кнопка не найдена.", show_alert=True)
+    await _show_button_edit(callback, session, button_key)
+
+
+@callbacks("admin:btn_set_photo:{button_key:path}")
+async def cb_btn_set_photo(callback: CallbackQuery, button_key: str, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await state.set_state(AdminButtonContentStates.set_photo)
+    await state.update_data(button_key=button_key)
+    await callback.message.edit_text(
+        f"🖼 Отправь фото для кнопки <b>{BUTTON_KEYS.get(button_key, button_key)}</b>:\n\n"
+        "Просто пришли изображение в этот чат.",
+        parse_mode="HTML",
+    )
+    await callback.answer()
+
+
+@router.message(AdminButtonContentStates.set_photo)
+async def msg_btn_set_photo(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    if not message.photo:
+        await message.answer("❌ Пришли именно фото (изображение), а не файл или текст.")
+        return
+    data = await state.get_data()
+    await state.clear()
+    button_key = data["button_key"]
+    file_id = message.photo[-1].file_id
+    await set_button_photo(session, button_key, file_id)
+    await message.answer(
+        f"✅ Фото для кнопки <b>{BUTTON_KEYS.get(button_key, button_key)}</b> установлено!",
+        parse_mode="HTML",
+        reply_markup=button_edit_kb(
+            button_key,
+            has_photo=True,
+            has_text=bool((await get_button_content(session, button_key)) and
+                          (await get_button_content(session, button_key)).text),
+        ),
+    )
+
+
+@callbacks("admin:btn_set_text:{button_key:path}")
+async def cb_btn_set_text(callback: CallbackQuery, button_key: str, state: FSMContext) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await state.set_state(AdminButtonContentStates.set_text)
+    await state.update_data(button_key=button_key)
+    await callback.message.edit_text(
+        f"📝 Введи текст для кнопки <b>{BUTTON_KEYS.get(button_key, button_key)}</b>:\n\n"
+        "Поддерживается HTML-разметка: <b>жирный</b>, <i>курсив</i>, <code>моноширинный</code>.",
+        parse_mode="HTML",
+    )
+    await callback.answer()
+
+
+@router.message(AdminButtonContentStates.set_text)
+async def msg_btn_set_text(message: Message, state: FSMContext, session: AsyncSession) -> None:
+    data = await state.get_data()
+    await state.clear()
+    button_key = data["button_key"]
+    await set_button_text(session, button_key, message.text or message.caption or "")
+    row = await get_button_content(session, button_key)
+    await message.answer(
+        f"✅ Текст для кнопки <b>{BUTTON_KEYS.get(button_key, button_key)}</b> установлен!",
+        parse_mode="HTML",
+        reply_markup=button_edit_kb(
+            button_key,
+            has_photo=bool(row and row.photo_file_id),
+            has_text=True,
+        ),
+    )
+
+
+@callbacks("admin:btn_del_photo:{button_key:path}")
+async def cb_btn_del_photo(callback: CallbackQuery, button_key: str, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await set_button_photo(session, button_key, None)
+    await callback.answer("Фото удалено.")
+    await _show_button_edit(callback, session, button_key)
+
+
+@callbacks("admin:btn_del_text:{button_key:path}")
+async def cb_btn_del_text(callback: CallbackQuery, button_key: str, session: AsyncSession) -> None:
+    if not is_admin(callback.from_user.id):
+        return await callback.answer("Нет доступа.", show_alert=True)
+    await set_button_text(session, button_key, None)
+    await callback.answer("Текст удалён.")
+    await _show_button_edit(callback, session, button_key)
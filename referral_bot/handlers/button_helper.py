@@ -1,85 +1,123 @@
-from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from database.engine import get_button_content
-
-
-async def answer_with_content(
-    callback: CallbackQuery,
-    session: AsyncSession,
-    button_key: str,
-    default_text: str,
-    keyboard: InlineKeyboardMarkup,
-) -> None:
-    """Send response with optional photo+text configured by admin.
-
-    If admin set a photo for this button — deletes current message and sends
-    a new photo message with caption (admin text or default_text).
-    If admin set only text — shows that text instead of default.
-    If nothing is configured — shows default_text via edit_text.
-    """
-    content = await get_button_content(session, button_key)
-
-    has_photo = bool(content and content.photo_file_id)
-    text = (content.text if content and content.text else None) or default_text
-
-    if has_photo:
-        try:
-            await callback.message.delete()
-        except Exception:
-            pass
-        await callback.message.answer_photo(
-            photo=content.photo_file_id,
-            caption=text,
-            parse_mode="HTML",
-            reply_markup=keyboard,
-        )
-    else:
-        try:
-            await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
-        except Exception:
-            try:
-                await callback.message.delete()
-            except Exception:
-                pass
-            await callback.message.answer(text, parse_mode="HTML", reply_markup=keyboard)
-
-
-async def safe_edit(
-    callback: CallbackQuery,
-    text: str,
-    keyboard: InlineKeyboardMarkup,
-) -> None:
-    """Edit message text; if it's a photo message — delete it and send a new text message."""
-    try:
-        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
-    except Exception:
-        try:
-            await callback.message.delete()
-        except Exception:
-            pass
-        await callback.message.answer(text, parse_mode="HTML", reply_markup=keyboard)
-
-
-async def send_with_content(
-    message: Message,
-    session: AsyncSession,
-    button_key: str,
-    default_text: str,
-    keyboard: InlineKeyboardMarkup,
-) -> None:
-    """Same as answer_with_content but for plain Message (e.g. /start command)."""
-    content = await get_button_content(session, button_key)
-
-    has_photo = bool(content and content.photo_file_id)
-    text = (content.text if content and content.text else None) or default_text
-
-    if has_photo:
-        await message.answer_photo(
-            photo=content.photo_file_id,
-            caption=text,
-            parse_mode="HTML",
-            reply_markup=keyboard,
-        )
-    else:
-        await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+"""Menu rendering with admin-configured photo/text per button.
+
+Navigation edits the callback's message in place with the one call that fits its kind:
+text → text is edit_text, photo → photo is edit_caption (same photo) or edit_media (another
+photo). Only a change of kind (text ↔ photo), which Telegram cannot edit, costs a delete plus
+a new message. The photo each menu message shows is remembered, so a caption-only edit can be
+chosen without comparing file ids Telegram rewrote.
+"""
+from collections import OrderedDict
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InputMediaPhoto, Message
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.engine import get_button_content
+
+# (chat_id, message_id) → photo file_id the bot last put on that message
+_shown_photos: OrderedDict[tuple[int, int], str] = OrderedDict()
+_SHOWN_PHOTOS_SIZE = 100_000
+
+
+def _remember_photo(message: Message, photo: str) -> None:
+    key = (message.chat.id, message.message_id)
+    _shown_photos[key] = photo
+    _shown_photos.move_to_end(key)
+    if len(_shown_photos) > _SHOWN_PHOTOS_SIZE:
+        _shown_photos.popitem(last=False)
+
+
+async def _show(
+    callback: CallbackQuery,
+    text: str,
+    keyboard: InlineKeyboardMarkup,
+    photo: str | None = None,
+) -> None:
+    """Replace the callback's message with `text`, as the caption of `photo` when it is set."""
+    message = callback.message
+    # InaccessibleMessage (too old to edit) has neither a photo attribute nor edit methods
+    if isinstance(message, Message) and bool(message.photo) == bool(photo):
+        key = (message.chat.id, message.message_id)
+        try:
+            if not photo:
+                await message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+            elif _shown_photos.get(key) == photo:
+                await message.edit_caption(caption=text, parse_mode="HTML", reply_markup=keyboard)
+            else:
+                await message.edit_media(
+                    InputMediaPhoto(media=photo, caption=text, parse_mode="HTML"),
+                    reply_markup=keyboard,
+                )
+                _remember_photo(message, photo)
+            return
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                return
+        except Exception:
+            pass
+
+    try:
+        await message.delete()
+    except Exception:
+        pass
+    _shown_photos.pop((message.chat.id, message.message_id), None)
+    if photo:
+        sent = await message.answer_photo(photo=photo, caption=text, parse_mode="HTML", reply_markup=keyboard)
+        _remember_photo(sent, photo)
+    else:
+        await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+
+
+async def answer_with_content(
+    callback: CallbackQuery,
+    session: AsyncSession,
+    button_key: str,
+    default_text: str,
+    keyboard: InlineKeyboardMarkup,
+) -> None:
+    """Send response with optional photo+text configured by admin.
+
+    If admin set a photo for this button — shows it with a caption (admin text or
+    default_text), editing the current message when it is a photo too.
+    If admin set only text — shows that text instead of default.
+    If nothing is configured — shows default_text.
+    """
+    content = await get_button_content(session, button_key)
+
+    photo = content.photo_file_id if content and content.photo_file_id else None
+    text = (content.text if content and content.text else None) or default_text
+    await _show(callback, text, keyboard, photo)
+
+
+async def safe_edit(
+    callback: CallbackQuery,
+    text: str,
+    keyboard: InlineKeyboardMarkup,
+) -> None:
+    """Edit message text; if it's a photo message — delete it and send a new text message."""
+    await _show(callback, text, keyboard)
+
+
+async def send_with_content(
+    message: Message,
+    session: AsyncSession,
+    button_key: str,
+    default_text: str,
+    keyboard: InlineKeyboardMarkup,
+) -> None:
+    """Same as answer_with_content but for plain Message (e.g. /start command)."""
+    content = await get_button_content(session, button_key)
+
+    has_photo = bool(content and content.photo_file_id)
+    text = (content.text if content and content.text else None) or default_text
+
+    if has_photo:
+        sent = await message.answer_photo(
+            photo=content.photo_file_id,
+            caption=text,
+            parse_mode="HTML",
+            reply_markup=keyboard,
+        )
+        _remember_photo(sent, content.photo_file_id)
+    else:
+        await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
@@ -0,0 +1,164 @@
+"""Callback-query routing through a trie of callback_data segments.
+
+Handlers register patterns such as "task:view:{task_id:int}". callback_data is split on ":"
+once per update and walked segment by segment; literal segments are dict lookups, so the cost
+does not grow with the number of handlers. Fields reach the handler as typed keyword
+arguments: {name} is a string, {name:int} a non-negative int, {name:a|b} one of the listed
+values and {name:path} the rest of the data (colons included).
+aiogram itself sees a single callback handler whose filter is the trie lookup, so the usual
+middlewares and dependency injection (session, db_user, state, bot…) apply unchanged.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.fsm.state import State
+from aiogram.types import CallbackQuery
+
+# ":" separates segments, except inside {name:type}
+_SEGMENT_SEP = re.compile(r":(?![^{]*\})")
+
+
+def _int(segment: str) -> int:
+    if not segment.isdigit():
+        raise ValueError(segment)
+    return int(segment)
+
+
+def _converter(kind: str) -> Callable[[str], Any]:
+    if kind == "str":
+        return str
+    if kind == "int":
+        return _int
+    if "|" in kind:
+        allowed = frozenset(kind.split("|"))
+
+        def choice(segment: str) -> str:
+            if segment not in allowed:
+                raise ValueError(segment)
+            return segment
+        return choice
+    raise ValueError(f"Unknown callback field type: {kind}")
+
+
+@dataclass(slots=True)
+class Route:
+    pattern: str
+    handler: CallableObject
+    # raw FSM states the route is limited to; None = any state
+    states: frozenset[str] | None
+
+
+@dataclass(slots=True)
+class _Node:
+    children: dict[str, "_Node"] = field(default_factory=dict)
+    # (name, type, converter, child) of a {name:type} segment, tried in registration order
+    params: list[tuple[str, str, Callable[[str], Any], "_Node"]] = field(default_factory=list)
+    # {name:path} tails: name → routes
+    tails: dict[str, list[Route]] = field(default_factory=dict)
+    routes: list[Route] = field(default_factory=list)
+
+
+class CallbackRouter:
+    def __init__(self, name: str = "callbacks") -> None:
+        self.router = Router(name=name)
+        self.routes: list[Route] = []
+        self._root = _Node()
+        self.router.callback_query.register(self._dispatch, self._match)
+
+    def __call__(self, *patterns: str, state: State | tuple[State, ...] | None = None):
+        """Register the decorated handler for each pattern, optionally only in `state`."""
+        states = None
+        if state is not None:
+            states = frozenset(s.state for s in (state if isinstance(state, tuple) else (state,)))
+
+        def decorator(func):
+            handler = CallableObject(callback=func)
+            for pattern in patterns:
+                route = Route(pattern, handler, states)
+                self._add(route)
+                self.routes.append(route)
+            return func
+        return decorator
+
+    def _add(self, route: Route) -> None:
+        node = self._root
+        segments = _SEGMENT_SEP.split(route.pattern)
+        for i, segment in enumerate(segments):
+            if not (segment.startswith("{") and segment.endswith("}")):
+                node = node.children.setdefault(segment, _Node())
+                continue
+            name, _, kind = segment[1:-1].partition(":")
+            kind = kind or "str"
+            if kind == "path":
+                if i != len(segments) - 1:
+                    raise ValueError(f"{{{name}:path}} must be the last segment: {route.pattern}")
+                node.tails.setdefault(name, []).append(route)
+                return
+            for p_name, p_kind, _, child in node.params:
+                if (p_name, p_kind) == (name, kind):
+                    node = child
+                    break
+            else:
+                child = _Node()
+                node.params.append((name, kind, _converter(kind), child))
+                node = child
+        node.routes.append(route)
+
+    @staticmethod
+    def _pick(routes: list[Route], raw_state: str | None) -> Route | None:
+        for route in routes:
+            if route.states is None or raw_state in route.states:
+                return route
+        return None
+
+    def _find(self, node: _Node, parts: list[str], i: int, params: dict, raw_state: str | None) -> Route | None:
+        if i == len(parts):
+            return self._pick(node.routes, raw_state)
+        child = node.children.get(parts[i])
+        if child is not None:
+            route = self._find(child, parts, i + 1, params, raw_state)
+            if route:
+                return route
+        for name, _, convert, child in node.params:
+            try:
+                params[name] = convert(parts[i])
+            except ValueError:
+                continue
+            route = self._find(child, parts, i + 1, params, raw_state)
+            if route:
+                return route
+            del params[name]
+        for name, routes in node.tails.items():
+            route = self._pick(routes, raw_state)
+            if route:
+                params[name] = ":".join(parts[i:])
+                return route
+        return None
+
+    def resolve(self, data: str, raw_state: str | None = None) -> tuple[Route, dict[str, Any]] | None:
+        params: dict[str, Any] = {}
+        route = self._find(self._root, data.split(":"), 0, params, raw_state)
+        return (route, params) if route else None
+
+    async def _match(self, callback: CallbackQuery, raw_state: str | None = None) -> dict[str, Any] | bool:
+        if not callback.data:
+            return False
+        found = self.resolve(callback.data, raw_state)
+        if found is None:
+            return False
+        return {"callback_route": found[0], "callback_params": found[1]}
+
+    @staticmethod
+    async def _dispatch(
+        callback: CallbackQuery,
+        callback_route: Route,
+        callback_params: dict[str, Any],
+        **data: Any,
+    ) -> Any:
+        return await callback_route.handler.call(callback, **data, **callback_params)
+
+
+callbacks = CallbackRouter()
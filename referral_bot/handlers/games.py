@@ -1,408 +1,635 @@
-from datetime import date, datetime
-
-from aiogram import Router, Bot
-from aiogram.types import CallbackQuery, Message
-from aiogram.fsm.context import FSMContext
-from aiogram.fsm.state import State, StatesGroup
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-
-from database.models import User, GameSession, BotSettings
-from handlers.button_helper import answer_with_content, safe_edit
-from keyboards.games import (
-    games_menu_kb, dice_side_kb, game_result_kb, game_cancel_kb,
-    GAME_TYPES, GAME_LABELS,
-)
-
-router = Router()
-
-GAME_EMOJIS = {
-    "football":   "⚽",
-    "basketball": "🏀",
-    "bowling":    "🎳",
-    "dice":       "🎲",
-    "slots":      "🎰",
-}
-
-GAME_DEFAULTS = {
-    "football":   {"coeff": 2.5,  "min_bet": 1.0, "daily_limit": 0},
-    "basketball": {"coeff": 1.25, "min_bet": 1.0, "daily_limit": 0},
-    "bowling":    {"coeff": 3.0,  "min_bet": 1.0, "daily_limit": 0},
-    "dice":       {"coeff": 1.5,  "min_bet": 1.0, "daily_limit": 0},
-    "slots":      {"coeff1": 6.0, "coeff2": 2.0, "min_bet": 1.0, "daily_limit": 0},
-}
-
-
-class GameStates(StatesGroup):
-    enter_bet = State()
-    choose_dice_side = State()
-
-
-# ─── Helpers ──────────────────────────────────────────────────────────────────
-
-async def _get_float(session: AsyncSession, key: str, default: float) -> float:
-    row = await session.get(BotSettings, key)
-    if row:
-        try:
-            return float(row.value)
-        except ValueError:
-            pass
-    return default
-
-
-async def _get_int(session: AsyncSession, key: str, default: int) -> int:
-    row = await session.get(BotSettings, key)
-    if row:
-        try:
-            return int(row.value)
-        except ValueError:
-            pass
-    return default
-
-
-async def _is_enabled(session: AsyncSession, game: str) -> bool:
-    row = await session.get(BotSettings, f"game_{game}_enabled")
-    return (row.value == "1") if row else True
-
-
-async def _get_daily_count(session: AsyncSession, user_id: int, game: str) -> int:
-    today_start = datetime.combine(date.today(), datetime.min.time())
-    result = await session.execute(
-        select(func.count(GameSession.id)).where(
-            GameSession.user_id == user_id,
-            GameSession.game_type == game,
-            GameSession.played_at >= today_start,
-        )
-    )
-    return result.scalar() or 0
-
-
-async def _load_games_config(session: AsyncSession) -> dict:
-    configs = {}
-    for game in GAME_TYPES:
-        enabled_row = await session.get(BotSettings, f"game_{game}_enabled")
-        min_bet_row = await session.get(BotSettings, f"game_{game}_min_bet")
-        cfg = {
-            "enabled": (enabled_row.value == "1") if enabled_row else True,
-            "min_bet": float(min_bet_row.value) if min_bet_row else 1.0,
-        }
-        if game == "slots":
-            c1 = await _get_float(session, "game_slots_coeff1", 6.0)
-            c2 = await _get_float(session, "game_slots_coeff2", 2.0)
-            cfg["coeff_label"] = f"x{c2:.4g}–x{c1:.4g}"
-        else:
-            default = GAME_DEFAULTS[game]["coeff"]
-            c = await _get_float(session, f"game_{game}_coeff", default)
-            cfg["coeff_label"] = f"x{c:.4g}"
-        configs[game] = cfg
-    return configs
-
-
-async def _execute_game(
-    bot: Bot,
-    chat_id: int,
-    session: AsyncSession,
-    db_user: User,
-    game_type: str,
-    bet: float,
-    dice_side: str | None = None,
-) -> tuple[bool, float, int]:
-    """Send dice, evaluate result, update balance and record session.
-    Returns (won, payout, dice_value). Bet must be deducted before calling."""
-    dice_msg = await bot.send_dice(chat_id=chat_id, emoji=GAME_EMOJIS[game_type])
-    value = dice_msg.dice.value
-
-    won = False
-    payout = 0.0
-
-    if game_type == "football":
-        coeff = await _get_float(session, "game_football_coeff", 3.0)
-        if value == 5:
-            won, payout = True, round(bet * coeff, 2)
-
-    elif game_type == "basketball":
-        coeff = await _get_float(session, "game_basketball_coeff", 2.5)
-        if value in (4, 5):
-            won, payout = True, round(bet * coeff, 2)
-
-    elif game_type == "bowling":
-        coeff = await _get_float(session, "game_bowling_coeff", 4.0)
-        if value == 6:
-            won, payout = True, round(bet * coeff, 2)
-
-    elif game_type == "dice":
-        coeff = await _get_float(session, "game_dice_coeff", 1.9)
-        if (dice_side == "high" and value > 3) or (dice_side == "low" and value < 4):
-            won, payout = True, round(bet * coeff, 2)
-
-    elif game_type == "slots":
-        coeff1 = await _get_float(session, "game_slots_coeff1", 5.0)
-        coeff2 = await _get_float(session, "game_slots_coeff2", 2.0)
-        if 1 <= value <= 3:
-            won, payout = True, round(bet * coeff1, 2)
-        elif 4 <= value <= 10:
-            won, payout = True, round(bet * coeff2, 2)
-
-    if won:
-        db_user.stars_balance += payout
-
-    session.add(GameSession(
-        user_id=db_user.user_id,
-        game_type=game_type,
-        bet=bet,
-        result="win" if won else "lose",
-        payout=payout,
-    ))
-    await session.commit()
-
-    return won, payout, value
-
-
-def _result_text(
-    game_type: str,
-    won: bool,
-    bet: float,
-    payout: float,
-    value: int,
-    new_balance: float,
-    dice_side: str | None = None,
-) -> str:
-    label = GAME_LABELS[game_type]
-
-    desc_lines = {
-        "football":   "⚽ Гол!" if won else "⚽ Промах.",
-        "basketball": "🏀 Попадание!" if won else "🏀 Мимо.",
-        "bowling":    "🎳 Страйк!" if won else "🎳 Не страйк.",
-        "dice":       f"🎲 Выпало: <b>{value}</b> | {'📈 Больше 3' if dice_side == 'high' else '📉 Меньше 4'}",
-        "slots":      f"🎰 Значение: <b>{value}</b>",
-    }
-
-    if won:
-        profit = round(payout - bet, 2)
-        result_line = f"🎉 <b>Выигрыш! +{payout:.2f} ⭐</b>"
-        extra = f"Прибыль: +{profit:.2f} ⭐"
-    else:
-        result_line = f"😞 <b>Проигрыш. -{bet:.2f} ⭐</b>"
-        extra = ""
-
-    parts = [
-        f"<b>{label}</b>",
-        "",
-        desc_lines.get(game_type, ""),
-        result_line,
-    ]
-    if extra:
-        parts.append(extra)
-    parts.append(f"\n💰 Баланс: <b>{new_balance:.2f} ⭐</b>")
-    return "\n".join(parts)
-
-
-# ─── Games menu ───────────────────────────────────────────────────────────────
-
-@router.callback_query(lambda c: c.data == "menu:games")
-async def cb_games_menu(
-    callback: CallbackQuery,
-    session: AsyncSession,
-    db_user: User,
-    state: FSMContext,
-) -> None:
-    # Refund bet if user cancels during dice-side selection
-    fsm_state = await state.get_state()
-    if fsm_state == GameStates.choose_dice_side:
-        data = await state.get_data()
-        bet = data.get("bet", 0.0)
-        if bet:
-            db_user.stars_balance += bet
-            await session.commit()
-    await state.clear()
-
-    configs = await _load_games_config(session)
-    has_any = any(cfg["enabled"] for cfg in configs.values())
-
-    if has_any:
-        default_text = (
-            f"🎮 <b>Игры</b>\n\n"
-            f"Твой баланс: <b>{db_user.stars_balance:.2f} ⭐</b>\n\n"
-            f"Выбери игру:"
-        )
-    else:
-        default_text = "🎮 <b>Игры</b>\n\nИгры временно недоступны."
-
-    await answer_with_content(callback, session, "menu:games", default_text, games_menu_kb(configs))
-    await callback.answer()
-
-
-# ─── Select game → enter bet ──────────────────────────────────────────────────
-
-@router.callback_query(lambda c: c.data and c.data.startswith("game:play:"))
-async def cb_game_play(
-    callback: CallbackQuery,
-    session: AsyncSession,
-    db_user: User,
-    state: FSMContext,
-) -> None:
-    await state.clear()
-    game_type = callback.data.split(":")[2]
-
-    if game_type not in GAME_TYPES:
-        await callback.answer("Неизвестная игра.", show_alert=True)
-        return
-
-    if not await _is_enabled(session, game_type):
-        await callback.answer("Эта игра временно отключена.", show_alert=True)
-        return
-
-    daily_limit = await _get_int(session, f"game_{game_type}_daily_limit", 0)
-    if daily_limit > 0:
-        daily_count = await _get_daily_count(session, db_user.user_id, game_type)
-        if daily_count >= daily_limit:
-            await callback.answer(
-                f"⛔ Достигнут дневной лимит ({daily_limit} игр). Попробуй завтра.",
-                show_alert=True,
-            )
-            return
-
-    min_bet = await _get_float(session, f"game_{game_type}_min_bet", 1.0)
-
-    if db_user.stars_balance < min_bet:
-        await callback.answer(
-            f"❌ Недостаточно звёзд. Минимальная ставка: {min_bet:.0f} ⭐",
-            show_alert=True,
-        )
-        return
-
-    await state.set_state(GameStates.enter_bet)
-    await state.update_data(game_type=game_type)
-
-    await safe_edit(
-        callback,
-        f"<b>{GAME_LABELS[game_type]}</b>\n\n"
-        f"💰 Твой баланс: <b>{db_user.stars_balance:.2f} ⭐</b>\n"
-        f"Минимальная ставка: <b>{min_bet:.0f} ⭐</b>\n\n"
-        f"Введи сумму ставки:",
-        game_cancel_kb(),
-    )
-    await callback.answer()
-
-
-# ─── Bet entered ──────────────────────────────────────────────────────────────
-
-@router.message(GameStates.enter_bet)
-async def msg_bet_enter(
-    message: Message,
-    session: AsyncSession,
-    db_user: User,
-    state: FSMContext,
-) -> None:
-    data = await state.get_data()
-    game_type = data["game_type"]
-
-    try:
-        bet = float(message.text.strip().replace(",", "."))
-    except ValueError:
-        await message.answer(
-            "❌ Введи число — сумму ставки:",
-            reply_markup=game_cancel_kb(),
-        )
-        return
-
-    if bet <= 0:
-        await message.answer("❌ Ставка должна быть больше нуля:", reply_markup=game_cancel_kb())
-        return
-
-    min_bet = await _get_float(session, f"game_{game_type}_min_bet", 1.0)
-    if bet < min_bet:
-        await message.answer(
-            f"❌ Минимальная ставка: <b>{min_bet:.0f} ⭐</b>",
-            parse_mode="HTML",
-            reply_markup=game_cancel_kb(),
-        )
-        return
-
-    if db_user.stars_balance < bet:
-        await message.answer(
-            f"❌ Недостаточно звёзд. Баланс: <b>{db_user.stars_balance:.2f} ⭐</b>",
-            parse_mode="HTML",
-            reply_markup=game_cancel_kb(),
-        )
-        return
-
-    # Deduct bet before game starts
-    db_user.stars_balance -= bet
-    await session.commit()
-
-    # Dice needs side selection first
-    if game_type == "dice":
-        await state.set_state(GameStates.choose_dice_side)
-        await state.update_data(bet=bet)
-        await message.answer(
-            f"🎲 <b>Кубики</b>\n\n"
-            f"Ставка: <b>{bet:.0f} ⭐</b>\n\n"
-            f"Выбери условие победы:",
-            parse_mode="HTML",
-            reply_markup=dice_side_kb(),
-        )
-        return
-
-    await state.clear()
-
-    try:
-        won, payout, value = await _execute_game(
-            bot=message.bot,
-            chat_id=message.chat.id,
-            session=session,
-            db_user=db_user,
-            game_type=game_type,
-            bet=bet,
-        )
-    except Exception:
-        # Refund on send error
-        db_user.stars_balance += bet
-        await session.commit()
-        await message.answer("⚠️ Ошибка при отправке игры. Ставка возвращена.", reply_markup=game_cancel_kb())
-        return
-
-    await message.answer(
-        _result_text(game_type, won, bet, payout, value, db_user.stars_balance),
-        parse_mode="HTML",
-        reply_markup=game_result_kb(game_type),
-    )
-
-
-# ─── Dice: choose side ────────────────────────────────────────────────────────
-
-@router.callback_query(GameStates.choose_dice_side, lambda c: c.data and c.data.startswith("game:dice:"))
-async def cb_dice_side(
-    callback: CallbackQuery,
-    session: AsyncSession,
-    db_user: User,
-    state: FSMContext,
-) -> None:
-    dice_side = callback.data.split(":")[2]  # "high" or "low"
-    data = await state.get_data()
-    bet = data["bet"]
-    await state.clear()
-
-    try:
-        won, payout, value = await _execute_game(
-            bot=callback.bot,
-            chat_id=callback.message.chat.id,
-            session=session,
-            db_user=db_user,
-            game_type="dice",
-            bet=bet,
-            dice_side=dice_side,
-        )
-    except Exception:
-        db_user.stars_balance += bet
-        await session.commit()
-        await callback.message.answer("⚠️ Ошибка при отправке игры. Ставка возвращена.", reply_markup=game_cancel_kb())
-        await callback.answer()
-        return
-
-    await callback.message.answer(
-        _result_text("dice", won, bet, payout, value, db_user.stars_balance, dice_side),
-        parse_mode="HTML",
-        reply_markup=game_result_kb("dice"),
-    )
-    await callback.answer()
+import asyncio
+from datetime import date, datetime
+
+from aiogram import Router, Bot
+from aiogram.types import CallbackQuery, Message
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, update
+
+from database.engine import get_settings_version
+from database.models import User, GameSession, BotSettings
+from handlers.callback_router import callbacks
+from handlers.button_helper import answer_with_content, safe_edit
+from keyboards.games import (
+    games_menu_kb, dice_side_kb, game_result_kb, game_cancel_kb, game_bet_kb, auto_rounds_kb,
+    GAME_TYPES, GAME_LABELS, AUTO_ROUNDS,
+)
+from services.game_monitor import game_monitor
+from services.games import evaluate, load_coeffs
+
+router = Router()
+
+GAME_EMOJIS = {
+    "football":   "⚽",
+    "basketball": "🏀",
+    "bowling":    "🎳",
+    "dice":       "🎲",
+    "slots":      "🎰",
+}
+
+GAME_DEFAULTS = {
+    "football":   {"coeff": 2.5,  "min_bet": 1.0, "daily_limit": 0},
+    "basketball": {"coeff": 1.25, "min_bet": 1.0, "daily_limit": 0},
+    "bowling":    {"coeff": 3.0,  "min_bet": 1.0, "daily_limit": 0},
+    "dice":       {"coeff": 1.5,  "min_bet": 1.0, "daily_limit": 0},
+    "slots":      {"coeff1": 6.0, "coeff2": 2.0, "min_bet": 1.0, "daily_limit": 0},
+}
+
+
+# Auto-bet dice sent to Telegram at once
+AUTO_SEND_CONCURRENCY = 5
+
+
+class GameStates(StatesGroup):
+    enter_bet = State()
+    choose_dice_side = State()
+    choose_rounds = State()
+
+
+# ─── Helpers ──────────────────────────────────────────────────────────────────
+
+async def _get_float(session: AsyncSession, key: str, default: float) -> float:
+    row = await session.get(BotSettings, key)
+    if row:
+        try:
+            return float(row.value)
+        except ValueError:
+            pass
+    return default
+
+
+async def _get_int(session: AsyncSession, key: str, default: int) -> int:
+    row = await session.get(BotSettings, key)
+    if row:
+        try:
+            return int(row.value)
+        except ValueError:
+            pass
+    return default
+
+
+async def _is_enabled(session: AsyncSession, game: str) -> bool:
+    row = await session.get(BotSettings, f"game_{game}_enabled")
+    return (row.value == "1") if row else True
+
+
+async def _get_daily_count(session: AsyncSession, user_id: int, game: str) -> int:
+    today_start = datetime.combine(date.today(), datetime.min.time())
+    result = await session.execute(
+        select(func.count(GameSession.id)).where(
+            GameSession.user_id == user_id,
+            GameSession.game_type == game,
+            GameSession.played_at >= today_start,
+        )
+    )
+    return result.scalar() or 0
+
+
+_games_config_cache: tuple[int, dict] | None = None
+
+
+async def _load_games_config(session: AsyncSession, version: int) -> dict:
+    """Game settings for the menu, reloaded only when the settings `version` changes."""
+    global _games_config_cache
+    if _games_config_cache and _games_config_cache[0] == version:
+        return _games_config_cache[1]
+    configs = {}
+    for game in GAME_TYPES:
+        enabled_row = await session.get(BotSettings, f"game_{game}_enabled")
+        min_bet_row = await session.get(BotSettings, f"game_{game}_min_bet")
+        cfg = {
+            "enabled": (enabled_row.value == "1") if enabled_row else True,
+            "min_bet": float(min_bet_row.value) if min_bet_row else 1.0,
+        }
+        if game == "slots":
+            c1 = await _get_float(session, "game_slots_coeff1", 6.0)
+            c2 = await _get_float(session, "game_slots_coeff2", 2.0)
+            cfg["coeff_label"] = f"x{c2:.4g}–x{c1:.4g}"
+        else:
+            default = GAME_DEFAULTS[game]["coeff"]
+            c = await _get_float(session, f"game_{game}_coeff", default)
+            cfg["coeff_label"] = f"x{c:.4g}"
+        configs[game] = cfg
+    _games_config_cache = (version, configs)
+    return configs
+
+
+async def _execute_game(
+    bot: Bot,
+    chat_id: int,
+    session: AsyncSession,
+    db_user: User,
+    game_type: str,
+    bet: float,
+    dice_side: str | None = None,
+) -> tuple[bool, float, int]:
+    """Send dice, evaluate result, update balance and record session.
+    Returns (won, payout, dice_value). Bet must be deducted before calling."""
+    dice_msg = await bot.send_dice(chat_id=chat_id, emoji=GAME_EMOJIS[game_type])
+    value = dice_msg.dice.value
+
+    won, payout = evaluate(game_type, value, bet, await load_coeffs(session, game_type), dice_side)
+
+    if won:
+        db_user.stars_balance += payout
+
+    session.add(GameSession(
+        user_id=db_user.user_id,
+        game_type=game_type,
+        bet=bet,
+        result="win" if won else "lose",
+        payout=payout,
+    ))
+    await session.commit()
+    await game_monitor.observe(bot, session, game_type, db_user.user_id, [(bet, payout)])
+
+    return won, payout, value
+
+
+async def _execute_auto(
+    bot: Bot,
+    chat_id: int,
+    session: AsyncSession,
+    db_user: User,
+    game_type: str,
+    bet: float,
+    rounds: int,
+    dice_side: str | None = None,
+) -> list[tuple[bool, float, int]]:
+    """Play `rounds` rounds: dice are sent concurrently, then all payouts and sessions are
+    written in one commit. Rounds whose dice could not be sent are refunded and left out of
+    the result. Bets (bet * rounds) must be deducted before calling."""
+    coeffs = await load_coeffs(session, game_type)
+    emoji = GAME_EMOJIS[game_type]
+    limit = asyncio.Semaphore(AUTO_SEND_CONCURRENCY)
+
+    async def roll() -> int:
+        async with limit:
+            return (await bot.send_dice(chat_id=chat_id, emoji=emoji)).dice.value
+
+    values = await asyncio.gather(*(roll() for _ in range(rounds)), return_exceptions=True)
+
+    results = []
+    for value in values:
+        if isinstance(value, BaseException):
+            continue
+        won, payout = evaluate(game_type, value, bet, coeffs, dice_side)
+        results.append((won, payout, value))
+    # refunds of unsent rounds and payouts, added to the balance as it is now
+    credit = bet * (rounds - len(results)) + sum(payout for _, payout, _ in results)
+    if credit:
+        await session.execute(
+            update(User).where(User.user_id == db_user.user_id).values(stars_balance=User.stars_balance + credit)
+        )
+    session.add_all([
+        GameSession(
+            user_id=db_user.user_id,
+            game_type=game_type,
+            bet=bet,
+            result="win" if won else "lose",
+            payout=payout,
+        )
+        for won, payout, _ in results
+    ])
+    await session.commit()
+    await session.refresh(db_user, ["stars_balance"])
+    await game_monitor.observe(bot, session, game_type, db_user.user_id, [(bet, payout) for _, payout, _ in results])
+    return results
+
+
+def _result_text(
+    game_type: str,
+    won: bool,
+    bet: float,
+    payout: float,
+    value: int,
+    new_balance: float,
+    dice_side: str | None = None,
+) -> str:
+    label = GAME_LABELS[game_type]
+
+    desc_lines = {
+        "football":   "⚽ Гол!" if won else "⚽ Промах.",
+        "basketball": "🏀 Попадание!" if won else "🏀 Мимо.",
+        "bowling":    "🎳 Страйк!" if won else "🎳 Не страйк.",
+        "dice":       f"🎲 Выпало: <b>{value}</b> | {'📈 Больше 3' if dice_side == 'high' else '📉 Меньше 4'}",
+        "slots":      f"🎰 Значение: <b>{value}</b>",
+    }
+
+    if won:
+        profit = round(payout - bet, 2)
+        result_line = f"🎉 <b>Выигрыш! +{payout:.2f} ⭐</b>"
+        extra = f"Прибыль: +{profit:.2f} ⭐"
+    else:
+        result_line = f"😞 <b>Проигрыш. -{bet:.2f} ⭐</b>"
+        extra = ""
+
+    parts = [
+        f"<b>{label}</b>",
+        "",
+        desc_lines.get(game_type, ""),
+        result_line,
+    ]
+    if extra:
+        parts.append(extra)
+    parts.append(f"\n💰 Баланс: <b>{new_balance:.2f} ⭐</b>")
+    return "\n".join(parts)
+
+
+def _auto_result_text(
+    game_type: str,
+    bet: float,
+    rounds: int,
+    results: list[tuple[bool, float, int]],
+    new_balance: float,
+    dice_side: str | None = None,
+) -> str:
+    wagered = bet * len(results)
+    paid = sum(payout for _, payout, _ in results)
+    wins = sum(1 for won, _, _ in results if won)
+    net = round(paid - wagered, 2)
+    title = f"<b>{GAME_LABELS[game_type]} — автоставка</b>"
+    if dice_side:
+        title += f" ({'📈 Больше 3' if dice_side == 'high' else '📉 Меньше 4'})"
+
+    rolls = " ".join(
+        f"<b>{value}</b>" if won else str(value)
+        for won, _, value in results
+    )
+    parts = [
+        title,
+        "",
+        f"🎲 Выпало: {rolls}",
+        f"Раундов: <b>{len(results)}</b> | Побед: <b>{wins}</b>",
+        f"Ставки: <b>{wagered:.2f} ⭐</b> | Выплаты: <b>{paid:.2f} ⭐</b>",
+        f"{'🎉' if net > 0 else '😞'} Итог: <b>{net:+.2f} ⭐</b>",
+    ]
+    if len(results) < rounds:
+        parts.append(f"⚠️ {rounds - len(results)} раунд(ов) не сыграно, ставки возвращены.")
+    parts.append(f"\n💰 Баланс: <b>{new_balance:.2f} ⭐</b>")
+    return "\n".join(parts)
+
+
+# ─── Games menu ───────────────────────────────────────────────────────────────
+
+@callbacks("menu:games")
+async def cb_games_menu(
+    callback: CallbackQuery,
+    session: AsyncSession,
+    db_user: User,
+    state: FSMContext,
+) -> None:
+    # Refund bet if user cancels during dice-side selection
+    fsm_state = await state.get_state()
+    if fsm_state == GameStates.choose_dice_side:
+        data = await state.get_data()
+        bet = data.get("bet", 0.0)
+        if bet:
+            db_user.stars_balance += bet
+            await session.commit()
+    await state.clear()
+
+    version = get_settings_version()
+    configs = await _load_games_config(session, version)
+    has_any = any(cfg["enabled"] for cfg in configs.values())
+
+    if has_any:
+        default_text = (
+            f"🎮 <b>Игры</b>\n\n"
+            f"Твой баланс: <b>{db_user.stars_balance:.2f} ⭐</b>\n\n"
+            f"Выбери игру:"
+        )
+    else:
+        default_text = "🎮 <b>Игры</b>\n\nИгры временно недоступны."
+
+    await answer_with_content(callback, session, "menu:games", default_text, games_menu_kb(configs, version))
+    await callback.answer()
+
+
+# ─── Select game → enter bet ──────────────────────────────────────────────────
+
+@callbacks("game:play:{game_type}")
+async def cb_game_play(
+    callback: CallbackQuery,
+    game_type: str,
+    session: AsyncSession,
+    db_user: User,
+    state: FSMContext,
+) -> None:
+    await state.clear()
+
+    if game_type not in GAME_TYPES:
+        await callback.answer("Неизвестная игра.", show_alert=True)
+        return
+
+    if not await _is_enabled(session, game_type):
+        await callback.answer("Эта игра временно отключена.", show_alert=True)
+        return
+
+    daily_limit = await _get_int(session, f"game_{game_type}_daily_limit", 0)
+    if daily_limit > 0:
+        daily_count = await _get_daily_count(session, db_user.user_id, game_type)
+        if daily_count >= daily_limit:
+            await callback.answer(
+                f"⛔ Достигнут дневной лимит ({daily_limit} игр). Попробуй завтра.",
+                show_alert=True,
+            )
+            return
+
+    min_bet = await _get_float(session, f"game_{game_type}_min_bet", 1.0)
+
+    if db_user.stars_balance < min_bet:
+        await callback.answer(
+            f"❌ Недостаточно звёзд. Минимальная ставка: {min_bet:.0f} ⭐",
+            show_alert=True,
+        )
+        return
+
+    await state.set_state(GameStates.enter_bet)
+    await state.update_data(game_type=game_type)
+
+    await safe_edit(
+        callback,
+        f"<b>{GAME_LABELS[game_type]}</b>\n\n"
+        f"💰 Твой баланс: <b>{db_user.stars_balance:.2f} ⭐</b>\n"
+        f"Минимальная ставка: <b>{min_bet:.0f} ⭐</b>\n\n"
+        f"Введи сумму ставки:",
+        game_bet_kb(game_type),
+    )
+    await callback.answer()
+
+
+@callbacks("game:auto:{game_type}", state=GameStates.enter_bet)
+async def cb_game_auto(
+    callback: CallbackQuery,
+    db_user: User,
+    state: FSMContext,
+) -> None:
+    data = await state.get_data()
+    game_type = data["game_type"]
+    await state.update_data(auto=True)
+    await safe_edit(
+        callback,
+        f"<b>{GAME_LABELS[game_type]} — автоставка</b>\n\n"
+        f"💰 Твой баланс: <b>{db_user.stars_balance:.2f} ⭐</b>\n\n"
+        f"Бот сыграет несколько раундов подряд с одной ставкой и пришлёт общий итог.\n"
+        f"Введи ставку за раунд:",
+        game_cancel_kb(),
+    )
+    await callback.answer()
+
+
+# ─── Bet entered ──────────────────────────────────────────────────────────────
+
+@router.message(GameStates.enter_bet)
+async def msg_bet_enter(
+    message: Message,
+    session: AsyncSession,
+    db_user: User,
+    state: FSMContext,
+) -> None:
+    data = await state.get_data()
+    game_type = data["game_type"]
+
+    try:
+        bet = float(message.text.strip().replace(",", "."))
+    except ValueError:
+        await message.answer(
+            "❌ Введи число — сумму ставки:",
+            reply_markup=game_cancel_kb(),
+        )
+        return
+
+    if bet <= 0:
+        await message.answer("❌ Ставка должна быть больше нуля:", reply_markup=game_cancel_kb())
+        return
+
+    min_bet = await _get_float(session, f"game_{game_type}_min_bet", 1.0)
+    if bet < min_bet:
+        await message.answer(
+            f"❌ Минимальная ставка: <b>{min_bet:.0f} ⭐</b>",
+            parse_mode="HTML",
+            reply_markup=game_cancel_kb(),
+        )
+        return
+
+    if db_user.stars_balance < bet:
+        await message.answer(
+            f"❌ Недостаточно звёзд. Баланс: <b>{db_user.stars_balance:.2f} ⭐</b>",
+            parse_mode="HTML",
+            reply_markup=game_cancel_kb(),
+        )
+        return
+
+    if data.get("auto"):
+        # Auto-bet: nothing is deducted until the rounds are chosen
+        await state.update_data(auto_bet=bet)
+        if game_type == "dice":
+            await state.set_state(GameStates.choose_dice_side)
+            await message.answer(
+                f"🎲 <b>Кубики — автоставка</b>\n\n"
+                f"Ставка за раунд: <b>{bet:.0f} ⭐</b>\n\n"
+                f"Выбери условие победы:",
+                parse_mode="HTML",
+                reply_markup=dice_side_kb(),
+            )
+        else:
+            await _ask_rounds(message, state, game_type, bet)
+        return
+
+    # Deduct bet before game starts
+    db_user.stars_balance -= bet
+    await session.commit()
+
+    # Dice needs side selection first
+    if game_type == "dice":
+        await state.set_state(GameStates.choose_dice_side)
+        await state.update_data(bet=bet)
+        await message.answer(
+            f"🎲 <b>Кубики</b>\n\n"
+            f"Ставка: <b>{bet:.0f} ⭐</b>\n\n"
+            f"Выбери условие победы:",
+            parse_mode="HTML",
+            reply_markup=dice_side_kb(),
+        )
+        return
+
+    await state.clear()
+
+    try:
+        won, payout, value = await _execute_game(
+            bot=message.bot,
+            chat_id=message.chat.id,
+            session=session,
+            db_user=db_user,
+            game_type=game_type,
+            bet=bet,
+        )
+    except Exception:
+        # Refund on send error
+        db_user.stars_balance += bet
+        await session.commit()
+        await message.answer("⚠️ Ошибка при отправке игры. Ставка возвращена.", reply_markup=game_cancel_kb())
+        return
+
+    await message.answer(
+        _result_text(game_type, won, bet, payout, value, db_user.stars_balance),
+        parse_mode="HTML",
+        reply_markup=game_result_kb(game_type),
+    )
+
+
+# ─── Dice: choose side ────────────────────────────────────────────────────────
+
+@callbacks("game:dice:{dice_side:high|low}", state=GameStates.choose_dice_side)
+async def cb_dice_side(
+    callback: CallbackQuery,
+    dice_side: str,
+    session: AsyncSession,
+    db_user: User,
+    state: FSMContext,
+) -> None:
+    data = await state.get_data()
+    if "auto_bet" in data:
+        await state.update_data(dice_side=dice_side)
+        await _ask_rounds(callback.message, state, "dice", data["auto_bet"], dice_side)
+        await callback.answer()
+        return
+    bet = data["bet"]
+    await state.clear()
+
+    try:
+        won, payout, value = await _execute_game(
+            bot=callback.bot,
+            chat_id=callback.message.chat.id,
+            session=session,
+            db_user=db_user,
+            game_type="dice",
+            bet=bet,
+            dice_side=dice_side,
+        )
+    except Exception:
+        db_user.stars_balance += bet
+        await session.commit()
+        await callback.message.answer("⚠️ Ошибка при отправке игры. Ставка возвращена.", reply_markup=game_cancel_kb())
+        await callback.answer()
+        return
+
+    await callback.message.answer(
+        _result_text("dice", won, bet, payout, value, db_user.stars_balance, dice_side),
+        parse_mode="HTML",
+        reply_markup=game_result_kb("dice"),
+    )
+    await callback.answer()
+
+
+# ─── Auto-bet: choose rounds and play ─────────────────────────────────────────
+
+async def _ask_rounds(
+    message: Message,
+    state: FSMContext,
+    game_type: str,
+    bet: float,
+    dice_side: str | None = None,
+) -> None:
+    await state.set_state(GameStates.choose_rounds)
+    side = ""
+    if dice_side:
+        side = f"Условие: <b>{'📈 Больше 3' if dice_side == 'high' else '📉 Меньше 4'}</b>\n"
+    await message.answer(
+        f"<b>{GAME_LABELS[game_type]} — автоставка</b>\n\n"
+        f"Ставка за раунд: <b>{bet:.0f} ⭐</b>\n"
+        f"{side}\n"
+        f"Сколько раундов сыграть?",
+        parse_mode="HTML",
+        reply_markup=auto_rounds_kb(),
+    )
+
+
+@callbacks("game:rounds:{rounds:int}", state=GameStates.choose_rounds)
+async def cb_auto_rounds(
+    callback: CallbackQuery,
+    rounds: int,
+    session: AsyncSession,
+    db_user: User,
+    state: FSMContext,
+) -> None:
+    if rounds not in AUTO_ROUNDS:
+        await callback.answer()
+        return
+    # Claim the choice before any other await: a second tap that also passed the state filter
+    # finds the data gone and stops here instead of playing the rounds again
+    data = await state.get_data()
+    await state.clear()
+    if "auto_bet" not in data:
+        await callback.answer()
+        return
+    game_type, bet, dice_side = data["game_type"], data["auto_bet"], data.get("dice_side")
+
+    async def keep_choosing(text: str) -> None:
+        await state.set_state(GameStates.choose_rounds)
+        await state.set_data(data)
+        await callback.answer(text, show_alert=True)
+
+    if not await _is_enabled(session, game_type):
+        await callback.answer("Эта игра временно отключена.", show_alert=True)
+        return
+
+    daily_limit = await _get_int(session, f"game_{game_type}_daily_limit", 0)
+    if daily_limit > 0:
+        left = daily_limit - await _get_daily_count(session, db_user.user_id, game_type)
+        if rounds > left:
+            await keep_choosing(f"⛔ Сегодня осталось игр: {max(left, 0)} из {daily_limit}.")
+            return
+
+    # Deduct all bets before the dice are sent, only if the balance covers them at this moment
+    total = bet * rounds
+    user_id = db_user.user_id
+    balance = await session.scalar(
+        update(User)
+        .where(User.user_id == user_id, User.stars_balance >= total)
+        .values(stars_balance=User.stars_balance - total)
+        .returning(User.stars_balance)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    await session.refresh(db_user, ["stars_balance"])
+    if balance is None:
+        await keep_choosing(f"❌ Недостаточно звёзд: нужно {total:.2f} ⭐, баланс {db_user.stars_balance:.2f} ⭐")
+        return
+
+    await callback.answer()
+    await safe_edit(callback, f"⏳ Играем {rounds} раундов…", None)
+
+    try:
+        results = await _execute_auto(
+            bot=callback.bot,
+            chat_id=callback.message.chat.id,
+            session=session,
+            db_user=db_user,
+            game_type=game_type,
+            bet=bet,
+            rounds=rounds,
+            dice_side=dice_side,
+        )
+    except Exception:
+        # The rollback expires db_user; refund with an atomic UPDATE instead of touching it
+        await session.rollback()
+        await session.execute(
+            update(User).where(User.user_id == user_id).values(stars_balance=User.stars_balance + total)
+        )
+        await session.commit()
+        await callback.message.answer("⚠️ Ошибка при отправке игры. Ставки возвращены.", reply_markup=game_cancel_kb())
+        return
+
+    if not results:
+        await callback.message.answer("⚠️ Ошибка при отправке игры. Ставки возвращены.", reply_markup=game_cancel_kb())
+        return
+
+    await callback.message.answer(
+        _auto_result_text(game_type, bet, rounds, results, db_user.stars_balance, dice_side),
+        parse_mode="HTML",
+        reply_markup=game_result_kb(game_type),
+    )
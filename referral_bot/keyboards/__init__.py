@@ -1,13 +1,18 @@
-from keyboards.main import main_menu_kb, back_to_menu_kb, profile_kb
-from keyboards.withdraw import withdraw_amounts_kb, withdraw_cancel_kb
-from keyboards.admin import (
-    admin_main_kb, admin_settings_kb, promo_list_kb, promo_actions_kb,
-    promo_reward_type_kb, withdrawal_actions_kb, admin_back_kb,
-)
-
-__all__ = [
-    "main_menu_kb", "back_to_menu_kb", "profile_kb",
-    "withdraw_amounts_kb", "withdraw_cancel_kb",
-    "admin_main_kb", "admin_settings_kb", "promo_list_kb", "promo_actions_kb",
-    "promo_reward_type_kb", "withdrawal_actions_kb", "admin_back_kb",
-]
+"""Inline keyboards.
+
+Markups are never mutated after they are built, so static ones are memoised with
+functools.cache and shared between updates; parameterised ones are cached by their inputs.
+"""
+from keyboards.main import main_menu_kb, back_to_menu_kb, profile_kb
+from keyboards.withdraw import withdraw_amounts_kb, withdraw_cancel_kb
+from keyboards.admin import (
+    admin_main_kb, admin_settings_kb, promo_list_kb, promo_actions_kb,
+    promo_reward_type_kb, withdrawal_actions_kb, admin_back_kb,
+)
+
+__all__ = [
+    "main_menu_kb", "back_to_menu_kb", "profile_kb",
+    "withdraw_amounts_kb", "withdraw_cancel_kb",
+    "admin_main_kb", "admin_settings_kb", "promo_list_kb", "promo_actions_kb",
+    "promo_reward_type_kb", "withdrawal_actions_kb", "admin_back_kb",
+]
@@ -1,217 +1,467 @@
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.utils.keyboard import InlineKeyboardBuilder
-
-
-def admin_main_kb() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.row(InlineKeyboardButton(text="➕ Добавить промокод", callback_data="admin:add_promo"))
-    builder.row(InlineKeyboardButton(text="🎟 Список промокодов", callback_data="admin:list_promos"))
-    builder.row(InlineKeyboardButton(text="📋 Управление заданиями", callback_data="admin:tasks"))
-    builder.row(InlineKeyboardButton(text="🎮 Управление играми", callback_data="admin:games"))
-    builder.row(InlineKeyboardButton(text="🖼 Фото и текст кнопок", callback_data="admin:button_content"))
-    builder.row(InlineKeyboardButton(text="👥 Статистика", callback_data="admin:stats"))
-    builder.row(
-        InlineKeyboardButton(text="💳 Начислить звёзды", callback_data="admin:credit"),
-        InlineKeyboardButton(text="⚙️ Настройки", callback_data="admin:settings"),
-    )
-    builder.row(InlineKeyboardButton(text="📢 Рассылка", callback_data="admin:broadcast"))
-    return builder.as_markup()
-
-
-# ─── Game management keyboards ────────────────────────────────────────────────
-
-_GAME_LABELS = {
-    "football":   "⚽ Футбол",
-    "basketball": "🏀 Баскетбол",
-    "bowling":    "🎳 Боулинг",
-    "dice":       "🎲 Кубики",
-    "slots":      "🎰 Слоты",
-}
-_GAME_TYPES = ["football", "basketball", "bowling", "dice", "slots"]
-
-
-def games_list_kb(statuses: dict[str, bool]) -> InlineKeyboardMarkup:
-    """statuses: {game_type: is_enabled}"""
-    builder = InlineKeyboardBuilder()
-    for game in _GAME_TYPES:
-        icon = "✅" if statuses.get(game, True) else "❌"
-        builder.row(InlineKeyboardButton(
-            text=f"{icon} {_GAME_LABELS[game]}",
-            callback_data=f"agame:info:{game}",
-        ))
-    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
-    return builder.as_markup()
-
-
-def game_detail_kb(game_type: str, is_enabled: bool) -> InlineKeyboardMarkup:
-    toggle_text = "❌ Отключить" if is_enabled else "✅ Включить"
-    builder = InlineKeyboardBuilder()
-    builder.row(InlineKeyboardButton(text=toggle_text, callback_data=f"agame:toggle:{game_type}"))
-    if game_type == "slots":
-        builder.row(InlineKeyboardButton(text="📈 Коэф. Tier 1 (1–3)", callback_data=f"agame:coeff1:{game_type}"))
-        builder.row(InlineKeyboardButton(text="📈 Коэф. Tier 2 (4–10)", callback_data=f"agame:coeff2:{game_type}"))
-    else:
-        builder.row(InlineKeyboardButton(text="📈 Коэффициент", callback_data=f"agame:coeff:{game_type}"))
-    builder.row(InlineKeyboardButton(text="💰 Мин. ставка", callback_data=f"agame:min_bet:{game_type}"))
-    builder.row(InlineKeyboardButton(text="🔢 Лимит в день (0=∞)", callback_data=f"agame:daily_limit:{game_type}"))
-    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:games"))
-    return builder.as_markup()
-
-
-def admin_settings_kb() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.row(InlineKeyboardButton(text="⭐ Награда за реферала", callback_data="settings:referral_reward"))
-    builder.row(InlineKeyboardButton(text="⏱ Кулдаун бонуса (часы)", callback_data="settings:bonus_cooldown"))
-    builder.row(InlineKeyboardButton(text="🎁 Мин. бонус", callback_data="settings:bonus_min"))
-    builder.row(InlineKeyboardButton(text="🎁 Макс. бонус", callback_data="settings:bonus_max"))
-    builder.row(InlineKeyboardButton(text="📢 ID канала выплат", callback_data="settings:payments_channel_id"))
-    builder.row(InlineKeyboardButton(text="🔗 Ссылка на канал выплат", callback_data="settings:payments_channel_url"))
-    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
-    return builder.as_markup()
-
-
-def promo_list_kb(promos: list) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    for promo in promos:
-        status = "✅" if promo.is_active else "❌"
-        builder.row(
-            InlineKeyboardButton(
-                text=f"{status} {promo.code} ({promo.usage_count} использований)",
-                callback_data=f"admin:promo_info:{promo.id}",
-            )
-        )
-    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
-    return builder.as_markup()
-
-
-def promo_actions_kb(promo_id: int, is_active: bool) -> InlineKeyboardMarkup:
-    toggle_text = "❌ Деактивировать" if is_active else "✅ Активировать"
-    builder = InlineKeyboardBuilder()
-    builder.row(
-        InlineKeyboardButton(text=toggle_text, callback_data=f"admin:promo_toggle:{promo_id}"),
-        InlineKeyboardButton(text="🗑 Удалить", callback_data=f"admin:promo_delete:{promo_id}"),
-    )
-    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:list_promos"))
-    return builder.as_markup()
-
-
-def promo_reward_type_kb() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.row(
-        InlineKeyboardButton(text="Фиксированная", callback_data="promo_type:fixed"),
-        InlineKeyboardButton(text="Случайная", callback_data="promo_type:random"),
-    )
-    builder.row(InlineKeyboardButton(text="❌ Отмена", callback_data="admin:main"))
-    return builder.as_markup()
-
-
-def withdrawal_actions_kb(withdrawal_id: int) -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(text="✅ Принять", callback_data=f"withdrawal:approve:{withdrawal_id}"),
-                InlineKeyboardButton(text="❌ Отклонить", callback_data=f"withdrawal:reject:{withdrawal_id}"),
-            ]
-        ]
-    )
-
-
-def admin_back_kb() -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup(
-        inline_keyboard=[[InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main")]]
-    )
-
-
-def task_management_kb() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.row(InlineKeyboardButton(text="➕ Добавить задание", callback_data="admin:add_task"))
-    builder.row(InlineKeyboardButton(text="📋 Список заданий", callback_data="admin:list_tasks"))
-    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
-    return builder.as_markup()
-
-
-def task_type_kb() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.row(
-        InlineKeyboardButton(text="📢 Подписка на канал", callback_data="task_type:subscribe"),
-        InlineKeyboardButton(text="👥 Рефералы", callback_data="task_type:referrals"),
-    )
-    builder.row(InlineKeyboardButton(text="❌ Отмена", callback_data="admin:tasks"))
-    return builder.as_markup()
-
-
-def task_list_admin_kb(tasks: list) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    for task in tasks:
-        status = "✅" if task.is_active else "❌"
-        type_icon = "📢" if task.task_type == "subscribe" else "👥"
-        builder.row(InlineKeyboardButton(
-            text=f"{status} {type_icon} {task.title}",
-            callback_data=f"admin:task_info:{task.id}",
-        ))
-    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:tasks"))
-    return builder.as_markup()
-
-
-def task_actions_kb(task_id: int, is_active: bool) -> InlineKeyboardMarkup:
-    toggle_text = "❌ Деактивировать" if is_active else "✅ Активировать"
-    builder = InlineKeyboardBuilder()
-    builder.row(
-        InlineKeyboardButton(text=toggle_text, callback_data=f"admin:task_toggle:{task_id}"),
-        InlineKeyboardButton(text="🗑 Удалить", callback_data=f"admin:task_delete:{task_id}"),
-    )
-    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:list_tasks"))
-    return builder.as_markup()
-
-
-# ─── Button Content Management ─────────────────────────────────────────────────
-
-BUTTON_KEYS: dict[str, str] = {
-    "menu:main":      "🏠 Главное меню",
-    "menu:earn":      "⭐ Заработать звёзды",
-    "menu:referrals": "👥 Мои рефералы",
-    "menu:bonus":     "🎁 Бонус",
-    "menu:profile":   "👤 Профиль",
-    "menu:tasks":     "📋 Задания",
-    "menu:top":       "🏆 Топ",
-    "menu:games":     "🎮 Игры",
-    "menu:withdraw":  "💰 Вывод",
-    "menu:how":       "ℹ️ Как это работает",
-}
-
-
-def button_content_list_kb(contents: dict[str, bool]) -> InlineKeyboardMarkup:
-    """contents: {button_key: has_any_content}"""
-    builder = InlineKeyboardBuilder()
-    for key, label in BUTTON_KEYS.items():
-        icon = "🖼" if contents.get(key) else "⬜"
-        builder.row(InlineKeyboardButton(
-            text=f"{icon} {label}",
-            callback_data=f"admin:btn_edit:{key}",
-        ))
-    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
-    return builder.as_markup()
-
-
-def button_edit_kb(button_key: str, has_photo: bool, has_text: bool) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.row(InlineKeyboardButton(
-        text="🖼 Установить фото",
-        callback_data=f"admin:btn_set_photo:{button_key}",
-    ))
-    builder.row(InlineKeyboardButton(
-        text="📝 Установить текст",
-        callback_data=f"admin:btn_set_text:{button_key}",
-    ))
-    if has_photo:
-        builder.row(InlineKeyboardButton(
-            text="🗑 Удалить фото",
-            callback_data=f"admin:btn_del_photo:{button_key}",
-        ))
-    if has_text:
-        builder.row(InlineKeyboardButton(
-            text="🗑 Удалить текст",
-            callback_data=f"admin:btn_del_text:{button_key}",
-        ))
-    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:button_content"))
-    return builder.as_markup()
+from functools import cache
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+
+@cache
+def admin_main_kb() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="➕ Добавить промокод", callback_data="admin:add_promo"))
+    builder.row(
+        InlineKeyboardButton(text="🎟 Список промокодов", callback_data="admin:list_promos"),
+        InlineKeyboardButton(text="📦 Массовые коды", callback_data="admin:bulk_promo"),
+    )
+    builder.row(InlineKeyboardButton(text="💸 Заявки на вывод", callback_data="wdq:page:0"))
+    builder.row(InlineKeyboardButton(text="📋 Управление заданиями", callback_data="admin:tasks"))
+    builder.row(InlineKeyboardButton(text="🎮 Управление играми", callback_data="admin:games"))
+    builder.row(InlineKeyboardButton(text="🖼 Фото и текст кнопок", callback_data="admin:button_content"))
+    builder.row(
+        InlineKeyboardButton(text="👥 Статистика", callback_data="admin:stats"),
+        InlineKeyboardButton(text="🚩 Фрод-рефералы", callback_data="admin:fraud"),
+    )
+    builder.row(
+        InlineKeyboardButton(text="🔎 Найти пользователя", callback_data="admin:user_search"),
+        InlineKeyboardButton(text="💳 Начислить звёзды", callback_data="admin:credit"),
+    )
+    builder.row(
+        InlineKeyboardButton(text="⚙️ Настройки", callback_data="admin:settings"),
+        InlineKeyboardButton(text="⏱ Фоновые задачи", callback_data="admin:jobs"),
+    )
+    builder.row(
+        InlineKeyboardButton(text="📢 Рассылка", callback_data="admin:broadcast"),
+        InlineKeyboardButton(text="📤 Экспорт", callback_data="admin:export"),
+    )
+    return builder.as_markup()
+
+
+_EXPORT_LABELS = {
+    "users":       "👥 Пользователи",
+    "withdrawals": "💸 Выводы",
+    "games":       "🎮 Игры",
+}
+
+
+@cache
+def export_kb() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for table, label in _EXPORT_LABELS.items():
+        builder.row(
+            InlineKeyboardButton(text=f"{label} CSV", callback_data=f"admin:export:{table}:csv"),
+            InlineKeyboardButton(text=f"{label} JSONL", callback_data=f"admin:export:{table}:jsonl"),
+        )
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
+    return builder.as_markup()
+
+
+def fraud_list_kb(flags: list) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for flag in flags:
+        builder.row(InlineKeyboardButton(
+            text=f"🚩 {flag.referrer_id} — {flag.score:.2f}",
+            callback_data=f"admin:fraud_info:{flag.referrer_id}",
+        ))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
+    return builder.as_markup()
+
+
+def fraud_actions_kb(referrer_id: int) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="✅ Чисто", callback_data=f"admin:fraud_clear:{referrer_id}"),
+        InlineKeyboardButton(text="⛔ Фрод", callback_data=f"admin:fraud_confirm:{referrer_id}"),
+    )
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:fraud"))
+    return builder.as_markup()
+
+
+# ─── Game management keyboards ────────────────────────────────────────────────
+
+_GAME_LABELS = {
+    "football":   "⚽ Футбол",
+    "basketball": "🏀 Баскетбол",
+    "bowling":    "🎳 Боулинг",
+    "dice":       "🎲 Кубики",
+    "slots":      "🎰 Слоты",
+}
+_GAME_TYPES = ["football", "basketball", "bowling", "dice", "slots"]
+
+
+def games_list_kb(statuses: dict[str, bool]) -> InlineKeyboardMarkup:
+    """statuses: {game_type: is_enabled}"""
+    builder = InlineKeyboardBuilder()
+    for game in _GAME_TYPES:
+        icon = "✅" if statuses.get(game, True) else "❌"
+        builder.row(InlineKeyboardButton(
+            text=f"{icon} {_GAME_LABELS[game]}",
+            callback_data=f"agame:info:{game}",
+        ))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
+    return builder.as_markup()
+
+
+def game_detail_kb(game_type: str, is_enabled: bool) -> InlineKeyboardMarkup:
+    toggle_text = "❌ Отключить" if is_enabled else "✅ Включить"
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text=toggle_text, callback_data=f"agame:toggle:{game_type}"))
+    if game_type == "slots":
+        builder.row(InlineKeyboardButton(text="📈 Коэф. Tier 1 (1–3)", callback_data=f"agame:coeff1:{game_type}"))
+        builder.row(InlineKeyboardButton(text="📈 Коэф. Tier 2 (4–10)", callback_data=f"agame:coeff2:{game_type}"))
+    else:
+        builder.row(InlineKeyboardButton(text="📈 Коэффициент", callback_data=f"agame:coeff:{game_type}"))
+    builder.row(InlineKeyboardButton(text="💰 Мин. ставка", callback_data=f"agame:min_bet:{game_type}"))
+    builder.row(InlineKeyboardButton(text="🔢 Лимит в день (0=∞)", callback_data=f"agame:daily_limit:{game_type}"))
+    builder.row(InlineKeyboardButton(text="🧮 Симуляция RTP", callback_data=f"agame:sim:{game_type}"))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:games"))
+    return builder.as_markup()
+
+
+@cache
+def game_sim_kb(game_type: str) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="🔁 Пересчитать", callback_data=f"agame:sim:{game_type}"))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data=f"agame:info:{game_type}"))
+    return builder.as_markup()
+
+
+@cache
+def admin_settings_kb() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="⭐ Награда за реферала", callback_data="settings:referral_reward"))
+    builder.row(
+        InlineKeyboardButton(text="🥈 2-й уровень", callback_data="settings:referral_reward_l2"),
+        InlineKeyboardButton(text="🥉 3-й уровень", callback_data="settings:referral_reward_l3"),
+    )
+    builder.row(InlineKeyboardButton(text="⏱ Кулдаун бонуса (часы)", callback_data="settings:bonus_cooldown"))
+    builder.row(InlineKeyboardButton(text="🎁 Мин. бонус", callback_data="settings:bonus_min"))
+    builder.row(InlineKeyboardButton(text="🎁 Макс. бонус", callback_data="settings:bonus_max"))
+    builder.row(InlineKeyboardButton(text="📢 ID канала выплат", callback_data="settings:payments_channel_id"))
+    builder.row(InlineKeyboardButton(text="🔗 Ссылка на канал выплат", callback_data="settings:payments_channel_url"))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
+    return builder.as_markup()
+
+
+def promo_list_kb(promos: list) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for promo in promos:
+        status = "✅" if promo.is_active else "❌"
+        builder.row(
+            InlineKeyboardButton(
+                text=f"{status} {promo.code} ({promo.usage_count} использований)",
+                callback_data=f"admin:promo_info:{promo.id}",
+            )
+        )
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
+    return builder.as_markup()
+
+
+def promo_actions_kb(promo_id: int, is_active: bool) -> InlineKeyboardMarkup:
+    toggle_text = "❌ Деактивировать" if is_active else "✅ Активировать"
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text=toggle_text, callback_data=f"admin:promo_toggle:{promo_id}"),
+        InlineKeyboardButton(text="🗑 Удалить", callback_data=f"admin:promo_delete:{promo_id}"),
+    )
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:list_promos"))
+    return builder.as_markup()
+
+
+@cache
+def promo_reward_type_kb() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="Фиксированная", callback_data="promo_type:fixed"),
+        InlineKeyboardButton(text="Случайная", callback_data="promo_type:random"),
+    )
+    builder.row(InlineKeyboardButton(text="❌ Отмена", callback_data="admin:main"))
+    return builder.as_markup()
+
+
+@cache
+def bulk_promo_mode_kb() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="🎲 Сгенерировать коды", callback_data="bulk_promo:generate"))
+    builder.row(InlineKeyboardButton(text="📄 Загрузить файл (.txt / .csv)", callback_data="bulk_promo:import"))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
+    return builder.as_markup()
+
+
+@cache
+def bulk_promo_type_kb() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="Фиксированная", callback_data="bulk_promo_type:fixed"),
+        InlineKeyboardButton(text="Случайная", callback_data="bulk_promo_type:random"),
+    )
+    builder.row(InlineKeyboardButton(text="❌ Отмена", callback_data="admin:main"))
+    return builder.as_markup()
+
+
+@cache
+def credit_mode_kb() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="📄 Массово из CSV", callback_data="admin:credit_bulk"))
+    builder.row(InlineKeyboardButton(text="❌ Отмена", callback_data="admin:main"))
+    return builder.as_markup()
+
+
+@cache
+def credit_bulk_confirm_kb() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="✅ Применить", callback_data="credit_bulk:apply"),
+        InlineKeyboardButton(text="❌ Отмена", callback_data="admin:main"),
+    )
+    return builder.as_markup()
+
+
+def withdrawal_actions_kb(withdrawal_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="✅ Принять", callback_data=f"withdrawal:approve:{withdrawal_id}"),
+                InlineKeyboardButton(text="❌ Отклонить", callback_data=f"withdrawal:reject:{withdrawal_id}"),
+            ]
+        ]
+    )
+
+
+def withdrawal_queue_kb(page: list, selected: set[int], after: int, next_after: int | None) -> InlineKeyboardMarkup:
+    """Review queue page: one toggle per withdrawal, batch actions, keyset navigation.
+    `after` is the cursor this page was opened with, `next_after` the next page's (None: last)."""
+    builder = InlineKeyboardBuilder()
+    for w in page:
+        mark = "✅" if w.id in selected else "⬜"
+        uname = f"@{w.username}" if w.username else w.user_id
+        builder.row(InlineKeyboardButton(
+            text=f"{mark} #{w.id} {uname} — {w.amount:.0f} ⭐",
+            callback_data=f"wdq:sel:{w.id}:{after}",
+        ))
+    builder.row(
+        InlineKeyboardButton(text="☑️ Вся страница", callback_data=f"wdq:page_all:{after}"),
+        InlineKeyboardButton(text="☑️ Все заявки", callback_data=f"wdq:all:{after}"),
+        InlineKeyboardButton(text="🧹 Сбросить", callback_data=f"wdq:clear:{after}"),
+    )
+    if selected:
+        builder.row(
+            InlineKeyboardButton(text=f"✅ Одобрить ({len(selected)})", callback_data=f"wdq:approve:{after}"),
+            InlineKeyboardButton(text=f"❌ Отклонить ({len(selected)})", callback_data=f"wdq:reject:{after}"),
+        )
+    nav = []
+    if after:
+        nav.append(InlineKeyboardButton(text="⏮ В начало", callback_data="wdq:page:0"))
+    if next_after is not None:
+        nav.append(InlineKeyboardButton(text="Далее ▶️", callback_data=f"wdq:page:{next_after}"))
+    if nav:
+        builder.row(*nav)
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
+    return builder.as_markup()
+
+
+def withdrawal_queue_confirm_kb(action: str, after: int) -> InlineKeyboardMarkup:
+    label = "✅ Да, одобрить" if action == "approve" else "❌ Да, отклонить"
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text=label, callback_data=f"wdq:do:{action}"),
+        InlineKeyboardButton(text="◀️ Назад", callback_data=f"wdq:page:{after}"),
+    )
+    return builder.as_markup()
+
+
+def user_search_results_kb(users: list, after: int, next_after: int | None) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for user in users:
+        uname = f" @{user.username}" if user.username else ""
+        builder.row(InlineKeyboardButton(
+            text=f"👤 {user.first_name}{uname} — {user.stars_balance:.2f} ⭐",
+            callback_data=f"usearch:user:{user.user_id}:{after}",
+        ))
+    nav = []
+    if after:
+        nav.append(InlineKeyboardButton(text="⏮ В начало", callback_data="usearch:page:0"))
+    if next_after is not None:
+        nav.append(InlineKeyboardButton(text="Далее ▶️", callback_data=f"usearch:page:{next_after}"))
+    if nav:
+        builder.row(*nav)
+    builder.row(
+        InlineKeyboardButton(text="🔎 Новый поиск", callback_data="admin:user_search"),
+        InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"),
+    )
+    return builder.as_markup()
+
+
+def user_card_kb(user_id: int, after: int) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="💳 Начислить звёзды", callback_data=f"usearch:credit:{user_id}"))
+    builder.row(
+        InlineKeyboardButton(text="◀️ К результатам", callback_data=f"usearch:page:{after}"),
+        InlineKeyboardButton(text="🏠 Админ-панель", callback_data="admin:main"),
+    )
+    return builder.as_markup()
+
+
+@cache
+def admin_back_kb() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main")]]
+    )
+
+
+@cache
+def admin_stats_kb() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="📈 Тренды", callback_data="admin:trends:7"))
+    builder.row(InlineKeyboardButton(text="🔄 Сверить счётчики", callback_data="admin:stats_reconcile"))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
+    return builder.as_markup()
+
+
+@cache
+def jobs_kb(job_names: tuple[str, ...]) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for name in job_names:
+        builder.button(text=f"▶️ {name}", callback_data=f"admin:job_run:{name}")
+    builder.adjust(2)
+    builder.row(InlineKeyboardButton(text="🔄 Обновить", callback_data="admin:jobs"))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
+    return builder.as_markup()
+
+
+TREND_PERIODS = [7, 30, 90]
+
+
+@cache
+def admin_trends_kb(days: int) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(*[
+        InlineKeyboardButton(
+            text=f"• {period} дн. •" if period == days else f"{period} дн.",
+            callback_data=f"admin:trends:{period}",
+        )
+        for period in TREND_PERIODS
+    ])
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:stats"))
+    return builder.as_markup()
+
+
+@cache
+def task_management_kb() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="➕ Добавить задание", callback_data="admin:add_task"))
+    builder.row(InlineKeyboardButton(text="📋 Список заданий", callback_data="admin:list_tasks"))
+    builder.row(InlineKeyboardButton(text="📉 Отписки после награды", callback_data="admin:lapses"))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
+    return builder.as_markup()
+
+
+def lapses_kb(summary: list) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for item in summary:
+        builder.row(InlineKeyboardButton(
+            text=f"📢 {item.title[:32]} — {item.users} / {item.amount:.0f} ⭐",
+            callback_data=f"lapses:view:{item.task_id}",
+        ))
+    if len(summary) > 1:
+        builder.row(InlineKeyboardButton(text="📉 Все задания", callback_data="lapses:view:0"))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:tasks"))
+    return builder.as_markup()
+
+
+@cache
+def lapses_confirm_kb(task_id: int) -> InlineKeyboardMarkup:
+    """task_id 0 = the lapses of all tasks."""
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="💸 Списать награды", callback_data=f"lapses:clawback:{task_id}"),
+        InlineKeyboardButton(text="🙈 Простить", callback_data=f"lapses:dismiss:{task_id}"),
+    )
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:lapses"))
+    return builder.as_markup()
+
+
+@cache
+def task_type_kb() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="📢 Подписка на канал", callback_data="task_type:subscribe"),
+        InlineKeyboardButton(text="👥 Рефералы", callback_data="task_type:referrals"),
+    )
+    builder.row(InlineKeyboardButton(text="❌ Отмена", callback_data="admin:tasks"))
+    return builder.as_markup()
+
+
+def task_list_admin_kb(tasks: list) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for task in tasks:
+        status = "✅" if task.is_active else "❌"
+        type_icon = "📢" if task.task_type == "subscribe" else "👥"
+        builder.row(InlineKeyboardButton(
+            text=f"{status} {type_icon} {task.title}",
+            callback_data=f"admin:task_info:{task.id}",
+        ))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:tasks"))
+    return builder.as_markup()
+
+
+def task_actions_kb(task_id: int, is_active: bool) -> InlineKeyboardMarkup:
+    toggle_text = "❌ Деактивировать" if is_active else "✅ Активировать"
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text=toggle_text, callback_data=f"admin:task_toggle:{task_id}"),
+        InlineKeyboardButton(text="🗑 Удалить", callback_data=f"admin:task_delete:{task_id}"),
+    )
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:list_tasks"))
+    return builder.as_markup()
+
+
+# ─── Button Content Management ─────────────────────────────────────────────────
+
+BUTTON_KEYS: dict[str, str] = {
+    "menu:main":      "🏠 Главное меню",
+    "menu:earn":      "⭐ Заработать звёзды",
+    "menu:referrals": "👥 Мои рефералы",
+    "menu:bonus":     "🎁 Бонус",
+    "menu:profile":   "👤 Профиль",
+    "menu:tasks":     "📋 Задания",
+    "menu:top":       "🏆 Топ",
+    "menu:games":     "🎮 Игры",
+    "menu:withdraw":  "💰 Вывод",
+    "menu:how":       "ℹ️ Как это работает",
+}
+
+
+def button_content_list_kb(contents: dict[str, bool]) -> InlineKeyboardMarkup:
+    """contents: {button_key: has_any_content}"""
+    builder = InlineKeyboardBuilder()
+    for key, label in BUTTON_KEYS.items():
+        icon = "🖼" if contents.get(key) else "⬜"
+        builder.row(InlineKeyboardButton(
+            text=f"{icon} {label}",
+            callback_data=f"admin:btn_edit:{key}",
+        ))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:main"))
+    return builder.as_markup()
+
+
+def button_edit_kb(button_key: str, has_photo: bool, has_text: bool) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(
+        text="🖼 Установить фото",
+        callback_data=f"admin:btn_set_photo:{button_key}",
+    ))
+    builder.row(InlineKeyboardButton(
+        text="📝 Установить текст",
+        callback_data=f"admin:btn_set_text:{button_key}",
+    ))
+    if has_photo:
+        builder.row(InlineKeyboardButton(
+            text="🗑 Удалить фото",
+            callback_data=f"admin:btn_del_photo:{button_key}",
+        ))
+    if has_text:
+        builder.row(InlineKeyboardButton(
+            text="🗑 Удалить текст",
+            callback_data=f"admin:btn_del_text:{button_key}",
+        ))
+    builder.row(InlineKeyboardButton(text="◀️ Назад", callback_data="admin:button_content"))
+    return builder.as_markup()
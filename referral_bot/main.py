@@ -1,49 +1,92 @@
-import asyncio
-import logging
-import traceback
-
-from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
-from aiogram.enums import ParseMode
-from aiogram_sqlite_storage.sqlitestore import SQLStorage
-from aiogram.types import ErrorEvent
-
-from config import config
-from database import init_db
-from handlers import routers
-from middlewares import SessionMiddleware, FlyerMiddleware, RegisteredUserMiddleware
-
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
-logger = logging.getLogger(__name__)
-
-
-async def main() -> None:
-    await init_db()
-
-    bot = Bot(
-        token=config.BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
-    )
-    dp = Dispatcher(storage=SQLStorage("fsm_storage.db"))
-
-    # Middlewares — order matters: session → flyer → user check
-    dp.message.middleware(SessionMiddleware())
-    dp.callback_query.middleware(SessionMiddleware())
-    dp.message.middleware(FlyerMiddleware())
-    dp.callback_query.middleware(FlyerMiddleware())
-    dp.message.middleware(RegisteredUserMiddleware())
-    dp.callback_query.middleware(RegisteredUserMiddleware())
-
-    @dp.errors()
-    async def error_handler(event: ErrorEvent) -> None:
-        logger.error("Handler error: %s\n%s", event.exception, traceback.format_exc())
-
-    for router in routers:
-        dp.include_router(router)
-
-    logger.info("Bot started")
-    await dp.start_polling(bot, allowed_updates=["message", "callback_query"])
-
-
-if __name__ == "__main__":
-    asyncio.run(main())
+import asyncio
+import logging
+import traceback
+from functools import partial
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.enums import ParseMode
+from aiogram_sqlite_storage.sqlitestore import SQLStorage
+from aiogram.types import ErrorEvent
+
+from config import config
+from database import init_db
+from database.counters import check_counters
+from database.engine import SessionFactory
+from handlers import routers
+from middlewares import SessionMiddleware, GatekeeperMiddleware, ThrottlingMiddleware
+from services.archive import archive_game_sessions
+from services.events import signup_events
+from services.fraud import fraud_scorer
+from services.outbox import outbox
+from services.referral_tasks import ReferralTaskCompleter
+from services.referrals import paths_missing, rebuild_referral_paths
+from services.rollups import run_rollups
+from services.scheduler import Cron, Interval, scheduler
+from services.subscriptions import subscription_audit
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    await init_db()
+    async with SessionFactory() as session:
+        if await paths_missing(session):
+            await rebuild_referral_paths(session)
+        await fraud_scorer.load_held(session)
+        await subscription_audit.load_offenders(session)
+
+    bot = Bot(
+        token=config.BOT_TOKEN,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+    signup_events.subscribe(fraud_scorer.score_batch)
+    signup_events.subscribe(ReferralTaskCompleter(bot).complete_batch)
+    dp = Dispatcher(storage=SQLStorage("fsm_storage.db"))
+
+    # Throttling is outer: spam is dropped before filters, the session or Flyer run
+    throttling = ThrottlingMiddleware()
+    dp.message.outer_middleware(throttling)
+    dp.callback_query.outer_middleware(throttling)
+
+    # Middlewares — order matters: session → gatekeeper (flyer + user check, concurrently)
+    dp.message.middleware(SessionMiddleware())
+    dp.callback_query.middleware(SessionMiddleware())
+    dp.message.middleware(GatekeeperMiddleware())
+    dp.callback_query.middleware(GatekeeperMiddleware())
+
+    @dp.errors()
+    async def error_handler(event: ErrorEvent) -> None:
+        logger.error("Handler error: %s\n%s", event.exception, traceback.format_exc())
+
+    for router in routers:
+        dp.include_router(router)
+
+    # Recurring maintenance; listed with run metrics in the admin panel (⏱ Фоновые задачи)
+    scheduler.add("rollups", Interval(config.ROLLUP_INTERVAL_MINUTES * 60), run_rollups, jitter=15, immediately=True)
+    scheduler.add("archive", Interval(6 * 3600), archive_game_sessions, jitter=300, immediately=True)
+    scheduler.add("counters", Cron("30 3 * * *"), check_counters)
+    scheduler.add("outbox_prune", Cron("45 3 * * *"), outbox.prune_failed)
+    scheduler.add(
+        "subscriptions", Interval(config.SUBSCRIPTION_VERIFY_INTERVAL_MINUTES * 60),
+        partial(subscription_audit.verify, bot), jitter=60,
+    )
+    scheduler.start()
+    background = [
+        asyncio.create_task(signup_events.run()),
+        asyncio.create_task(outbox.run(bot)),
+    ]
+
+    logger.info("Bot started")
+    try:
+        await dp.start_polling(bot, allowed_updates=["message", "callback_query"])
+    finally:
+        await scheduler.stop()
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,3 +1,4 @@
-from middlewares.register import SessionMiddleware, FlyerMiddleware, RegisteredUserMiddleware
-
-__all__ = ["SessionMiddleware", "FlyerMiddleware", "RegisteredUserMiddleware"]
+from middlewares.register import SessionMiddleware, GatekeeperMiddleware
+from middlewares.throttling import ThrottlingMiddleware
+
+__all__ = ["SessionMiddleware", "GatekeeperMiddleware", "ThrottlingMiddleware"]
@@ -1,147 +1,117 @@
-from typing import Callable, Awaitable, Any
-
-from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject, Message, CallbackQuery
-
-from database.engine import SessionFactory
-from config import config
-
-
-class SessionMiddleware(BaseMiddleware):
-    """Injects async DB session into every handler."""
-
-    async def __call__(
-        self,
-        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
-        event: TelegramObject,
-        data: dict[str, Any],
-    ) -> Any:
-        async with SessionFactory() as session:
-            data["session"] = session
-            return await handler(event, data)
-
-
-class FlyerMiddleware(BaseMiddleware):
-    """
-    Enforces Flyer channel-subscription check before any bot feature.
-
-    /admin is whitelisted — admins always bypass.
-    When FLYER_KEY is not set in .env the check is skipped entirely.
-    If the user is not subscribed, Flyer sends the subscription wall
-    automatically — no extra message is needed from our side.
-    """
-
-    # Commands that never go through the Flyer check
-    _SKIP_COMMANDS = {"/admin"}
-
-    async def __call__(
-        self,
-        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
-        event: TelegramObject,
-        data: dict[str, Any],
-    ) -> Any:
-        from services.flyer import check_subscription
-
-        if isinstance(event, Message):
-            user = event.from_user
-            text = event.text or ""
-            if any(text.startswith(cmd) for cmd in self._SKIP_COMMANDS):
-                return await handler(event, data)
-
-        elif isinstance(event, CallbackQuery):
-            user = event.from_user
-
-        else:
-            return await handler(event, data)
-
-        if user is None:
-            return await handler(event, data)
-
-        # Admins always bypass
-        if user.id in config.ADMIN_IDS:
-            return await handler(event, data)
-
-        subscribed = await check_subscription(
-            user_id=user.id,
-            language_code=user.language_code,
-        )
-
-        if not subscribed:
-            # Flyer already sent the subscription wall to the user.
-            # For callback queries we must answer to remove the loading spinner.
-            if isinstance(event, CallbackQuery):
-                try:
-                    await event.answer()
-                except Exception:
-                    pass
-            return  # block further handler execution
-
-        return await handler(event, data)
-
-
-class RegisteredUserMiddleware(BaseMiddleware):
-    """
-    Blocks unregistered users from using the bot without /start.
-    Admins always bypass this check.
-    """
-
-    SKIP_TEXT = {"/start", "/admin"}
-
-    async def __call__(
-        self,
-        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
-        event: TelegramObject,
-        data: dict[str, Any],
-    ) -> Any:
-        from database.models import User
-
-        user = None
-        if isinstance(event, Message):
-            user = event.from_user
-        elif isinstance(event, CallbackQuery):
-            user = event.from_user
-        else:
-            return await handler(event, data)
-
-        if user is None:
-            return
-
-        # Admins: try to load db_user; if not registered yet — require /start first
-        if user.id in config.ADMIN_IDS:
-            session = data.get("session")
-            db_user = None
-            if session:
-                db_user = await session.get(User, user.id)
-            if db_user:
-                data["db_user"] = db_user
-                return await handler(event, data)
-            # Admin not in DB yet — allow /start and /admin, block the rest
-            if isinstance(event, Message):
-                text = event.text or ""
-                if any(text.startswith(cmd) for cmd in {"/start", "/admin"}):
-                    return await handler(event, data)
-                await event.answer("Нажми /start чтобы начать.")
-            elif isinstance(event, CallbackQuery):
-                await event.answer("Сначала нажми /start.", show_alert=True)
-            return
-
-        # Skip /start and /admin for regular users too
-        if isinstance(event, Message):
-            text = event.text or ""
-            if any(text.startswith(cmd) for cmd in self.SKIP_TEXT):
-                return await handler(event, data)
-
-        session = data.get("session")
-        if session is None:
-            return
-
-        db_user = await session.get(User, user.id)
-        if db_user is None:
-            if isinstance(event, Message):
-                await event.answer("Нажми /start чтобы начать.")
-            elif isinstance(event, CallbackQuery):
-                await event.answer("Сначала нажми /start.", show_alert=True)
-            return
-
-        data["db_user"] = db_user
-        return await handler(event, data)
+import asyncio
+from typing import Callable, Awaitable, Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Message, CallbackQuery
+
+from database.engine import SessionFactory
+from database.models import User
+from config import config
+
+
+class SessionMiddleware(BaseMiddleware):
+    """Injects async DB session into every handler."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        async with SessionFactory() as session:
+            data["session"] = session
+            return await handler(event, data)
+
+
+class GatekeeperMiddleware(BaseMiddleware):
+    """
+    Flyer subscription check and registered-user check in one stage.
+
+    For a regular user the Flyer call (HTTP) and the user lookup (DB) start
+    together; as soon as one of them blocks the update — not subscribed, or
+    not registered yet — the other is cancelled, so the slower call no longer
+    adds its latency on top. The same updates get through as when the two
+    checks ran one after the other:
+      * /admin messages skip both checks, /start skips the user check;
+      * admins skip Flyer; if they are not in the DB yet only /start and
+        /admin get through;
+      * when FLYER_KEY is not set the subscription check always passes.
+    If the user is not subscribed, Flyer sends the subscription wall itself;
+    we only answer callback queries to remove the loading spinner.
+    """
+
+    # Commands that never go through the Flyer check
+    _SKIP_FLYER = ("/admin",)
+    # Commands that work before the user is registered
+    _SKIP_REGISTERED = ("/start", "/admin")
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, (Message, CallbackQuery)):
+            return await handler(event, data)
+        user = event.from_user
+        if user is None:
+            return
+
+        text = (event.text or "") if isinstance(event, Message) else ""
+        check_flyer = user.id not in config.ADMIN_IDS and not text.startswith(self._SKIP_FLYER)
+        skip_registered = text.startswith(self._SKIP_REGISTERED)
+        session = data.get("session")
+        # Admins are loaded even on /start and /admin, so handlers get db_user when it exists
+        load_user = session is not None and (not skip_registered or user.id in config.ADMIN_IDS)
+        if not skip_registered and session is None:
+            return
+
+        pending: dict[asyncio.Task, str] = {}
+        if check_flyer:
+            pending[asyncio.ensure_future(self._check_flyer(user))] = "flyer"
+        if load_user:
+            pending[asyncio.ensure_future(session.get(User, user.id))] = "user"
+
+        db_user = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    kind = pending.pop(task)
+                    if kind == "flyer":
+                        if not task.result():
+                            await self._answer(event)
+                            return
+                    else:
+                        db_user = task.result()
+                        if db_user is None and not skip_registered:
+                            await self._answer(event, unregistered=True)
+                            return
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if db_user is not None:
+            data["db_user"] = db_user
+        return await handler(event, data)
+
+    @staticmethod
+    async def _check_flyer(user) -> bool:
+        from services.flyer import check_subscription
+
+        return await check_subscription(user_id=user.id, language_code=user.language_code)
+
+    @staticmethod
+    async def _answer(event: Message | CallbackQuery, unregistered: bool = False) -> None:
+        if unregistered:
+            if isinstance(event, Message):
+                await event.answer("Нажми /start чтобы начать.")
+            else:
+                await event.answer("Сначала нажми /start.", show_alert=True)
+            return
+        # Not subscribed: Flyer already sent the wall, only the spinner needs to stop
+        if isinstance(event, CallbackQuery):
+            try:
+                await event.answer()
+            except Exception:
+                pass
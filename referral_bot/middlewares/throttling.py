@@ -0,0 +1,94 @@
+import time
+from typing import Callable, Awaitable, Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Message, CallbackQuery
+
+from config import config
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Per-user token buckets, checked before anything else touches the update.
+
+    Registered as an outer middleware, so a throttled update never opens a DB
+    session, calls Flyer or runs a filter. Messages and callbacks have separate
+    budgets; game:* and withdraw:* callbacks draw from stricter ones.
+    Throttled callbacks are answered (the spinner must stop), throttled messages
+    are dropped. Admins are never throttled.
+    """
+
+    # kind → (tokens refilled per second, bucket size)
+    LIMITS = {
+        "message":  (1.0, 5),
+        "callback": (3.0, 10),
+        "game":     (1.0, 3),
+        "withdraw": (0.2, 2),
+    }
+    # Buckets idle for this long are refilled anyway, so they are dropped
+    _SWEEP_EVERY = 60.0
+
+    def __init__(self, limits: dict[str, tuple[float, int]] | None = None) -> None:
+        self.limits = {**self.LIMITS, **(limits or {})}
+        # (user_id, kind) → [tokens, last refill time]
+        self._buckets: dict[tuple[int, str], list[float]] = {}
+        self._last_sweep = time.monotonic()
+
+    @staticmethod
+    def _kind(event: TelegramObject) -> str:
+        if isinstance(event, Message):
+            return "message"
+        data = event.data or ""
+        if data.startswith("game:"):
+            return "game"
+        if data.startswith("withdraw:"):
+            return "withdraw"
+        return "callback"
+
+    def _take(self, user_id: int, kind: str, now: float) -> bool:
+        rate, size = self.limits[kind]
+        bucket = self._buckets.get((user_id, kind))
+        if bucket is None:
+            self._buckets[(user_id, kind)] = [size - 1, now]
+            return True
+        bucket[0] = min(size, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def _sweep(self, now: float) -> None:
+        self._last_sweep = now
+        stale = [
+            key for key, (tokens, last) in self._buckets.items()
+            if tokens + (now - last) * self.limits[key[1]][0] >= self.limits[key[1]][1]
+        ]
+        for key in stale:
+            del self._buckets[key]
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, (Message, CallbackQuery)):
+            return await handler(event, data)
+        user = event.from_user
+        if user is None or user.id in config.ADMIN_IDS:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        if now - self._last_sweep >= self._SWEEP_EVERY:
+            self._sweep(now)
+
+        if self._take(user.id, self._kind(event), now):
+            return await handler(event, data)
+
+        if isinstance(event, CallbackQuery):
+            try:
+                await event.answer("⏳ Не так быстро!")
+            except Exception:
+                pass
+        return
@@ -1,3 +1,3 @@
-from services.flyer import check_subscription
-
-__all__ = ["check_subscription"]
+from services.flyer import check_subscription
+
+__all__ = ["check_subscription"]
@@ -0,0 +1,167 @@
+"""Retention for game_sessions: old rows move to gzip JSONL files partitioned by day.
+
+Layout: <ARCHIVE_DIR>/game_sessions/YYYY/MM/YYYY-MM-DD.jsonl.gz, one JSON object per row,
+rows in id order. Every batch is appended as a new gzip member, so a file is always valid
+gzip even if the process dies mid-run.
+
+Usage (audits):
+    python -m services.archive query --from 2026-01-01 --to 2026-01-31 [--user ID] [--game dice]
+    python -m services.archive run
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sys
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Iterator
+
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import config
+from database.models import GameSession
+from services.rollups import get_games_watermark
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_ROOT = Path(config.ARCHIVE_DIR) / "game_sessions"
+# Pause between batches so user-facing writes get the lock in between
+BATCH_PAUSE_SECONDS = 0.05
+
+_COLUMNS = (
+    GameSession.id, GameSession.user_id, GameSession.game_type,
+    GameSession.bet, GameSession.result, GameSession.payout, GameSession.played_at,
+)
+
+
+def partition_path(day: date) -> Path:
+    return ARCHIVE_ROOT / f"{day:%Y}" / f"{day:%m}" / f"{day:%Y-%m-%d}.jsonl.gz"
+
+
+def _append_partitions(partitions: dict[date, list[dict]]) -> None:
+    for day, records in partitions.items():
+        path = partition_path(day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as gz:
+                for record in records:
+                    gz.write(json.dumps(record, ensure_ascii=False).encode() + b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+async def archive_game_sessions(session: AsyncSession) -> int:
+    """Move game_sessions older than GAME_SESSIONS_RETENTION_DAYS to the archive.
+
+    Works in batches of ARCHIVE_BATCH_SIZE rows: read, append to files (fsynced), then delete
+    the same id range in a short transaction. Rows not yet folded into the rollups are kept.
+    Returns the number of archived rows."""
+    if config.GAME_SESSIONS_RETENTION_DAYS <= 0:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=max(1, config.GAME_SESSIONS_RETENTION_DAYS))
+    horizon = await get_games_watermark(session)
+
+    total = 0
+    while True:
+        rows = (await session.execute(
+            select(*_COLUMNS)
+            .where(GameSession.id <= horizon)
+            .order_by(GameSession.id)
+            .limit(config.ARCHIVE_BATCH_SIZE)
+        )).all()
+        await session.rollback()
+
+        # ids grow with played_at, so the first row inside the retention window ends the run
+        batch = []
+        for row in rows:
+            if row.played_at >= cutoff:
+                break
+            batch.append(row)
+        if not batch:
+            break
+
+        partitions: dict[date, list[dict]] = defaultdict(list)
+        for row in batch:
+            record = row._asdict()
+            record["played_at"] = row.played_at.isoformat()
+            partitions[row.played_at.date()].append(record)
+        await asyncio.to_thread(_append_partitions, partitions)
+
+        await session.execute(
+            delete(GameSession)
+            .where(GameSession.id >= batch[0].id, GameSession.id <= batch[-1].id)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        total += len(batch)
+
+        if len(batch) < len(rows) or len(rows) < config.ARCHIVE_BATCH_SIZE:
+            break
+        await asyncio.sleep(BATCH_PAUSE_SECONDS)
+
+    if total:
+        logger.info("Archived %d game sessions older than %s", total, cutoff.date())
+    return total
+
+
+def iter_archived_sessions(
+    date_from: date,
+    date_to: date,
+    user_id: int | None = None,
+    game_type: str | None = None,
+) -> Iterator[dict]:
+    """Stream archived rows for [date_from, date_to] in id order, one partition at a time.
+
+    A crash between writing a batch and deleting it re-archives that batch on the next run;
+    such duplicates are skipped here by id."""
+    day = date_from
+    while day <= date_to:
+        path = partition_path(day)
+        day += timedelta(days=1)
+        if not path.exists():
+            continue
+        last_id = 0
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record["id"] <= last_id:
+                    continue
+                last_id = record["id"]
+                if user_id is not None and record["user_id"] != user_id:
+                    continue
+                if game_type is not None and record["game_type"] != game_type:
+                    continue
+                yield record
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m services.archive")
+    sub = parser.add_subparsers(dest="command", required=True)
+    query = sub.add_parser("query", help="stream archived game sessions as JSONL")
+    query.add_argument("--from", dest="date_from", type=date.fromisoformat, required=True)
+    query.add_argument("--to", dest="date_to", type=date.fromisoformat, required=True)
+    query.add_argument("--user", type=int)
+    query.add_argument("--game")
+    sub.add_parser("run", help="archive expired rows now")
+    args = parser.parse_args()
+
+    if args.command == "query":
+        for record in iter_archived_sessions(args.date_from, args.date_to, args.user, args.game):
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    else:
+        from database.engine import SessionFactory
+
+        async def run() -> None:
+            async with SessionFactory() as session:
+                print(await archive_game_sessions(session))
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,189 @@
+"""Bulk balance adjustments from an uploaded CSV of user_id,amount,reason.
+
+The file is validated row by row in one streaming pass. Applying happens in one transaction
+around a per-connection TEMP staging table, begun as a writer so no other debit can slip in
+between the checks and the update: a batch whose id is already in the ledger is not applied
+again, rows of unknown users and of users whose balance would go negative are rejected with
+set-based queries, one correlated UPDATE applies the per-user totals, one INSERT … SELECT writes
+the ledger rows, and users who were credited get a notification through the outbox (which paces
+them to the Bot API limits).
+"""
+import csv
+import html
+import io
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import BalanceLedger
+from services.outbox import outbox
+
+BULK_MAX_ROWS = 20_000
+BULK_MAX_AMOUNT = 100_000.0
+REASON_MAX_LENGTH = 256
+
+
+@dataclass(frozen=True, slots=True)
+class Adjustment:
+    line: int
+    user_id: int
+    amount: float
+    reason: str
+
+
+@dataclass(frozen=True, slots=True)
+class RejectedRow:
+    line: int
+    raw: str
+    error: str
+
+
+@dataclass
+class BulkResult:
+    batch_id: str
+    applied: int = 0
+    users: int = 0
+    credited: float = 0.0
+    debited: float = 0.0
+    rejected: list[RejectedRow] = field(default_factory=list)
+    # the batch was applied before; nothing was changed this time
+    duplicate: bool = False
+
+
+def _parse_row(row: list[str]) -> tuple[int, float, str]:
+    if len(row) < 2:
+        raise ValueError("нужно минимум 2 колонки: user_id,amount")
+    try:
+        user_id = int(row[0].strip())
+    except ValueError:
+        raise ValueError("user_id не число") from None
+    if user_id <= 0:
+        raise ValueError("user_id не число")
+    try:
+        amount = float(row[1].strip().replace(",", "."))
+    except ValueError:
+        raise ValueError("amount не число") from None
+    if not math.isfinite(amount) or amount == 0:
+        raise ValueError("amount равен нулю")
+    if abs(amount) > BULK_MAX_AMOUNT:
+        raise ValueError(f"|amount| больше {BULK_MAX_AMOUNT:.0f}")
+    reason = ",".join(row[2:]).strip()
+    if len(reason) > REASON_MAX_LENGTH:
+        raise ValueError(f"reason длиннее {REASON_MAX_LENGTH} символов")
+    return user_id, round(amount, 2), reason
+
+
+def parse_adjustments_file(data: bytes) -> tuple[list[Adjustment], list[RejectedRow]]:
+    """Validate an uploaded CSV (user_id,amount,reason; header optional) in one pass.
+    Returns (valid rows in file order, rejected rows)."""
+    valid: list[Adjustment] = []
+    rejected: list[RejectedRow] = []
+    stream = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8-sig", errors="replace", newline="")
+    for line, row in enumerate(csv.reader(stream), start=1):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if line == 1 and row[0].strip().lower() == "user_id":
+            continue
+        try:
+            user_id, amount, reason = _parse_row(row)
+        except ValueError as exc:
+            rejected.append(RejectedRow(line, ",".join(row)[:200], str(exc)))
+            continue
+        valid.append(Adjustment(line, user_id, amount, reason))
+    return valid, rejected
+
+
+async def apply_adjustments(
+    session: AsyncSession, rows: list[Adjustment], admin_id: int, batch_id: str,
+) -> BulkResult:
+    """Apply validated rows in one transaction, rejecting unknown users and overdrafts
+    (all rows of a user whose balance would go below zero). Commits. A `batch_id` already in
+    the ledger is not applied again (result.duplicate). User objects already loaded in
+    `session` keep their old balance."""
+    result = BulkResult(batch_id=batch_id)
+    raw = {row.line: f"{row.user_id},{row.amount},{row.reason}" for row in rows}
+
+    # Take SQLite's write lock before reading anything: the batch and overdraft checks must see
+    # the balances the UPDATE below changes, with no other writer in between
+    await session.commit()
+    await session.execute(text("BEGIN IMMEDIATE"))
+    try:
+        if await session.scalar(select(BalanceLedger.id).where(BalanceLedger.batch_id == batch_id).limit(1)):
+            await session.rollback()
+            result.duplicate = True
+            return result
+        await session.execute(text(
+            "CREATE TEMP TABLE IF NOT EXISTS bulk_adjustments "
+            "(line INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, amount REAL NOT NULL, reason TEXT NOT NULL)"
+        ))
+        await session.execute(text("DELETE FROM bulk_adjustments"))
+        if rows:
+            await session.execute(
+                text("INSERT INTO bulk_adjustments (line, user_id, amount, reason) VALUES (:line, :user_id, :amount, :reason)"),
+                [{"line": r.line, "user_id": r.user_id, "amount": r.amount, "reason": r.reason} for r in rows],
+            )
+
+        unknown = (await session.execute(text(
+            "SELECT b.line FROM bulk_adjustments b "
+            "WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.user_id = b.user_id)"
+        ))).scalars().all()
+        overdraft = (await session.execute(text(
+            "SELECT b.line FROM bulk_adjustments b WHERE b.user_id IN ("
+            " SELECT t.user_id FROM bulk_adjustments t JOIN users u ON u.user_id = t.user_id"
+            " GROUP BY t.user_id, u.stars_balance HAVING u.stars_balance + SUM(t.amount) < 0)"
+        ))).scalars().all()
+        for lines, error in ((unknown, "пользователь не найден"), (overdraft, "баланс ушёл бы в минус")):
+            result.rejected += [RejectedRow(line, raw[line], error) for line in lines]
+        if unknown or overdraft:
+            await session.execute(
+                text("DELETE FROM bulk_adjustments WHERE line IN (SELECT value FROM json_each(:lines))"),
+                {"lines": "[" + ",".join(map(str, [*unknown, *overdraft])) + "]"},
+            )
+
+        totals = (await session.execute(text(
+            "SELECT user_id, SUM(amount), COUNT(*), GROUP_CONCAT(DISTINCT NULLIF(reason, '')) "
+            "FROM bulk_adjustments GROUP BY user_id"
+        ))).all()
+        if totals:
+            await session.execute(text(
+                "UPDATE users SET stars_balance = stars_balance + "
+                "(SELECT SUM(b.amount) FROM bulk_adjustments b WHERE b.user_id = users.user_id) "
+                "WHERE user_id IN (SELECT user_id FROM bulk_adjustments)"
+            ))
+            await session.execute(
+                text(
+                    "INSERT INTO balance_ledger (user_id, amount, reason, source, batch_id, admin_id, created_at) "
+                    "SELECT user_id, amount, reason, 'bulk_csv', :batch_id, :admin_id, :now "
+                    "FROM bulk_adjustments ORDER BY line"
+                ),
+                {"batch_id": result.batch_id, "admin_id": admin_id, "now": datetime.utcnow()},
+            )
+        for user_id, total, count, reasons in totals:
+            result.applied += count
+            result.users += 1
+            if total > 0:
+                result.credited += total
+                note = f"\nПричина: {html.escape(reasons)}" if reasons else ""
+                outbox.send(session, user_id, f"🎁 Тебе начислено <b>{total:.2f} ⭐</b>!{note}")
+            else:
+                result.debited -= total
+        await session.execute(text("DELETE FROM bulk_adjustments"))
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    outbox.wake()
+    result.rejected.sort(key=lambda r: r.line)
+    return result
+
+
+def rejected_report(rejected: list[RejectedRow]) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["line", "row", "error"])
+    for row in rejected:
+        writer.writerow([row.line, row.raw, row.error])
+    return buf.getvalue().encode("utf-8-sig")
@@ -0,0 +1,68 @@
+"""In-process event bus for work that must stay off the handlers' hot path.
+
+Handlers publish() without awaiting anything; a single background consumer drains the queue
+in batches and hands every batch to each subscriber with its own DB session.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.engine import SessionFactory
+
+logger = logging.getLogger(__name__)
+
+E = TypeVar("E")
+
+
+@dataclass(frozen=True, slots=True)
+class SignupEvent:
+    user_id: int
+    referrer_id: int | None
+    username: str | None
+    first_name: str
+    at: datetime
+
+
+class EventBus(Generic[E]):
+    def __init__(self, name: str, maxsize: int = 100_000, batch_size: int = 500) -> None:
+        self.name = name
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue: asyncio.Queue[E] = asyncio.Queue(maxsize)
+        self._subscribers: list[Callable[[AsyncSession, list[E]], Awaitable[object]]] = []
+
+    def subscribe(self, func: Callable[[AsyncSession, list[E]], Awaitable[object]]):
+        """Register `func(session, events)`; usable as a decorator."""
+        self._subscribers.append(func)
+        return func
+
+    def publish(self, event: E) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning("Event bus %s is full, %d events dropped", self.name, self.dropped)
+
+    async def run(self) -> None:
+        """Consume events until cancelled. A failing subscriber is logged and skipped,
+        the others still get the batch."""
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            for func in self._subscribers:
+                try:
+                    async with SessionFactory() as session:
+                        await func(session, batch)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("Event subscriber %s.%s failed", self.name, func.__name__)
+
+
+signup_events: EventBus[SignupEvent] = EventBus("signups")
@@ -0,0 +1,139 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.types import FSInputFile
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.engine import SessionFactory
+from database.models import GameSession, User, Withdrawal
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 2000
+PROGRESS_EVERY_SECONDS = 3.0
+# Bot API upload limit for documents
+MAX_DOCUMENT_BYTES = 50 * 1024 * 1024
+
+EXPORT_TABLES = {
+    "users": (
+        User.user_id, User.username, User.first_name, User.stars_balance,
+        User.referrals_count, User.referrer_id, User.last_bonus_at, User.created_at,
+    ),
+    "withdrawals": (
+        Withdrawal.id, Withdrawal.user_id, Withdrawal.amount, Withdrawal.status,
+        Withdrawal.created_at, Withdrawal.processed_at,
+    ),
+    "games": (
+        GameSession.id, GameSession.user_id, GameSession.game_type, GameSession.bet,
+        GameSession.result, GameSession.payout, GameSession.played_at,
+    ),
+}
+EXPORT_FORMATS = ("csv", "jsonl")
+
+
+def _cell(value: object) -> object:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _write_chunk(gz: gzip.GzipFile, rows: list, header: list[str], fmt: str) -> None:
+    buf = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buf)
+        writer.writerows([[_cell(v) for v in row] for row in rows])
+    else:
+        for row in rows:
+            buf.write(json.dumps({k: _cell(v) for k, v in zip(header, row)}, ensure_ascii=False))
+            buf.write("\n")
+    gz.write(buf.getvalue().encode())
+
+
+async def export_table(
+    session: AsyncSession,
+    table: str,
+    fmt: str,
+    path: Path,
+    progress: Callable[[int], Awaitable[None]] | None = None,
+) -> int:
+    """Stream `table` into a gzip file at `path` in constant memory.
+
+    Rows come from a server-side cursor in CHUNK_ROWS partitions; encoding and
+    compression run in a worker thread so the event loop keeps serving updates.
+    Returns the number of exported rows."""
+    columns = EXPORT_TABLES[table]
+    header = [c.key for c in columns]
+    result = await session.stream(
+        select(*columns).order_by(columns[0]).execution_options(yield_per=CHUNK_ROWS)
+    )
+
+    rows_done = 0
+    gz = await asyncio.to_thread(gzip.open, path, "wb")
+    try:
+        if fmt == "csv":
+            await asyncio.to_thread(gz.write, (",".join(header) + "\r\n").encode())
+        async for partition in result.partitions():
+            await asyncio.to_thread(_write_chunk, gz, partition, header, fmt)
+            rows_done += len(partition)
+            if progress:
+                await progress(rows_done)
+    finally:
+        await result.close()
+        await asyncio.to_thread(gz.close)
+    return rows_done
+
+
+async def run_export_job(bot: Bot, chat_id: int, status_message_id: int, table: str, fmt: str) -> None:
+    """Export `table` with its own DB session, editing the status message with progress,
+    then send the gzip file as a document. Meant to run as a background task."""
+    fd, name = tempfile.mkstemp(prefix=f"export_{table}_", suffix=f".{fmt}.gz")
+    os.close(fd)
+    path = Path(name)
+    keep_file = False
+    last_edit = time.monotonic()
+
+    async def status(text: str) -> None:
+        try:
+            await bot.edit_message_text(text, chat_id=chat_id, message_id=status_message_id, parse_mode="HTML")
+        except Exception:
+            pass
+
+    async def progress(rows: int) -> None:
+        nonlocal last_edit
+        if time.monotonic() - last_edit < PROGRESS_EVERY_SECONDS:
+            return
+        last_edit = time.monotonic()
+        await status(f"⏳ Экспорт <b>{table}</b> ({fmt}): {rows} строк…")
+
+    try:
+        async with SessionFactory() as session:
+            rows = await export_table(session, table, fmt, path, progress)
+
+        size = path.stat().st_size
+        if size > MAX_DOCUMENT_BYTES:
+            keep_file = True
+            await status(
+                f"⚠️ Экспорт <b>{table}</b>: {rows} строк, {size / 1024 / 1024:.1f} МБ — "
+                f"больше лимита Telegram.\nФайл на сервере: <code>{path}</code>"
+            )
+            return
+
+        filename = f"{table}_{datetime.utcnow():%Y%m%d_%H%M}.{fmt}.gz"
+        await bot.send_document(chat_id, FSInputFile(path, filename=filename), caption=f"📤 {table}: {rows} строк")
+        await status(f"✅ Экспорт <b>{table}</b> завершён: {rows} строк.")
+    except Exception:
+        logger.exception("Export of %s failed", table)
+        await status(f"❌ Ошибка экспорта <b>{table}</b>.")
+    finally:
+        if not keep_file:
+            path.unlink(missing_ok=True)
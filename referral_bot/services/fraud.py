@@ -0,0 +1,231 @@
+"""Referral fraud scoring, fed by signup events off the /start hot path.
+
+Per referrer it keeps sliding windows in memory (recent signup times and names) and, for the
+referrers touched by a batch, reads one grouped query of how many matured referrals never did
+anything after /start. Features are combined into a 0–1 score; referrers above
+FRAUD_FLAG_SCORE land in referrer_flags for review in the admin panel. With
+FRAUD_HOLD_REWARDS=1 their level-1 referral rewards are held until an admin clears them.
+"""
+import logging
+import re
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, exists, func, case, or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import config
+from database.models import GameSession, PromoUse, ReferrerFlag, TaskCompletion, User
+from services.events import SignupEvent
+
+logger = logging.getLogger(__name__)
+
+BURST_WINDOW = timedelta(minutes=10)
+# Signups inside BURST_WINDOW that give the maximum burst score
+BURST_LIMIT = 20
+# Recent referral names kept per referrer for the username features
+NAMES_WINDOW = 50
+# Referrals count as "matured" (had time to do something) after IDLE_GRACE, for IDLE_WINDOW
+IDLE_GRACE = timedelta(hours=1)
+IDLE_WINDOW = timedelta(days=7)
+# Referrers without signups for this long are dropped from memory; also the re-flag cooldown
+STATE_TTL = timedelta(hours=24)
+
+W_BURST, W_IDLE, W_PATTERN = 0.4, 0.35, 0.25
+
+# Generated-looking usernames: word + long number, or a long random-looking run
+_BOTLIKE_RE = re.compile(r"^[a-z]+_?\d{4,}$|^(?=.*\d)[a-z\d]{14,}$")
+# Names sharing a prefix with this many others in the window count as a template
+_TEMPLATE_MIN = 3
+
+
+@dataclass
+class _Window:
+    signups: deque[datetime] = field(default_factory=deque)
+    names: deque[tuple[str | None, str]] = field(default_factory=lambda: deque(maxlen=NAMES_WINDOW))
+    last_seen: datetime = datetime.min
+
+
+def _prefix(username: str | None, first_name: str) -> str:
+    return (username or first_name or "").lower()[:5]
+
+
+def pattern_share(names: deque[tuple[str | None, str]] | list) -> float:
+    """Share of names that look generated or follow a template shared with other referrals."""
+    if not names:
+        return 0.0
+    prefixes = Counter(_prefix(u, f) for u, f in names)
+    suspicious = sum(
+        1 for u, f in names
+        if (u and _BOTLIKE_RE.match(u.lower())) or (_prefix(u, f) and prefixes[_prefix(u, f)] >= _TEMPLATE_MIN)
+    )
+    return suspicious / len(names)
+
+
+class FraudScorer:
+    def __init__(self) -> None:
+        self._windows: dict[int, _Window] = {}
+        self._held: set[int] = set()
+        self._last_prune = datetime.min
+
+    # ─── Held rewards ────────────────────────────────────────────────────────
+
+    async def load_held(self, session: AsyncSession) -> None:
+        rows = await session.execute(
+            select(ReferrerFlag.referrer_id).where(ReferrerFlag.status.in_(("flagged", "confirmed")))
+        )
+        self._held = set(rows.scalars())
+
+    def is_held(self, referrer_id: int) -> bool:
+        return config.FRAUD_HOLD_REWARDS and referrer_id in self._held
+
+    def release(self, referrer_id: int) -> None:
+        self._held.discard(referrer_id)
+
+    # ─── Scoring ─────────────────────────────────────────────────────────────
+
+    def _observe(self, event: SignupEvent) -> None:
+        window = self._windows.setdefault(event.referrer_id, _Window())
+        window.signups.append(event.at)
+        window.names.append((event.username, event.first_name))
+        window.last_seen = event.at
+
+    def _prune(self, now: datetime) -> None:
+        for window in self._windows.values():
+            while window.signups and window.signups[0] < now - BURST_WINDOW:
+                window.signups.popleft()
+        if now - self._last_prune < timedelta(minutes=1):
+            return
+        self._last_prune = now
+        stale = [rid for rid, w in self._windows.items() if w.last_seen < now - STATE_TTL]
+        for rid in stale:
+            del self._windows[rid]
+
+    async def _idle_counts(self, session: AsyncSession, referrer_ids: set[int], now: datetime) -> dict[int, tuple[int, int]]:
+        """{referrer_id: (matured referrals, idle ones)} in one grouped query."""
+        active = or_(
+            User.last_bonus_at.is_not(None),
+            User.referrals_count > 0,
+            exists().where(GameSession.user_id == User.user_id),
+            exists().where(TaskCompletion.user_id == User.user_id),
+            exists().where(PromoUse.user_id == User.user_id),
+        )
+        rows = await session.execute(
+            select(User.referrer_id, func.count(), func.sum(case((active, 0), else_=1)))
+            .where(
+                User.referrer_id.in_(referrer_ids),
+                User.created_at >= now - IDLE_WINDOW,
+                User.created_at < now - IDLE_GRACE,
+            )
+            .group_by(User.referrer_id)
+        )
+        return {rid: (matured, idle or 0) for rid, matured, idle in rows}
+
+    async def score_batch(self, session: AsyncSession, events: list[SignupEvent]) -> list[int]:
+        """Event-bus subscriber: update windows, rescore touched referrers, upsert flags.
+        Returns newly flagged referrer ids."""
+        now = datetime.utcnow()
+        touched = set()
+        for event in events:
+            if event.referrer_id:
+                self._observe(event)
+                touched.add(event.referrer_id)
+        self._prune(now)
+        if not touched:
+            return []
+
+        existing = {
+            flag.referrer_id: flag
+            for flag in (await session.execute(
+                select(ReferrerFlag).where(ReferrerFlag.referrer_id.in_(touched))
+            )).scalars()
+        }
+        idle = await self._idle_counts(session, touched, now)
+
+        rows, new_flags = [], []
+        for rid in touched:
+            flag = existing.get(rid)
+            if flag and flag.status == "confirmed":
+                continue
+            if flag and flag.status == "cleared" and flag.reviewed_at and flag.reviewed_at > now - STATE_TTL:
+                continue
+
+            window = self._windows[rid]
+            matured, idle_n = idle.get(rid, (0, 0))
+            if max(matured, len(window.names)) < config.FRAUD_MIN_REFERRALS:
+                continue
+            burst = len(window.signups)
+            idle_share = idle_n / matured if matured >= config.FRAUD_MIN_REFERRALS else 0.0
+            names_share = pattern_share(window.names) if len(window.names) >= config.FRAUD_MIN_REFERRALS else 0.0
+            score = W_BURST * min(1.0, burst / BURST_LIMIT) + W_IDLE * idle_share + W_PATTERN * names_share
+
+            already_flagged = flag is not None and flag.status == "flagged"
+            if score < config.FRAUD_FLAG_SCORE and not already_flagged:
+                continue
+            rows.append({
+                "referrer_id": rid, "status": "flagged", "score": round(score, 3), "burst": burst,
+                "idle_share": round(idle_share, 3), "pattern_share": round(names_share, 3), "flagged_at": now,
+            })
+            if not already_flagged:
+                new_flags.append(rid)
+
+        if rows:
+            stmt = sqlite_insert(ReferrerFlag)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ReferrerFlag.referrer_id],
+                set_={
+                    "score": stmt.excluded.score,
+                    "burst": stmt.excluded.burst,
+                    "idle_share": stmt.excluded.idle_share,
+                    "pattern_share": stmt.excluded.pattern_share,
+                    # a re-flagged (previously cleared) referrer starts a new review
+                    "flagged_at": case(
+                        (ReferrerFlag.status == "flagged", ReferrerFlag.flagged_at),
+                        else_=stmt.excluded.flagged_at,
+                    ),
+                    "status": stmt.excluded.status,
+                },
+            )
+            await session.execute(stmt, rows)
+            await session.commit()
+        for rid in new_flags:
+            self._held.add(rid)
+            logger.warning("Referrer %s flagged for review", rid)
+        return new_flags
+
+
+fraud_scorer = FraudScorer()
+
+
+async def hold_referral_reward(session: AsyncSession, referrer_id: int, amount: float) -> None:
+    """Park a referral reward on the referrer's flag instead of their balance. Does not commit."""
+    await session.execute(
+        update(ReferrerFlag)
+        .where(ReferrerFlag.referrer_id == referrer_id)
+        .values(held_amount=ReferrerFlag.held_amount + amount)
+    )
+
+
+async def review_flag(session: AsyncSession, referrer_id: int, confirm: bool) -> ReferrerFlag | None:
+    """Close a review. Clearing pays out the held rewards; confirming forfeits them and keeps
+    holding future ones. Commits."""
+    flag = await session.get(ReferrerFlag, referrer_id)
+    if flag is None:
+        return None
+    flag.reviewed_at = datetime.utcnow()
+    if confirm:
+        flag.status = "confirmed"
+    else:
+        flag.status = "cleared"
+        if flag.held_amount:
+            await session.execute(
+                update(User)
+                .where(User.user_id == referrer_id)
+                .values(stars_balance=User.stars_balance + flag.held_amount)
+            )
+            flag.held_amount = 0.0
+        fraud_scorer.release(referrer_id)
+    await session.commit()
+    return flag
@@ -0,0 +1,136 @@
+"""Live house-edge and liability monitor for games, kept entirely in memory.
+
+Every played round is observed here right after its commit. Per game, rounds are summed into
+one-minute buckets kept for 24 hours, so the admin screens read 1 h / 24 h wagered, paid out,
+realised RTP and the biggest winners without touching game_sessions. When a game's realised
+RTP over the last hour exceeds GAME_RTP_LIMIT (with at least GAME_RTP_MIN_WAGERED bet), the
+game is switched off through game_<game>_enabled and admins are told. Counters start empty
+after a restart.
+"""
+import logging
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from aiogram import Bot
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import config
+from database.engine import set_setting
+from keyboards.games import GAME_LABELS
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = {"1ч": timedelta(hours=1), "24ч": timedelta(hours=24)}
+TRIP_WINDOW = timedelta(hours=1)
+_BUCKET = timedelta(minutes=1)
+_RETENTION = max(WINDOWS.values())
+
+
+@dataclass
+class _Bucket:
+    start: datetime
+    rounds: int = 0
+    wagered: float = 0.0
+    paid: float = 0.0
+    # user_id → payout minus bets in this minute
+    net: dict[int, float] = field(default_factory=lambda: defaultdict(float))
+
+
+@dataclass(frozen=True, slots=True)
+class WindowStats:
+    rounds: int
+    wagered: float
+    paid: float
+    top_winners: list[tuple[int, float]]
+
+    @property
+    def rtp(self) -> float | None:
+        return self.paid / self.wagered if self.wagered else None
+
+
+class GameMonitor:
+    def __init__(self) -> None:
+        self._buckets: dict[str, deque[_Bucket]] = defaultdict(deque)
+        # Rounds before this moment do not count towards auto-disable (set on re-enable)
+        self._armed_since: dict[str, datetime] = {}
+
+    def record(self, game_type: str, user_id: int, rounds: list[tuple[float, float]], now: datetime | None = None) -> None:
+        """rounds: (bet, payout) of each round the user just played."""
+        now = now or datetime.utcnow()
+        buckets = self._buckets[game_type]
+        start = now.replace(second=0, microsecond=0)
+        if not buckets or buckets[-1].start != start:
+            buckets.append(_Bucket(start))
+            while buckets[0].start <= now - _RETENTION - _BUCKET:
+                buckets.popleft()
+        bucket = buckets[-1]
+        for bet, payout in rounds:
+            bucket.rounds += 1
+            bucket.wagered += bet
+            bucket.paid += payout
+            bucket.net[user_id] += payout - bet
+
+    def stats(self, game_type: str, window: timedelta, top: int = 3, since: datetime | None = None) -> WindowStats:
+        cutoff = datetime.utcnow() - window
+        rounds, wagered, paid = 0, 0.0, 0.0
+        net: dict[int, float] = defaultdict(float)
+        for bucket in reversed(self._buckets.get(game_type, ())):
+            # `since` excludes its whole minute: the bucket may hold rounds from before it
+            if bucket.start + _BUCKET <= cutoff or (since and bucket.start < since):
+                break
+            rounds += bucket.rounds
+            wagered += bucket.wagered
+            paid += bucket.paid
+            if top:
+                for user_id, amount in bucket.net.items():
+                    net[user_id] += amount
+        winners = sorted(((u, a) for u, a in net.items() if a > 0), key=lambda x: -x[1])[:top]
+        return WindowStats(rounds, round(wagered, 2), round(paid, 2), winners)
+
+    def rearm(self, game_type: str) -> None:
+        """Forget past rounds for auto-disable, e.g. after an admin re-enabled the game."""
+        self._armed_since[game_type] = datetime.utcnow()
+
+    async def observe(
+        self,
+        bot: Bot,
+        session: AsyncSession,
+        game_type: str,
+        user_id: int,
+        rounds: list[tuple[float, float]],
+    ) -> None:
+        """Record committed rounds, then auto-disable the game if it pays out too much."""
+        self.record(game_type, user_id, rounds)
+        if config.GAME_RTP_LIMIT <= 0:
+            return
+        window = self.stats(game_type, TRIP_WINDOW, top=0, since=self._armed_since.get(game_type))
+        if window.wagered < config.GAME_RTP_MIN_WAGERED or window.rtp <= config.GAME_RTP_LIMIT:
+            return
+
+        # rearm first: concurrent rounds must not trip (and notify) a second time
+        self.rearm(game_type)
+        try:
+            await set_setting(session, f"game_{game_type}_enabled", "0")
+        except Exception:
+            logger.exception("Could not auto-disable game %s", game_type)
+            return
+        logger.warning(
+            "Game %s auto-disabled: RTP %.1f%% over the last hour (%.2f wagered, %.2f paid)",
+            game_type, window.rtp * 100, window.wagered, window.paid,
+        )
+        for admin_id in config.ADMIN_IDS:
+            try:
+                await bot.send_message(
+                    admin_id,
+                    f"⛔ <b>{GAME_LABELS[game_type]}: игра автоматически отключена</b>\n\n"
+                    f"RTP за последний час: <b>{window.rtp:.1%}</b> (лимит {config.GAME_RTP_LIMIT:.0%})\n"
+                    f"Ставки: {window.wagered:.2f} ⭐ | Выплаты: {window.paid:.2f} ⭐\n\n"
+                    f"Проверь коэффициенты в админ-панели и включи игру снова.",
+                    parse_mode="HTML",
+                )
+            except Exception:
+                pass
+
+
+game_monitor = GameMonitor()
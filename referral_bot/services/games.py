@@ -0,0 +1,80 @@
+"""Game outcome rules, separated from sending dice so they can be reused for batches.
+
+evaluate() is pure: given the dice value Telegram rolled, the bet and the coefficients it
+decides the payout. Coefficients come from BotSettings; the fallbacks here are the ones
+rounds have always been paid with (they are not the menu's GAME_DEFAULTS).
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.engine import get_settings_version
+from database.models import BotSettings
+
+# Payout coefficient fallbacks when the admin has not set game_<game>_coeff(1|2)
+COEFF_DEFAULTS = {
+    "football":   {"coeff": 3.0},
+    "basketball": {"coeff": 2.5},
+    "bowling":    {"coeff": 4.0},
+    "dice":       {"coeff": 1.9},
+    "slots":      {"coeff1": 5.0, "coeff2": 2.0},
+}
+
+# Telegram rolls each animated emoji uniformly over 1..faces
+DICE_FACES = {
+    "football":   5,
+    "basketball": 5,
+    "bowling":    6,
+    "dice":       6,
+    "slots":      64,
+}
+
+# Dice values that win, per game
+WINNING_VALUES = {
+    "football":   {5},
+    "basketball": {4, 5},
+    "bowling":    {6},
+}
+DICE_HIGH = {4, 5, 6}
+DICE_LOW = {1, 2, 3}
+# 🎰 values 1–64: the top band pays coeff1, the next one coeff2
+SLOTS_COEFF1 = range(1, 4)
+SLOTS_COEFF2 = range(4, 11)
+
+_coeffs_cache: dict[str, tuple[int, dict[str, float]]] = {}
+
+
+async def load_coeffs(session: AsyncSession, game_type: str) -> dict[str, float]:
+    """Current coefficients of a game, reread only after a settings change."""
+    version = get_settings_version()
+    cached = _coeffs_cache.get(game_type)
+    if cached and cached[0] == version:
+        return cached[1]
+    coeffs = {}
+    for name, default in COEFF_DEFAULTS[game_type].items():
+        row = await session.get(BotSettings, f"game_{game_type}_{name}")
+        try:
+            coeffs[name] = float(row.value) if row else default
+        except ValueError:
+            coeffs[name] = default
+    _coeffs_cache[game_type] = (version, coeffs)
+    return coeffs
+
+
+def evaluate(
+    game_type: str,
+    value: int,
+    bet: float,
+    coeffs: dict[str, float],
+    dice_side: str | None = None,
+) -> tuple[bool, float]:
+    """Returns (won, payout) of one round."""
+    if game_type == "slots":
+        if value in SLOTS_COEFF1:
+            return True, round(bet * coeffs["coeff1"], 2)
+        if value in SLOTS_COEFF2:
+            return True, round(bet * coeffs["coeff2"], 2)
+        return False, 0.0
+    if game_type == "dice":
+        won = value in (DICE_HIGH if dice_side == "high" else DICE_LOW if dice_side == "low" else ())
+    else:
+        won = value in WINNING_VALUES[game_type]
+    return (True, round(bet * coeffs["coeff"], 2)) if won else (False, 0.0)
@@ -0,0 +1,253 @@
+"""Transactional outbox for Bot API calls that must not hold up a handler.
+
+Handlers queue channel posts, edits and user notifications as outbox rows in the same
+transaction as the change they report, commit, answer the user and call wake(). A single
+background dispatcher delivers due rows in order, one commit per row: a delivered row is
+deleted (and a sent message's id written back to its withdrawal). Calls are paced to the Bot
+API limits, overall and per group/channel; a flood-limited row waits for retry_after, a
+network/server error backs off exponentially and a permanent error (bad request, bot
+blocked) marks the row failed. Delivery is at-least-once: a crash between the API call and
+the commit repeats that one call after restart.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramNotFound, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.engine import SessionFactory
+from database.models import OutboxMessage, Withdrawal
+
+logger = logging.getLogger(__name__)
+
+# Withdrawal columns that hold ids of messages posted about it
+_WITHDRAWAL_FIELDS = {"channel_message_id": Withdrawal.channel_message_id,
+                      "payments_message_id": Withdrawal.payments_message_id}
+
+
+class Outbox:
+    POLL_INTERVAL = 5.0
+    BATCH_SIZE = 50
+    MAX_ATTEMPTS = 8
+    # Bot API limits: about 30 calls a second overall and 20 a minute into one group or channel
+    CALLS_PER_SECOND = 25
+    GROUP_INTERVAL = timedelta(seconds=3)
+    # An edit whose message is still being sent is retried after this long
+    _WAIT_FOR_SEND = timedelta(seconds=5)
+    # Failed rows are kept this long for inspection, then pruned by the scheduler
+    FAILED_RETENTION = timedelta(days=30)
+
+    def __init__(self) -> None:
+        self._wake = asyncio.Event()
+        self._next_call = 0.0
+        # chat_id → when the next call into that chat may go out (group pacing, retry_after)
+        self._chat_ready: dict[str, datetime] = {}
+
+    # ── queueing (inside the caller's transaction) ───────────────────────────
+
+    @staticmethod
+    def send(
+        session: AsyncSession,
+        chat_id: int | str,
+        text: str,
+        reply_markup: InlineKeyboardMarkup | None = None,
+        withdrawal_id: int | None = None,
+        store_as: str | None = None,
+    ) -> None:
+        """Queue a message; with `store_as`, its id is written to that column of the withdrawal."""
+        session.add(OutboxMessage(
+            kind="send", chat_id=str(chat_id), text=text,
+            reply_markup=reply_markup.model_dump_json(exclude_none=True) if reply_markup else None,
+            withdrawal_id=withdrawal_id, withdrawal_field=store_as,
+        ))
+
+    @staticmethod
+    def edit_text(
+        session: AsyncSession,
+        chat_id: int | str,
+        text: str,
+        message_id: int | None = None,
+        withdrawal_id: int | None = None,
+        field: str | None = None,
+    ) -> None:
+        """Queue a text edit. Without `message_id` the id is read from the withdrawal's `field`
+        at delivery, so a message that is itself still queued can be edited."""
+        session.add(OutboxMessage(
+            kind="edit_text", chat_id=str(chat_id), message_id=message_id, text=text,
+            withdrawal_id=withdrawal_id, withdrawal_field=field,
+        ))
+
+    @staticmethod
+    def edit_markup(
+        session: AsyncSession,
+        chat_id: int | str,
+        message_id: int | None = None,
+        reply_markup: InlineKeyboardMarkup | None = None,
+        withdrawal_id: int | None = None,
+        field: str | None = None,
+    ) -> None:
+        """Queue a markup edit (None removes the buttons); the message is found as for edit_text."""
+        session.add(OutboxMessage(
+            kind="edit_markup", chat_id=str(chat_id), message_id=message_id,
+            reply_markup=reply_markup.model_dump_json(exclude_none=True) if reply_markup else None,
+            withdrawal_id=withdrawal_id, withdrawal_field=field,
+        ))
+
+    def wake(self) -> None:
+        """Tell the dispatcher that rows were committed; call after session.commit()."""
+        self._wake.set()
+
+    # ── delivery ─────────────────────────────────────────────────────────────
+
+    async def _call(self, bot: Bot, row: OutboxMessage, message_id: int | None) -> int | None:
+        markup = InlineKeyboardMarkup.model_validate_json(row.reply_markup) if row.reply_markup else None
+        if row.kind == "send":
+            sent = await bot.send_message(row.chat_id, row.text, parse_mode="HTML", reply_markup=markup)
+            return sent.message_id
+        try:
+            if row.kind == "edit_text":
+                await bot.edit_message_text(
+                    chat_id=row.chat_id, message_id=message_id, text=row.text, parse_mode="HTML",
+                )
+            else:
+                await bot.edit_message_reply_markup(chat_id=row.chat_id, message_id=message_id, reply_markup=markup)
+        except TelegramBadRequest as exc:
+            if "message is not modified" not in str(exc):
+                raise
+        return None
+
+    async def _pace(self) -> None:
+        loop = asyncio.get_running_loop()
+        wait = self._next_call - loop.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._next_call = max(self._next_call, loop.time()) + 1 / self.CALLS_PER_SECOND
+
+    async def _target(self, session: AsyncSession, row: OutboxMessage) -> int | None | bool:
+        """Message id an edit applies to; False when the message is still queued for sending."""
+        if row.message_id is not None or row.withdrawal_field not in _WITHDRAWAL_FIELDS:
+            return row.message_id
+        message_id = await session.scalar(
+            select(_WITHDRAWAL_FIELDS[row.withdrawal_field]).where(Withdrawal.id == row.withdrawal_id)
+        )
+        if message_id is not None:
+            return message_id
+        still_sending = await session.scalar(
+            select(OutboxMessage.id).where(
+                OutboxMessage.kind == "send",
+                OutboxMessage.status == "pending",
+                OutboxMessage.withdrawal_id == row.withdrawal_id,
+                OutboxMessage.withdrawal_field == row.withdrawal_field,
+            ).limit(1)
+        )
+        return False if still_sending else None
+
+    async def _fail(self, session: AsyncSession, row: OutboxMessage, error: str, retry_in: float | None) -> None:
+        row.attempts += 1
+        row.last_error = error[:500]
+        if retry_in is None or row.attempts >= self.MAX_ATTEMPTS:
+            row.status = "failed"
+            logger.warning("Outbox message %s (%s to %s) failed: %s", row.id, row.kind, row.chat_id, error)
+        else:
+            row.next_attempt_at = datetime.utcnow() + timedelta(seconds=retry_in)
+        await session.commit()
+
+    async def deliver_due(self, session: AsyncSession, bot: Bot) -> float:
+        """Deliver up to BATCH_SIZE due rows; return how long the dispatcher may sleep."""
+        now = datetime.utcnow()
+        rows = (await session.scalars(
+            select(OutboxMessage)
+            .where(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= now)
+            .order_by(OutboxMessage.id)
+            .limit(self.BATCH_SIZE)
+        )).all()
+        self._chat_ready = {chat: t for chat, t in self._chat_ready.items() if t > now}
+        for row in rows:
+            ready = self._chat_ready.get(row.chat_id)
+            if ready and ready > datetime.utcnow():
+                row.next_attempt_at = ready
+                continue
+            message_id = None
+            if row.kind != "send":
+                message_id = await self._target(session, row)
+                if message_id is False:
+                    row.next_attempt_at = datetime.utcnow() + self._WAIT_FOR_SEND
+                    continue
+                if message_id is None:
+                    # nothing to edit: the message was never posted
+                    await session.delete(row)
+                    await session.commit()
+                    continue
+            await self._pace()
+            if row.chat_id.startswith(("-", "@")):
+                self._chat_ready[row.chat_id] = datetime.utcnow() + self.GROUP_INTERVAL
+            try:
+                sent_id = await self._call(bot, row, message_id)
+            except TelegramRetryAfter as exc:
+                retry_at = datetime.utcnow() + timedelta(seconds=exc.retry_after)
+                row.next_attempt_at = self._chat_ready[row.chat_id] = retry_at
+                await session.commit()
+                continue
+            except (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound) as exc:
+                await self._fail(session, row, str(exc), retry_in=None)
+                continue
+            except Exception as exc:
+                # network trouble, Telegram 5xx…: back off exponentially
+                await self._fail(session, row, str(exc), retry_in=min(5 * 2 ** row.attempts, 600))
+                continue
+            if sent_id is not None and row.withdrawal_field in _WITHDRAWAL_FIELDS:
+                await session.execute(
+                    update(Withdrawal).where(Withdrawal.id == row.withdrawal_id)
+                    .values({row.withdrawal_field: sent_id})
+                )
+            await session.delete(row)
+            await session.commit()
+        # rows postponed above
+        await session.commit()
+
+        if len(rows) == self.BATCH_SIZE:
+            return 0.0
+        next_due = await session.scalar(
+            select(OutboxMessage.next_attempt_at)
+            .where(OutboxMessage.status == "pending")
+            .order_by(OutboxMessage.next_attempt_at)
+            .limit(1)
+        )
+        if next_due is None:
+            return self.POLL_INTERVAL
+        return min(self.POLL_INTERVAL, max(0.0, (next_due - datetime.utcnow()).total_seconds()))
+
+    async def prune_failed(self, session: AsyncSession) -> int:
+        """Delete failed rows older than FAILED_RETENTION; returns how many."""
+        result = await session.execute(
+            delete(OutboxMessage)
+            .where(OutboxMessage.status == "failed",
+                   OutboxMessage.created_at < datetime.utcnow() - self.FAILED_RETENTION)
+        )
+        await session.commit()
+        return result.rowcount
+
+    async def run(self, bot: Bot) -> None:
+        """Deliver queued rows until cancelled, waking early on wake()."""
+        while True:
+            self._wake.clear()
+            try:
+                async with SessionFactory() as session:
+                    delay = await self.deliver_due(session, bot)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Outbox dispatcher failed")
+                delay = self.POLL_INTERVAL
+            if delay:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+
+outbox = Outbox()
@@ -0,0 +1,216 @@
+import asyncio
+import csv
+import io
+import random
+import re
+import secrets
+from dataclasses import dataclass
+
+from sqlalchemy import select, insert, update, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import PromoCode, PromoUse, User
+
+# No 0/O/1/I so codes survive being retyped from a screenshot
+CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+CODE_LENGTH = 10
+BULK_MAX_CODES = 20_000
+
+_CODE_RE = re.compile(r"^[A-Z0-9_-]{3,64}$")
+
+
+def normalize_code(raw: str) -> str:
+    return raw.strip().upper()
+
+
+def generate_codes(count: int, prefix: str = "") -> list[str]:
+    return [
+        prefix + "".join(secrets.choice(CODE_ALPHABET) for _ in range(CODE_LENGTH))
+        for _ in range(count)
+    ]
+
+
+def parse_codes_file(data: bytes) -> tuple[list[str], list[str]]:
+    """Parse an uploaded .txt (one code per line) or .csv (code in the first column).
+    Returns (valid unique codes in file order, rejected raw values)."""
+    text = data.decode("utf-8-sig", errors="replace")
+    valid: dict[str, None] = {}
+    rejected: list[str] = []
+    for row in csv.reader(io.StringIO(text)):
+        if not row or not row[0].strip():
+            continue
+        code = normalize_code(row[0])
+        if code == "CODE" and not valid and not rejected:
+            continue  # header
+        if _CODE_RE.match(code):
+            valid[code] = None
+        else:
+            rejected.append(row[0].strip())
+    return list(valid), rejected
+
+
+async def bulk_insert_codes(
+    session: AsyncSession,
+    codes: list[str],
+    reward: float,
+    is_random: bool,
+    reward_min: float | None,
+    reward_max: float | None,
+    usage_limit: int | None,
+) -> list[str]:
+    """Insert all codes with one executemany INSERT OR IGNORE and commit.
+    Codes that already exist are skipped. Returns the codes that were actually created."""
+    if not codes:
+        return []
+    max_id_before = (await session.execute(select(func.max(PromoCode.id)))).scalar() or 0
+    await session.execute(
+        insert(PromoCode).prefix_with("OR IGNORE"),
+        [
+            {
+                "code": code,
+                "reward": reward,
+                "is_random": is_random,
+                "reward_min": reward_min,
+                "reward_max": reward_max,
+                "usage_limit": usage_limit,
+            }
+            for code in codes
+        ],
+    )
+    wanted = set(codes)
+    created = (await session.execute(
+        select(PromoCode.code).where(PromoCode.id > max_id_before).order_by(PromoCode.id)
+    )).scalars().all()
+    await session.commit()
+    promo_index.invalidate()
+    return [code for code in created if code in wanted]
+
+
+async def bulk_generate_codes(session: AsyncSession, count: int, prefix: str = "", **reward) -> list[str]:
+    """Generate and insert `count` new random codes, retrying for the (rare) collisions."""
+    created: list[str] = []
+    for _ in range(5):
+        missing = count - len(created)
+        if missing <= 0:
+            break
+        created += await bulk_insert_codes(session, generate_codes(missing, prefix), **reward)
+    return created
+
+
+# ─── Active-code index & redemption ──────────────────────────────────────────
+
+@dataclass(frozen=True, slots=True)
+class ActivePromo:
+    id: int
+    reward: float
+    is_random: bool
+    reward_min: float | None
+    reward_max: float | None
+
+    def roll_reward(self) -> float:
+        if self.is_random and self.reward_min is not None and self.reward_max is not None:
+            return round(random.uniform(self.reward_min, self.reward_max), 2)
+        return self.reward
+
+
+class PromoIndex:
+    """In-memory map of redeemable codes, so unknown or garbage input never reaches the DB.
+
+    Loaded lazily with one query; admin handlers keep it in sync via put()/discard()/load().
+    The DB stays authoritative: redemption re-checks activity and the limit atomically."""
+
+    def __init__(self) -> None:
+        self._codes: dict[str, ActivePromo] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    async def load(self, session: AsyncSession) -> None:
+        rows = (await session.execute(
+            select(PromoCode).where(
+                PromoCode.is_active == True,
+                or_(PromoCode.usage_limit.is_(None), PromoCode.usage_count < PromoCode.usage_limit),
+            )
+        )).scalars().all()
+        self._codes = {promo.code: self._entry(promo) for promo in rows}
+        self._loaded = True
+
+    async def ensure_loaded(self, session: AsyncSession) -> None:
+        if self._loaded:
+            return
+        async with self._lock:
+            if not self._loaded:
+                await self.load(session)
+
+    @staticmethod
+    def _entry(promo: PromoCode) -> ActivePromo:
+        return ActivePromo(promo.id, promo.reward, promo.is_random, promo.reward_min, promo.reward_max)
+
+    def get(self, code: str) -> ActivePromo | None:
+        return self._codes.get(code)
+
+    def put(self, promo: PromoCode) -> None:
+        if promo.is_active:
+            self._codes[promo.code] = self._entry(promo)
+        else:
+            self._codes.pop(promo.code, None)
+
+    def discard(self, code: str) -> None:
+        self._codes.pop(code, None)
+
+    def invalidate(self) -> None:
+        """Reload on next use — cheaper than put() for thousands of bulk-created codes."""
+        self._loaded = False
+
+
+promo_index = PromoIndex()
+
+REDEEM_OK = "ok"
+REDEEM_NOT_FOUND = "not_found"
+REDEEM_ALREADY_USED = "already_used"
+REDEEM_EXHAUSTED = "exhausted"
+
+
+async def redeem_promo(session: AsyncSession, user_id: int, code: str) -> tuple[str, float, float | None]:
+    """Redeem `code` for `user_id` in one transaction.
+
+    INSERT OR IGNORE into the uniquely indexed promo_uses rejects reuse; the conditional
+    usage_count increment rejects over-limit redemptions without a read-then-write race.
+    Returns (status, reward, new_balance)."""
+    await promo_index.ensure_loaded(session)
+    promo = promo_index.get(normalize_code(code))
+    if promo is None:
+        return REDEEM_NOT_FOUND, 0.0, None
+
+    used = await session.execute(
+        insert(PromoUse).prefix_with("OR IGNORE").values(user_id=user_id, promo_id=promo.id)
+    )
+    if used.rowcount == 0:
+        await session.rollback()
+        return REDEEM_ALREADY_USED, 0.0, None
+
+    claimed = await session.execute(
+        update(PromoCode)
+        .where(
+            PromoCode.id == promo.id,
+            PromoCode.is_active == True,
+            or_(PromoCode.usage_limit.is_(None), PromoCode.usage_count < PromoCode.usage_limit),
+        )
+        .values(usage_count=PromoCode.usage_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if claimed.rowcount == 0:
+        # deactivated (or deleted) since the index was loaded, or out of uses
+        active = await session.scalar(select(PromoCode.is_active).where(PromoCode.id == promo.id))
+        await session.rollback()
+        promo_index.discard(normalize_code(code))
+        return (REDEEM_EXHAUSTED if active else REDEEM_NOT_FOUND), 0.0, None
+
+    reward = promo.roll_reward()
+    balance = (await session.execute(
+        update(User)
+        .where(User.user_id == user_id)
+        .values(stars_balance=User.stars_balance + reward)
+        .returning(User.stars_balance)
+    )).scalar_one()
+    await session.commit()
+    return REDEEM_OK, reward, balance
@@ -0,0 +1,118 @@
+"""Auto-completion of "referrals" tasks, driven by signup events.
+
+Each batch of signups touches a set of referrers whose referrals_count just grew. Active
+referral tasks are kept sorted by target_value, so bisect finds the tasks a referrer has
+reached without looking at the others. Completions for the whole batch are one INSERT OR IGNORE
+(the unique (user_id, task_id) index makes it idempotent), credits one executemany UPDATE,
+and every referrer gets a single consolidated message.
+"""
+import bisect
+import logging
+from collections import defaultdict
+
+from aiogram import Bot
+from sqlalchemy import select, insert, update, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import TaskCompletion, User
+from services.events import SignupEvent
+from services.task_cache import CachedTask, task_cache
+
+logger = logging.getLogger(__name__)
+
+
+async def complete_tasks(session: AsyncSession, pairs: list[tuple[int, int]]) -> set[tuple[int, int]]:
+    """Insert (user_id, task_id) completions, skipping ones that already exist.
+    Does not commit. Returns the pairs that were actually inserted."""
+    if not pairs:
+        return set()
+    result = await session.execute(
+        insert(TaskCompletion).prefix_with("OR IGNORE").returning(TaskCompletion.user_id, TaskCompletion.task_id),
+        [{"user_id": user_id, "task_id": task_id} for user_id, task_id in pairs],
+    )
+    return {tuple(row) for row in result}
+
+
+class ReferralTaskCompleter:
+    def __init__(self, bot: Bot) -> None:
+        self.bot = bot
+        self._index_version = -1
+        self._thresholds: list[int] = []
+        self._tasks: list[CachedTask] = []
+
+    async def _index(self, session: AsyncSession) -> None:
+        tasks = await task_cache.active(session)
+        if self._index_version == task_cache.version:
+            return
+        referral_tasks = sorted(
+            (t for t in tasks if t.task_type == "referrals" and t.target_value),
+            key=lambda t: t.target_value,
+        )
+        self._thresholds = [t.target_value for t in referral_tasks]
+        self._tasks = referral_tasks
+        self._index_version = task_cache.version
+
+    async def complete_batch(self, session: AsyncSession, events: list[SignupEvent]) -> None:
+        """Event-bus subscriber."""
+        referrer_ids = {e.referrer_id for e in events if e.referrer_id}
+        if not referrer_ids:
+            return
+        await self._index(session)
+        if not self._tasks:
+            return
+
+        counts = dict((await session.execute(
+            select(User.user_id, User.referrals_count).where(User.user_id.in_(referrer_ids))
+        )).all())
+        candidates = {
+            user_id: self._tasks[:bisect.bisect_right(self._thresholds, count)]
+            for user_id, count in counts.items()
+        }
+        candidates = {user_id: tasks for user_id, tasks in candidates.items() if tasks}
+        if not candidates:
+            return
+
+        done = set((await session.execute(
+            select(TaskCompletion.user_id, TaskCompletion.task_id).where(
+                TaskCompletion.user_id.in_(candidates),
+                TaskCompletion.task_id.in_({t.id for tasks in candidates.values() for t in tasks}),
+            )
+        )).all())
+        by_id = {t.id: t for t in self._tasks}
+        pairs = [
+            (user_id, task.id)
+            for user_id, tasks in candidates.items()
+            for task in tasks
+            if (user_id, task.id) not in done
+        ]
+        inserted = await complete_tasks(session, pairs)
+        if not inserted:
+            await session.rollback()
+            return
+
+        earned: dict[int, list[CachedTask]] = defaultdict(list)
+        for user_id, task_id in inserted:
+            earned[user_id].append(by_id[task_id])
+        users = User.__table__  # Core table: an ORM update() with a parameter list means "bulk by PK"
+        await session.execute(
+            update(users)
+            .where(users.c.user_id == bindparam("uid"))
+            .values(stars_balance=users.c.stars_balance + bindparam("amount")),
+            [{"uid": user_id, "amount": sum(t.reward for t in tasks)} for user_id, tasks in earned.items()],
+        )
+        await session.commit()
+        for user_id, task_id in inserted:
+            task_cache.mark_completed(user_id, task_id)
+
+        for user_id, tasks in earned.items():
+            lines = "\n".join(f"• {t.title} (+{t.reward} ⭐)" for t in tasks)
+            total = sum(t.reward for t in tasks)
+            try:
+                await self.bot.send_message(
+                    user_id,
+                    f"🎉 <b>Задания выполнены автоматически!</b>\n\n{lines}\n\nИтого: <b>+{total} ⭐</b>",
+                    parse_mode="HTML",
+                )
+            except Exception:
+                pass
+        logger.info("Auto-completed %d referral tasks for %d users", len(inserted), len(earned))
@@ -0,0 +1,167 @@
+"""Multi-level referrals on top of the referral_paths closure table.
+
+Every user has one row per ancestor in their referral chain (depth 1 = direct referrer),
+so the reward fan-out of a signup and "downline by level" counts are single indexed queries
+instead of walking referrer_id recursively.
+
+Rows are added in _register_user as users sign up. Users that existed before the table are
+backfilled on the first start, or manually with:
+    python -m services.referrals backfill
+"""
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import select, insert, update, delete, func, case, literal, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import config
+from database.models import BotSettings, ReferralPath, User
+
+logger = logging.getLogger(__name__)
+
+# BotSettings keys of the per-level commission, level 1 first
+TIER_KEYS = ("referral_reward", "referral_reward_l2", "referral_reward_l3")
+# Upper bound on chain depth for the backfill (referrer_id cycles already stop on OR IGNORE)
+MAX_BACKFILL_DEPTH = 1000
+
+
+async def get_tier_rewards(session: AsyncSession) -> list[float]:
+    defaults = (config.REFERRAL_REWARD, config.REFERRAL_REWARD_L2, config.REFERRAL_REWARD_L3)
+    rows = await session.execute(select(BotSettings.key, BotSettings.value).where(BotSettings.key.in_(TIER_KEYS)))
+    stored = dict(rows.all())
+    rewards = []
+    for key, default in zip(TIER_KEYS, defaults):
+        try:
+            rewards.append(float(stored[key]))
+        except (KeyError, ValueError):
+            rewards.append(default)
+    return rewards
+
+
+async def link_referral(session: AsyncSession, user_id: int, referrer_id: int) -> list[tuple[int, int]]:
+    """Add the closure rows of a new user: the referrer at depth 1 plus every ancestor of the
+    referrer one level deeper. Does not commit. Returns [(ancestor_id, depth)]."""
+    rows = union_all(
+        select(literal(referrer_id), literal(user_id), literal(1)),
+        select(ReferralPath.ancestor_id, literal(user_id), ReferralPath.depth + 1)
+        .where(ReferralPath.descendant_id == referrer_id),
+    )
+    result = await session.execute(
+        insert(ReferralPath)
+        .from_select(["ancestor_id", "descendant_id", "depth"], rows)
+        .returning(ReferralPath.ancestor_id, ReferralPath.depth)
+    )
+    return [tuple(row) for row in result]
+
+
+async def pay_referral_rewards(
+    session: AsyncSession,
+    user_id: int,
+    paths: list[tuple[int, int]],
+    tiers: list[float],
+    hold_direct: bool = False,
+) -> list[tuple[int, int, float]]:
+    """Credit every rewarded ancestor of `user_id` in one UPDATE ... FROM referral_paths and
+    bump the direct referrer's referrals_count. With `hold_direct` the level-1 reward is not
+    credited (the caller parks it elsewhere). Does not commit.
+    Returns [(ancestor_id, depth, reward)] for the ancestors that received a reward."""
+    if hold_direct:
+        tiers = [0.0, *tiers[1:]]
+    reward = case(
+        *((ReferralPath.depth == level, amount) for level, amount in enumerate(tiers, start=1)),
+        else_=0.0,
+    )
+    await session.execute(
+        update(User)
+        .where(
+            User.user_id == ReferralPath.ancestor_id,
+            ReferralPath.descendant_id == user_id,
+            ReferralPath.depth <= len(tiers),
+        )
+        .values(
+            stars_balance=User.stars_balance + reward,
+            referrals_count=User.referrals_count + case((ReferralPath.depth == 1, 1), else_=0),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return [
+        (ancestor_id, depth, tiers[depth - 1])
+        for ancestor_id, depth in paths
+        if depth <= len(tiers) and tiers[depth - 1] > 0
+    ]
+
+
+async def downline_by_level(session: AsyncSession, user_id: int) -> dict[int, int]:
+    """{depth: number of users} below `user_id`, read from the closure table's primary key."""
+    rows = await session.execute(
+        select(ReferralPath.depth, func.count())
+        .where(ReferralPath.ancestor_id == user_id)
+        .group_by(ReferralPath.depth)
+        .order_by(ReferralPath.depth)
+    )
+    return dict(rows.all())
+
+
+# ─── Backfill ────────────────────────────────────────────────────────────────
+
+async def paths_missing(session: AsyncSession) -> bool:
+    """True if users have referrers but the closure table is empty (first start after upgrade)."""
+    has_paths = (await session.execute(select(ReferralPath.ancestor_id).limit(1))).first()
+    if has_paths:
+        return False
+    has_referred = (await session.execute(select(User.user_id).where(User.referrer_id.is_not(None)).limit(1))).first()
+    return has_referred is not None
+
+
+async def rebuild_referral_paths(session: AsyncSession) -> int:
+    """Rebuild referral_paths from users.referrer_id, one set-based INSERT per depth level,
+    and commit. Returns the number of rows written."""
+    await session.execute(delete(ReferralPath))
+    result = await session.execute(
+        insert(ReferralPath).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(User.referrer_id, User.user_id, literal(1)).where(User.referrer_id.is_not(None)),
+        )
+    )
+    total = added = result.rowcount
+    depth = 1
+    while added and depth < MAX_BACKFILL_DEPTH:
+        result = await session.execute(
+            insert(ReferralPath).prefix_with("OR IGNORE").from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(ReferralPath.ancestor_id, User.user_id, literal(depth + 1))
+                .join(User, User.referrer_id == ReferralPath.descendant_id)
+                .where(ReferralPath.depth == depth),
+            )
+        )
+        added = result.rowcount
+        total += added
+        depth += 1
+    if added:
+        logger.error("Referral chains deeper than %d levels were truncated", MAX_BACKFILL_DEPTH)
+    await session.commit()
+    logger.info("Rebuilt referral_paths: %d rows", total)
+    return total
+
+
+def _main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m services.referrals")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("backfill", help="rebuild referral_paths from users.referrer_id")
+    parser.parse_args()
+
+    from database import init_db
+    from database.engine import SessionFactory
+
+    async def run() -> None:
+        await init_db()
+        async with SessionFactory() as session:
+            print(await rebuild_referral_paths(session))
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    _main()
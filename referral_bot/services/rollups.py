@@ -0,0 +1,224 @@
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import BotSettings, DailyRollup, GameSession, User, Withdrawal
+
+logger = logging.getLogger(__name__)
+
+# Upper bound of rows per source folded in one run, keeps the write transaction short
+BATCH_ROWS = 50_000
+# Timestamp-watermarked sources have no order of commit, so each run recounts their whole days
+# back to this far before the last run and overwrites those cells: a row stamped before the last
+# run but committed after it is picked up by the next run instead of being skipped
+RESCAN_OVERLAP = timedelta(minutes=10)
+
+WM_GAMES = "rollup_wm_game_sessions"
+WM_WITHDRAWALS = "rollup_wm_withdrawals"
+WM_PROCESSED = "rollup_wm_withdrawals_processed"
+WM_USERS = "rollup_wm_users"
+
+_EPOCH = datetime(1970, 1, 1)
+_lock = asyncio.Lock()
+
+RollupKey = tuple[date, str, str]
+
+
+@dataclass
+class Trends:
+    days: int
+    since: date
+    totals: dict[tuple[str, str], float] = field(default_factory=dict)
+    daily: dict[str, list[float]] = field(default_factory=dict)
+    updated_at: datetime | None = None
+
+    def total(self, metric: str, dim: str = "") -> float:
+        return self.totals.get((metric, dim), 0.0)
+
+
+# ─── Watermarks ───────────────────────────────────────────────────────────────
+
+async def _get_wm(session: AsyncSession, key: str) -> str | None:
+    row = await session.get(BotSettings, key)
+    return row.value if row and row.value else None
+
+
+async def get_games_watermark(session: AsyncSession) -> int:
+    """Highest game_sessions.id already folded into the rollups."""
+    value = await _get_wm(session, WM_GAMES)
+    return int(value) if value else 0
+
+
+async def _get_wm_time(session: AsyncSession, key: str) -> datetime:
+    value = await _get_wm(session, key)
+    return datetime.fromisoformat(value) if value else _EPOCH
+
+
+async def _set_wm(session: AsyncSession, key: str, value: int | datetime) -> None:
+    text = value.isoformat() if isinstance(value, datetime) else str(value)
+    await session.merge(BotSettings(key=key, value=text))
+
+
+# ─── Merge ────────────────────────────────────────────────────────────────────
+
+def _day(value: str | date) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+async def _merge(session: AsyncSession, acc: dict[RollupKey, float], replace: bool = False) -> None:
+    """Add `acc` to the rollup cells, or overwrite them with `replace` (recounted days)."""
+    if not acc:
+        return
+    stmt = sqlite_insert(DailyRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyRollup.day, DailyRollup.metric, DailyRollup.dim],
+        set_={"value": stmt.excluded.value if replace else DailyRollup.value + stmt.excluded.value},
+    )
+    await session.execute(
+        stmt,
+        [{"day": d, "metric": m, "dim": dim, "value": v} for (d, m, dim), v in acc.items()],
+    )
+
+
+async def add_rollup(session: AsyncSession, metric: str, value: float = 1.0, dim: str = "") -> None:
+    """Add to today's rollup directly, for events that have no source table (e.g. bonus claims).
+    Does not commit — call it inside the transaction that records the event."""
+    await _merge(session, {(datetime.utcnow().date(), metric, dim): value})
+
+
+# ─── Sources ──────────────────────────────────────────────────────────────────
+
+async def _fold_games(session: AsyncSession, acc: dict[RollupKey, float]) -> None:
+    lo = await get_games_watermark(session)
+    hi = (await session.execute(select(func.max(GameSession.id)))).scalar() or 0
+    hi = min(hi, lo + BATCH_ROWS)
+    if hi <= lo:
+        return
+
+    day = func.date(GameSession.played_at)
+    rows = await session.execute(
+        select(
+            day, GameSession.game_type,
+            func.count(GameSession.id), func.sum(GameSession.bet), func.sum(GameSession.payout),
+        )
+        .where(GameSession.id > lo, GameSession.id <= hi)
+        .group_by(day, GameSession.game_type)
+    )
+    for d, game, played, wagered, payout in rows:
+        d = _day(d)
+        acc[(d, "games_played", game)] += played
+        acc[(d, "games_wagered", game)] += wagered or 0.0
+        acc[(d, "games_payout", game)] += payout or 0.0
+    await _set_wm(session, WM_GAMES, hi)
+
+
+async def _fold_withdrawals_created(session: AsyncSession, acc: dict[RollupKey, float]) -> None:
+    value = await _get_wm(session, WM_WITHDRAWALS)
+    lo = int(value) if value else 0
+    hi = (await session.execute(select(func.max(Withdrawal.id)))).scalar() or 0
+    hi = min(hi, lo + BATCH_ROWS)
+    if hi <= lo:
+        return
+
+    day = func.date(Withdrawal.created_at)
+    rows = await session.execute(
+        select(day, func.count(Withdrawal.id), func.sum(Withdrawal.amount))
+        .where(Withdrawal.id > lo, Withdrawal.id <= hi)
+        .group_by(day)
+    )
+    for d, count, amount in rows:
+        d = _day(d)
+        acc[(d, "withdrawals_count", "created")] += count
+        acc[(d, "withdrawals_amount", "created")] += amount or 0.0
+    await _set_wm(session, WM_WITHDRAWALS, hi)
+
+
+async def _rescan_from(session: AsyncSession, key: str) -> datetime:
+    """Start of the first day a timestamp-watermarked source has to recount."""
+    return datetime.combine((await _get_wm_time(session, key) - RESCAN_OVERLAP).date(), time.min)
+
+
+async def _recount_withdrawals_processed(session: AsyncSession, acc: dict[RollupKey, float], now: datetime) -> None:
+    since = await _rescan_from(session, WM_PROCESSED)
+    day = func.date(Withdrawal.processed_at)
+    rows = await session.execute(
+        select(day, Withdrawal.status, func.count(Withdrawal.id), func.sum(Withdrawal.amount))
+        .where(Withdrawal.processed_at >= since)
+        .group_by(day, Withdrawal.status)
+    )
+    for d, status, count, amount in rows:
+        d = _day(d)
+        acc[(d, "withdrawals_count", status)] = count
+        acc[(d, "withdrawals_amount", status)] = amount or 0.0
+    await _set_wm(session, WM_PROCESSED, now)
+
+
+async def _recount_users(session: AsyncSession, acc: dict[RollupKey, float], now: datetime) -> None:
+    since = await _rescan_from(session, WM_USERS)
+    day = func.date(User.created_at)
+    rows = await session.execute(
+        select(day, func.count(User.user_id), func.count(User.referrer_id))
+        .where(User.created_at >= since)
+        .group_by(day)
+    )
+    for d, joined, referred in rows:
+        d = _day(d)
+        acc[(d, "new_users", "")] = joined
+        acc[(d, "referral_conversions", "")] = referred
+    await _set_wm(session, WM_USERS, now)
+
+
+async def run_rollups(session: AsyncSession) -> int:
+    """Fold every id-watermarked source row past its watermark into daily_rollups and recount
+    the recent days of the timestamp-watermarked ones. Rollup values and watermarks are
+    committed together, so each row is counted exactly once. Returns the number of rollup
+    cells touched."""
+    async with _lock:
+        acc: dict[RollupKey, float] = defaultdict(float)
+        recounted: dict[RollupKey, float] = {}
+        now = datetime.utcnow()
+        await _fold_games(session, acc)
+        await _fold_withdrawals_created(session, acc)
+        await _recount_withdrawals_processed(session, recounted, now)
+        await _recount_users(session, recounted, now)
+        await _merge(session, acc)
+        await _merge(session, recounted, replace=True)
+        await session.commit()
+        if acc or recounted:
+            logger.info("Rollups: %d cells updated", len(acc) + len(recounted))
+        return len(acc) + len(recounted)
+
+
+# ─── Read side ────────────────────────────────────────────────────────────────
+
+async def load_trends(session: AsyncSession, days: int, series: tuple[str, ...] = ()) -> Trends:
+    """Totals per (metric, dim) over the last `days` days, plus per-day values for `series` metrics.
+    Reads at most days × metrics rollup rows regardless of source table size."""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    trends = Trends(days=days, since=since, updated_at=await _get_wm_time(session, WM_USERS))
+    if trends.updated_at == _EPOCH:
+        trends.updated_at = None
+
+    rows = await session.execute(
+        select(DailyRollup.metric, DailyRollup.dim, func.sum(DailyRollup.value))
+        .where(DailyRollup.day >= since)
+        .group_by(DailyRollup.metric, DailyRollup.dim)
+    )
+    trends.totals = {(metric, dim): value for metric, dim, value in rows}
+
+    if series:
+        trends.daily = {metric: [0.0] * days for metric in series}
+        rows = await session.execute(
+            select(DailyRollup.day, DailyRollup.metric, func.sum(DailyRollup.value))
+            .where(DailyRollup.day >= since, DailyRollup.metric.in_(series))
+            .group_by(DailyRollup.day, DailyRollup.metric)
+        )
+        for d, metric, value in rows:
+            trends.daily[metric][(d - since).days] = value
+    return trends
@@ -0,0 +1,103 @@
+"""Monte-Carlo return-to-player simulation for tuning game coefficients.
+
+The payout of every dice value is taken from services.games.evaluate(), so the simulation
+follows the exact rules rounds are paid with; NumPy then rolls millions of rounds at once.
+Simulations run in a process pool so the bot's event loop never waits on them.
+"""
+import asyncio
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+
+from services.games import DICE_FACES, evaluate
+
+SIM_ROUNDS = 10_000_000
+# Ruin: a player starting with RUIN_BANKROLL bets loses all of it within RUIN_HORIZON rounds
+RUIN_BANKROLL = 100
+RUIN_HORIZON = 1_000
+# Rounds rolled per NumPy batch, bounds the worker's memory
+_CHUNK = 200_000
+
+_pool: ProcessPoolExecutor | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class RtpReport:
+    game_type: str
+    rounds: int
+    exact_rtp: float     # from the payout table, no sampling
+    rtp: float           # simulated
+    rtp_ci: float        # 95% confidence half-width of `rtp`
+    variance: float      # of one round's net result, in bets²
+    hit_rate: float
+    ruin_probability: float
+
+
+def payout_table(game_type: str, coeffs: dict[str, float], dice_side: str | None = "high") -> np.ndarray:
+    """Payout per 1 ⭐ bet, indexed by dice value (index 0 unused)."""
+    faces = DICE_FACES[game_type]
+    table = np.zeros(faces + 1)
+    for value in range(1, faces + 1):
+        table[value] = evaluate(game_type, value, 1.0, coeffs, dice_side)[1]
+    return table
+
+
+def simulate(
+    game_type: str,
+    coeffs: dict[str, float],
+    rounds: int = SIM_ROUNDS,
+    dice_side: str | None = "high",
+    seed: int | None = None,
+) -> RtpReport:
+    """Roll `rounds` rounds of 1 ⭐. Dice side only matters for dice, both sides are symmetric."""
+    rng = np.random.default_rng(seed)
+    table = payout_table(game_type, coeffs, dice_side)
+    faces = DICE_FACES[game_type]
+
+    total = total_sq = 0.0
+    hits = 0
+    done = 0
+    while done < rounds:
+        n = min(_CHUNK, rounds - done)
+        payouts = table[rng.integers(1, faces + 1, size=n)]
+        total += payouts.sum()
+        total_sq += np.square(payouts).sum()
+        hits += np.count_nonzero(payouts)
+        done += n
+    rtp = total / rounds
+    # net = payout - 1, so its variance equals the payout's
+    variance = max(total_sq / rounds - rtp * rtp, 0.0)
+
+    # Ruin over RUIN_HORIZON-round sessions; all paths of a batch at once
+    paths = max(1, min(rounds // RUIN_HORIZON, 20_000))
+    ruined = 0
+    per_batch = max(1, _CHUNK // RUIN_HORIZON)
+    for start in range(0, paths, per_batch):
+        k = min(per_batch, paths - start)
+        net = table[rng.integers(1, faces + 1, size=(k, RUIN_HORIZON))] - 1.0
+        ruined += np.count_nonzero(np.cumsum(net, axis=1).min(axis=1) <= -RUIN_BANKROLL)
+
+    exact = float(table[1:].mean())
+    return RtpReport(
+        game_type=game_type,
+        rounds=rounds,
+        exact_rtp=exact,
+        rtp=float(rtp),
+        rtp_ci=1.96 * math.sqrt(variance / rounds),
+        variance=float(variance),
+        hit_rate=float(hits / rounds),
+        ruin_probability=float(ruined / paths),
+    )
+
+
+async def run_simulation(game_type: str, coeffs: dict[str, float], rounds: int = SIM_ROUNDS) -> RtpReport:
+    """simulate() in the process pool."""
+    global _pool
+    if _pool is None:
+        # spawn, not fork: the bot process has aiosqlite and aiohttp threads running
+        _pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, simulate, game_type, dict(coeffs), rounds)
@@ -0,0 +1,204 @@
+"""In-process asyncio scheduler for periodic maintenance jobs.
+
+A job is an async function taking a fresh DB session, run on an Interval or a Cron trigger
+with optional random jitter. Runs of one job never overlap: a tick (or a manual run from the
+admin panel) that finds the job still running is skipped and counted. Every run records its
+start, duration and outcome for the admin jobs screen; errors are logged and do not stop the
+job. stop() lets running jobs finish for a grace period, then cancels them.
+"""
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.engine import SessionFactory
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class Interval:
+    seconds: float
+
+    def next_after(self, moment: datetime) -> datetime:
+        return moment + timedelta(seconds=self.seconds)
+
+    def __str__(self) -> str:
+        if self.seconds % 3600 == 0:
+            return f"каждые {self.seconds / 3600:g} ч"
+        if self.seconds % 60 == 0:
+            return f"каждые {self.seconds / 60:g} мин"
+        return f"каждые {self.seconds:g} с"
+
+
+def _cron_field(spec: str, lo: int, hi: int) -> frozenset[int]:
+    values: set[int] = set()
+    for part in spec.split(","):
+        rng, _, step = part.partition("/")
+        if rng == "*":
+            start, end = lo, hi
+        elif "-" in rng:
+            start, end = map(int, rng.split("-"))
+        else:
+            start = end = int(rng)
+        if not lo <= start <= end <= hi:
+            raise ValueError(f"Cron field out of range: {spec}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return frozenset(values)
+
+
+@dataclass(frozen=True)
+class Cron:
+    """Five-field cron expression (minute hour day month weekday, UTC; weekday 0 = Monday)
+    with *, a-b, a,b and /step."""
+    expression: str
+    _fields: tuple[frozenset[int], ...] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        parts = self.expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron needs 5 fields: {self.expression}")
+        bounds = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+        object.__setattr__(self, "_fields", tuple(_cron_field(p, *b) for p, b in zip(parts, bounds)))
+
+    def next_after(self, moment: datetime) -> datetime:
+        minutes, hours, days, months, weekdays = self._fields
+        t = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 4)
+        while t < limit:
+            if t.month not in months or t.day not in days or t.weekday() not in weekdays:
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"Cron never fires: {self.expression}")
+
+    def __str__(self) -> str:
+        return f"cron {self.expression}"
+
+
+@dataclass
+class Job:
+    name: str
+    trigger: Interval | Cron
+    func: Callable[[AsyncSession], Awaitable[object]]
+    jitter: float = 0.0
+    immediately: bool = False
+    runs: int = 0
+    failures: int = 0
+    skipped: int = 0
+    running_since: datetime | None = None
+    last_started: datetime | None = None
+    last_duration: float | None = None
+    # ok | error | cancelled
+    last_status: str | None = None
+    last_error: str | None = None
+    last_result: object = None
+    next_run: datetime | None = None
+    _lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+
+class Scheduler:
+    def __init__(self) -> None:
+        self.jobs: dict[str, Job] = {}
+        self._loops: list[asyncio.Task] = []
+        self._runs: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    def add(
+        self,
+        name: str,
+        trigger: Interval | Cron,
+        func: Callable[[AsyncSession], Awaitable[object]],
+        jitter: float = 0.0,
+        immediately: bool = False,
+    ) -> Job:
+        """Register `func(session)`; `jitter` adds up to that many seconds to every tick,
+        `immediately` also runs it (after the jitter) as soon as the scheduler starts."""
+        if name in self.jobs:
+            raise ValueError(f"Job {name} already registered")
+        job = self.jobs[name] = Job(name, trigger, func, jitter, immediately)
+        return job
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._loops = [asyncio.create_task(self._loop(job), name=f"job:{job.name}") for job in self.jobs.values()]
+
+    async def stop(self, grace: float = 10.0) -> None:
+        """Stop scheduling; give running jobs `grace` seconds, then cancel them."""
+        self._stopping.set()
+        for task in self._loops:
+            task.cancel()
+        if self._runs:
+            _, pending = await asyncio.wait(self._runs, timeout=grace)
+            for task in pending:
+                task.cancel()
+        await asyncio.gather(*self._loops, *self._runs, return_exceptions=True)
+        self._loops = []
+
+    def run_now(self, name: str) -> bool:
+        """Start a run outside the schedule; False if the job is already running."""
+        job = self.jobs[name]
+        if job.running or self._stopping.is_set():
+            return False
+        self._spawn(job)
+        return True
+
+    def _spawn(self, job: Job) -> asyncio.Task:
+        task = asyncio.create_task(self._run(job))
+        self._runs.add(task)
+        task.add_done_callback(self._runs.discard)
+        return task
+
+    async def _loop(self, job: Job) -> None:
+        now = datetime.utcnow()
+        tick = now if job.immediately else job.trigger.next_after(now)
+        while True:
+            job.next_run = tick + timedelta(seconds=random.uniform(0, job.jitter))
+            await asyncio.sleep(max(0.0, (job.next_run - datetime.utcnow()).total_seconds()))
+            if job.running:
+                job.skipped += 1
+                logger.warning("Job %s still running, tick skipped", job.name)
+            else:
+                # shielded: cancelling the loop on stop() must not cancel the run itself
+                await asyncio.shield(self._spawn(job))
+            # ticks missed while the job ran are dropped, not caught up
+            tick = job.trigger.next_after(max(tick, datetime.utcnow()))
+
+    async def _run(self, job: Job) -> None:
+        if job._lock.locked():
+            job.skipped += 1
+            return
+        async with job._lock:
+            job.running_since = job.last_started = datetime.utcnow()
+            started = time.monotonic()
+            try:
+                async with SessionFactory() as session:
+                    job.last_result = await job.func(session)
+                job.last_status, job.last_error = "ok", None
+            except asyncio.CancelledError:
+                job.last_status, job.last_error = "cancelled", None
+                raise
+            except Exception as exc:
+                job.failures += 1
+                job.last_status, job.last_error = "error", f"{type(exc).__name__}: {exc}"
+                logger.exception("Job %s failed", job.name)
+            finally:
+                job.runs += 1
+                job.last_duration = time.monotonic() - started
+                job.running_since = None
+
+
+scheduler = Scheduler()
@@ -0,0 +1,281 @@
+"""Re-verification of paid subscribe tasks, clawbacks and repeat offenders.
+
+A scheduler job walks the completions of every active subscribe task by keyset on
+ix_task_completions_task, a bounded number of getChatMember calls per run, and resumes next run
+from the cursor stored in bot_settings. Calls are paced to SUBSCRIPTION_CHECKS_PER_SECOND, which
+together with the outbox's 25 calls a second keeps the bot inside the Bot API budget. A user who
+has left is recorded as a pending lapse (and the lapse is dropped if they come back). Admins
+claw pending lapses back in bulk: one transaction marks them, debits the rewards (never below a
+zero balance), writes the ledger and queues the notifications. Users with
+SUBSCRIPTION_OFFENDER_LAPSES clawbacks no longer get subscribe tasks.
+"""
+import asyncio
+import logging
+import secrets
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from sqlalchemy import and_, bindparam, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import config
+from database.models import BalanceLedger, BotSettings, SubscriptionLapse, Task, TaskCompletion, User
+from services.outbox import outbox
+from services.task_cache import CachedTask, task_cache
+
+logger = logging.getLogger(__name__)
+
+CURSOR_KEY = "subscriptions_verify_cursor"
+BATCH_SIZE = 200
+
+_LEFT_STATUSES = ("left", "kicked", "banned")
+
+
+@dataclass(frozen=True, slots=True)
+class LapseSummary:
+    task_id: int
+    title: str
+    users: int
+    amount: float
+
+
+@dataclass
+class VerifyResult:
+    checked: int = 0
+    left: int = 0
+    rejoined: int = 0
+
+
+@dataclass
+class ClawbackResult:
+    batch_id: str
+    lapses: int = 0
+    users: int = 0
+    amount: float = 0.0
+    new_offenders: int = 0
+
+
+class SubscriptionAudit:
+    def __init__(self) -> None:
+        self._offenders: set[int] = set()
+        self._next_call = 0.0
+
+    # ─── Repeat offenders ────────────────────────────────────────────────────
+
+    async def load_offenders(self, session: AsyncSession) -> None:
+        self._offenders = set(await self._offenders_among(session))
+
+    @staticmethod
+    async def _offenders_among(session: AsyncSession, user_ids: set[int] | None = None) -> list[int]:
+        if config.SUBSCRIPTION_OFFENDER_LAPSES <= 0:
+            return []
+        query = (
+            select(SubscriptionLapse.user_id)
+            .where(SubscriptionLapse.status == "clawed_back")
+            .group_by(SubscriptionLapse.user_id)
+            .having(func.count() >= config.SUBSCRIPTION_OFFENDER_LAPSES)
+        )
+        if user_ids is not None:
+            query = query.where(SubscriptionLapse.user_id.in_(user_ids))
+        return list((await session.scalars(query)).all())
+
+    def is_excluded(self, user_id: int) -> bool:
+        """True if the user may not take subscribe tasks any more."""
+        return user_id in self._offenders
+
+    @property
+    def offenders(self) -> int:
+        return len(self._offenders)
+
+    # ─── Verification (scheduler job) ────────────────────────────────────────
+
+    async def _pace(self) -> None:
+        loop = asyncio.get_running_loop()
+        wait = self._next_call - loop.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._next_call = max(self._next_call, loop.time()) + 1 / config.SUBSCRIPTION_CHECKS_PER_SECOND
+
+    async def _has_left(self, bot: Bot, channel_id: str, user_id: int) -> bool | None:
+        """Whether the user has left the channel; None if this user could not be checked.
+        Raises TelegramForbiddenError/TelegramBadRequest about the chat when the bot lost access."""
+        while True:
+            await self._pace()
+            try:
+                member = await bot.get_chat_member(channel_id, user_id)
+            except TelegramRetryAfter as exc:
+                self._next_call = asyncio.get_running_loop().time() + exc.retry_after
+                continue
+            except TelegramBadRequest as exc:
+                if "chat not found" in str(exc).lower():
+                    raise
+                logger.info("Subscription check of %s in %s failed: %s", user_id, channel_id, exc)
+                return None
+            return member.status in _LEFT_STATUSES
+
+    async def verify(self, bot: Bot, session: AsyncSession) -> VerifyResult:
+        """Check up to SUBSCRIPTION_CHECKS_PER_RUN completions, continuing where the last run
+        stopped and going round the active subscribe tasks."""
+        result = VerifyResult()
+        tasks = [t for t in await task_cache.active(session) if t.task_type == "subscribe" and t.channel_id]
+        if not tasks:
+            return result
+        cursor = await session.get(BotSettings, CURSOR_KEY)
+        task_id, after = map(int, cursor.value.split(":")) if cursor and cursor.value else (0, 0)
+        start = next((i for i, t in enumerate(tasks) if t.id >= task_id), 0)
+        if tasks[start].id != task_id:
+            after = 0
+
+        budget = config.SUBSCRIPTION_CHECKS_PER_RUN
+        current, finished_tasks = start, 0
+        # each task at most once per run; big ones take several batches while the budget lasts
+        while budget > 0 and finished_tasks < len(tasks):
+            task = tasks[current]
+            limit = min(budget, BATCH_SIZE)
+            try:
+                after, finished = await self._verify_task(bot, session, task, after, limit, result)
+            except (TelegramForbiddenError, TelegramBadRequest) as exc:
+                logger.warning("Subscription checks of task %s skipped, no access to %s: %s", task.id, task.channel_id, exc)
+                finished = True
+            budget -= limit
+            if finished:
+                current, after = (current + 1) % len(tasks), 0
+                finished_tasks += 1
+        await session.merge(BotSettings(key=CURSOR_KEY, value=f"{tasks[current].id}:{after}"))
+        await session.commit()
+        if result.left:
+            logger.info("Subscription checks: %d checked, %d left, %d rejoined", result.checked, result.left, result.rejoined)
+        return result
+
+    async def _verify_task(
+        self, bot: Bot, session: AsyncSession, task: CachedTask, after: int, limit: int, result: VerifyResult,
+    ) -> tuple[int, bool]:
+        """Check one batch of the task's completions after id `after`; commits the findings.
+        Returns (last completion id checked, whether the task is done)."""
+        rows = (await session.execute(
+            select(TaskCompletion.id, TaskCompletion.user_id, SubscriptionLapse.status)
+            .outerjoin(SubscriptionLapse, and_(
+                SubscriptionLapse.user_id == TaskCompletion.user_id, SubscriptionLapse.task_id == task.id,
+            ))
+            .where(TaskCompletion.task_id == task.id, TaskCompletion.id > after)
+            .order_by(TaskCompletion.id)
+            .limit(limit)
+        )).all()
+        left: list[int] = []
+        rejoined: list[int] = []
+        for completion_id, user_id, lapse_status in rows:
+            after = completion_id
+            # settled lapses are not looked at again
+            if lapse_status not in (None, "pending"):
+                continue
+            has_left = await self._has_left(bot, task.channel_id, user_id)
+            result.checked += 1
+            if has_left and lapse_status is None:
+                left.append(user_id)
+            elif has_left is False and lapse_status == "pending":
+                rejoined.append(user_id)
+        if left:
+            now = datetime.utcnow()
+            await session.execute(
+                insert(SubscriptionLapse).prefix_with("OR IGNORE"),
+                [{"user_id": uid, "task_id": task.id, "reward": task.reward, "detected_at": now} for uid in left],
+            )
+        if rejoined:
+            await session.execute(delete(SubscriptionLapse).where(
+                SubscriptionLapse.task_id == task.id,
+                SubscriptionLapse.user_id.in_(rejoined),
+                SubscriptionLapse.status == "pending",
+            ))
+        await session.commit()
+        result.left += len(left)
+        result.rejoined += len(rejoined)
+        return after, len(rows) < limit
+
+    # ─── Review (admin) ──────────────────────────────────────────────────────
+
+    @staticmethod
+    async def pending_summary(session: AsyncSession) -> list[LapseSummary]:
+        """Pending lapses per task, largest amount first."""
+        rows = (await session.execute(
+            select(
+                SubscriptionLapse.task_id, Task.title,
+                func.count(SubscriptionLapse.id), func.sum(SubscriptionLapse.reward),
+            )
+            .outerjoin(Task, Task.id == SubscriptionLapse.task_id)
+            .where(SubscriptionLapse.status == "pending")
+            .group_by(SubscriptionLapse.task_id)
+            .order_by(func.sum(SubscriptionLapse.reward).desc())
+        )).all()
+        return [LapseSummary(task_id, title or f"#{task_id}", users, float(amount)) for task_id, title, users, amount in rows]
+
+    async def resolve(
+        self, session: AsyncSession, task_id: int | None, admin_id: int, clawback: bool,
+    ) -> ClawbackResult:
+        """Claw back (or dismiss) the pending lapses of one task, or of all tasks with None.
+        Commits."""
+        result = ClawbackResult(batch_id=f"{datetime.utcnow():%Y%m%d%H%M%S}-{secrets.token_hex(3)}")
+        now = datetime.utcnow()
+        query = (
+            update(SubscriptionLapse)
+            .where(SubscriptionLapse.status == "pending")
+            .values(status="clawed_back" if clawback else "dismissed", resolved_at=now, resolved_by=admin_id)
+            .returning(SubscriptionLapse.user_id, SubscriptionLapse.task_id, SubscriptionLapse.reward)
+        )
+        if task_id is not None:
+            query = query.where(SubscriptionLapse.task_id == task_id)
+        rows = (await session.execute(query)).all()
+        result.lapses = len(rows)
+        if not rows or not clawback:
+            await session.commit()
+            return result
+
+        owed: dict[int, float] = defaultdict(float)
+        task_ids: dict[int, set[int]] = defaultdict(set)
+        for user_id, lapse_task_id, reward in rows:
+            owed[user_id] += reward
+            task_ids[user_id].add(lapse_task_id)
+        # read under the write lock taken by the UPDATE above, so the debits below cannot race
+        balances = dict((await session.execute(
+            select(User.user_id, User.stars_balance).where(User.user_id.in_(owed))
+        )).all())
+        debits = {
+            user_id: round(min(amount, max(balances[user_id], 0.0)), 2)
+            for user_id, amount in owed.items() if user_id in balances
+        }
+        debits = {user_id: amount for user_id, amount in debits.items() if amount > 0}
+        if debits:
+            users = User.__table__  # Core table: an ORM update() with a parameter list means "bulk by PK"
+            await session.execute(
+                update(users)
+                .where(users.c.user_id == bindparam("uid"))
+                .values(stars_balance=users.c.stars_balance - bindparam("amount")),
+                [{"uid": user_id, "amount": amount} for user_id, amount in debits.items()],
+            )
+            await session.execute(insert(BalanceLedger), [
+                {
+                    "user_id": user_id, "amount": -amount,
+                    "reason": "Отписка от канала (задания " + ", ".join(map(str, sorted(task_ids[user_id]))) + ")",
+                    "source": "clawback", "batch_id": result.batch_id, "admin_id": admin_id, "created_at": now,
+                }
+                for user_id, amount in debits.items()
+            ])
+            for user_id, amount in debits.items():
+                outbox.send(
+                    session, user_id,
+                    f"⚠️ Ты отписался от канала из задания — награда <b>{amount:.2f} ⭐</b> списана с баланса.",
+                )
+        offenders = set(await self._offenders_among(session, set(owed))) - self._offenders
+        await session.commit()
+        outbox.wake()
+
+        self._offenders |= offenders
+        result.users = len(debits)
+        result.amount = sum(debits.values())
+        result.new_offenders = len(offenders)
+        return result
+
+
+subscription_audit = SubscriptionAudit()
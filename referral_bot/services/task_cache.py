@@ -0,0 +1,106 @@
+"""In-memory active task list and per-user completion bitsets.
+
+The active list is reloaded only when its version moves: admin create/toggle/delete and the
+auto-deactivation in task checks call bump(). A user's completions are one int with bit
+`task_id` set, loaded once per user into a bounded LRU and updated on completion.
+"""
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import Task, TaskCompletion
+
+# Users whose completion bitsets are kept in memory
+COMPLETIONS_CACHE_SIZE = 50_000
+
+
+@dataclass(frozen=True, slots=True)
+class CachedTask:
+    id: int
+    task_type: str
+    title: str
+    description: str
+    reward: float
+    channel_id: str | None
+    target_value: int | None
+
+
+class TaskCache:
+    def __init__(self) -> None:
+        self.version = 0
+        self._loaded_version = -1
+        self.active_mask = 0
+        self._tasks: tuple[CachedTask, ...] = ()
+        self._by_id: dict[int, CachedTask] = {}
+        self._lock = asyncio.Lock()
+        self._completions: OrderedDict[int, int] = OrderedDict()
+
+    def bump(self) -> None:
+        """Mark the active list stale; the next reader reloads it."""
+        self.version += 1
+
+    async def active(self, session: AsyncSession) -> tuple[CachedTask, ...]:
+        """Active tasks in creation order."""
+        if self._loaded_version != self.version:
+            async with self._lock:
+                if self._loaded_version != self.version:
+                    version = self.version
+                    rows = (await session.execute(
+                        select(Task).where(Task.is_active == True).order_by(Task.created_at)
+                    )).scalars().all()
+                    self._tasks = tuple(
+                        CachedTask(t.id, t.task_type, t.title, t.description, t.reward, t.channel_id, t.target_value)
+                        for t in rows
+                    )
+                    self._by_id = {t.id: t for t in self._tasks}
+                    self.active_mask = sum(1 << t.id for t in self._tasks)
+                    self._loaded_version = version
+        return self._tasks
+
+    @property
+    def loaded_version(self) -> int:
+        """Version of the list last returned by active()."""
+        return self._loaded_version
+
+    async def get(self, session: AsyncSession, task_id: int) -> CachedTask | None:
+        """Active task by id, None if it does not exist or is inactive."""
+        await self.active(session)
+        return self._by_id.get(task_id)
+
+    # ─── Completions ─────────────────────────────────────────────────────────
+
+    async def completed_mask(self, session: AsyncSession, user_id: int) -> int:
+        mask = self._completions.get(user_id)
+        if mask is not None:
+            self._completions.move_to_end(user_id)
+            return mask
+        mask = 0
+        for task_id in (await session.execute(
+            select(TaskCompletion.task_id).where(TaskCompletion.user_id == user_id)
+        )).scalars():
+            mask |= 1 << task_id
+        self._completions[user_id] = mask
+        if len(self._completions) > COMPLETIONS_CACHE_SIZE:
+            self._completions.popitem(last=False)
+        return mask
+
+    async def is_completed(self, session: AsyncSession, user_id: int, task_id: int) -> bool:
+        return bool(await self.completed_mask(session, user_id) >> task_id & 1)
+
+    def mark_completed(self, user_id: int, task_id: int) -> None:
+        """Record a committed completion; users not in the cache load it from the DB later."""
+        if user_id in self._completions:
+            self._completions[user_id] |= 1 << task_id
+
+    def forget_task(self, task_id: int) -> None:
+        """Clear a deleted task's bit everywhere, since SQLite may reuse its id."""
+        keep = ~(1 << task_id)
+        for user_id, mask in self._completions.items():
+            self._completions[user_id] = mask & keep
+        self.bump()
+
+
+task_cache = TaskCache()
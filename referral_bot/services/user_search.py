@@ -0,0 +1,103 @@
+"""Admin user lookup by id, @username prefix or name fragment, and the user card behind it.
+
+Usernames are matched as case-folded prefixes over ix_users_username_lower (a range scan, not a
+LIKE over the table); names and the words of usernames go through the users_fts FTS5 index as
+word prefixes. Both feed one UNION of user ids, paginated by keyset on user_id. A user card is
+three indexed queries: the user by primary key, the latest games and the latest withdrawals.
+"""
+import logging
+import re
+from dataclasses import dataclass
+
+from sqlalchemy import func, literal_column, select, text, union
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import GameSession, User, Withdrawal
+
+logger = logging.getLogger(__name__)
+
+SEARCH_PAGE_SIZE = 10
+CARD_RECENT = 5
+
+_WORD_RE = re.compile(r"\w+")
+
+
+@dataclass(frozen=True, slots=True)
+class UserCard:
+    user: User
+    games: list[GameSession]
+    withdrawals: list[Withdrawal]
+
+
+def _username_range(query: str) -> tuple[str, str]:
+    """[lo, hi) bounds of lower(username) for usernames starting with `query`."""
+    lo = query.lower()
+    return lo, lo[:-1] + chr(ord(lo[-1]) + 1)
+
+
+def _fts_match(query: str) -> str | None:
+    words = _WORD_RE.findall(query.lower())
+    return " ".join(f'"{word}"*' for word in words) if words else None
+
+
+async def search_users(
+    session: AsyncSession, query: str, after: int = 0, limit: int = SEARCH_PAGE_SIZE,
+) -> tuple[list[User], bool]:
+    """Users whose id equals `query`, whose username starts with it or whose name has words
+    starting with its words; ordered by user_id after `after`. Returns (page, has_more)."""
+    query = query.strip().lstrip("@")
+    if not query:
+        return [], False
+    lo, hi = _username_range(query)
+    parts = [
+        select(User.user_id)
+        .where(func.lower(User.username) >= lo, func.lower(User.username) < hi, User.user_id > after)
+    ]
+    if query.isdigit():
+        parts.append(select(User.user_id).where(User.user_id == int(query), User.user_id > after))
+    match = _fts_match(query)
+    if match:
+        parts.append(
+            select(literal_column("rowid").label("user_id"))
+            .select_from(text("users_fts"))
+            .where(text("users_fts MATCH :match AND rowid > :after"))
+        )
+    ids_query = union(*parts).order_by("user_id").limit(limit + 1) if len(parts) > 1 else (
+        parts[0].order_by(User.user_id).limit(limit + 1)
+    )
+    params = {"match": match, "after": after}
+    try:
+        ids = list((await session.scalars(ids_query, params)).all())
+    except OperationalError as exc:
+        if not match:
+            raise
+        # users_fts missing (no FTS5 in this SQLite) or an unusable MATCH: usernames only
+        logger.warning("User search without users_fts for %r: %s", query, exc)
+        await session.rollback()
+        ids = list((await session.scalars(parts[0].order_by(User.user_id).limit(limit + 1))).all())
+    has_more = len(ids) > limit
+    ids = ids[:limit]
+    if not ids:
+        return [], False
+    users = (await session.scalars(select(User).where(User.user_id.in_(ids)).order_by(User.user_id))).all()
+    return list(users), has_more
+
+
+async def load_user_card(session: AsyncSession, user_id: int) -> UserCard | None:
+    user = await session.get(User, user_id)
+    if user is None:
+        return None
+    games = (await session.scalars(
+        select(GameSession)
+        .where(GameSession.user_id == user_id)
+        .order_by(GameSession.played_at.desc())
+        .limit(CARD_RECENT)
+    )).all()
+    withdrawals = (await session.scalars(
+        select(Withdrawal)
+        .where(Withdrawal.user_id == user_id)
+        .order_by(Withdrawal.created_at.desc())
+        .limit(CARD_RECENT)
+    )).all()
+    return UserCard(user, list(games), list(withdrawals))
@@ -0,0 +1,149 @@
+"""Withdrawal review: pending queue pages and approve/reject of any number of withdrawals.
+
+The queue is read with keyset pagination on (created_at, id) over ix_withdrawals_status_created,
+so every page costs the same however many requests are pending. review_withdrawals() settles a
+whole selection in one transaction: one UPDATE … RETURNING flips the still-pending rows, one
+correlated UPDATE refunds rejected amounts per user, and the channel edits and user
+notifications are queued in the outbox, which delivers them within Telegram's rate limits.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import config
+from database.counters import bump_counters
+from database.models import BotSettings, User, Withdrawal
+from services.outbox import outbox
+
+PAGE_SIZE = 8
+
+
+@dataclass(frozen=True, slots=True)
+class PendingWithdrawal:
+    id: int
+    user_id: int
+    username: str | None
+    amount: float
+    created_at: datetime
+
+
+@dataclass(frozen=True, slots=True)
+class ReviewedWithdrawal:
+    id: int
+    user_id: int
+    amount: float
+
+
+def build_withdrawal_msg(withdrawal_id: int, username: str, user_id: int, amount: float, status: str) -> str:
+    status_map = {
+        "pending":  "⏳ Статус: на рассмотрении",
+        "approved": "✅ Статус: одобрено",
+        "rejected": "❌ Статус: отклонено",
+    }
+    return (
+        f"📌 <b>Запрос на вывод средств #{withdrawal_id}</b>\n\n"
+        f"👤 Пользователь: @{username} | ID {user_id}\n"
+        f"💫 Сумма: {amount:.0f} ⭐\n"
+        f"{status_map.get(status, status)}"
+    )
+
+
+async def pending_page(
+    session: AsyncSession, after_id: int = 0, limit: int = PAGE_SIZE,
+) -> tuple[list[PendingWithdrawal], bool]:
+    """Oldest pending withdrawals after the one with id `after_id` (0 = from the start),
+    and whether there are more."""
+    query = (
+        select(Withdrawal.id, Withdrawal.user_id, User.username, Withdrawal.amount, Withdrawal.created_at)
+        .outerjoin(User, User.user_id == Withdrawal.user_id)
+        .where(Withdrawal.status == "pending")
+        .order_by(Withdrawal.created_at, Withdrawal.id)
+        .limit(limit + 1)
+    )
+    if after_id:
+        cursor_created = select(Withdrawal.created_at).where(Withdrawal.id == after_id).scalar_subquery()
+        query = query.where(tuple_(Withdrawal.created_at, Withdrawal.id) > tuple_(cursor_created, after_id))
+    rows = (await session.execute(query)).all()
+    return [PendingWithdrawal(*row) for row in rows[:limit]], len(rows) > limit
+
+
+async def pending_ids(session: AsyncSession) -> list[int]:
+    return list((await session.scalars(
+        select(Withdrawal.id).where(Withdrawal.status == "pending").order_by(Withdrawal.created_at, Withdrawal.id)
+    )).all())
+
+
+async def pending_totals(session: AsyncSession, ids: list[int] | None = None) -> tuple[int, float]:
+    """(count, amount) of pending withdrawals, of all or only of `ids`."""
+    query = select(func.count(Withdrawal.id), func.coalesce(func.sum(Withdrawal.amount), 0.0)).where(
+        Withdrawal.status == "pending"
+    )
+    if ids is not None:
+        if not ids:
+            return 0, 0.0
+        query = query.where(Withdrawal.id.in_(ids))
+    count, amount = (await session.execute(query)).one()
+    return count, float(amount)
+
+
+async def review_withdrawals(session: AsyncSession, ids: list[int], approve: bool) -> list[ReviewedWithdrawal]:
+    """Approve or reject those of `ids` that are still pending, refund rejected amounts and
+    queue the channel edits and user notifications. Commits; returns what was settled."""
+    if not ids:
+        return []
+    status = "approved" if approve else "rejected"
+    rows = (await session.execute(
+        update(Withdrawal)
+        .where(Withdrawal.id.in_(ids), Withdrawal.status == "pending")
+        .values(status=status, processed_at=datetime.utcnow())
+        .returning(Withdrawal.id, Withdrawal.user_id, Withdrawal.amount, Withdrawal.payments_message_id)
+    )).all()
+    if not rows:
+        return []
+    settled_ids = [row.id for row in rows]
+    user_ids = {row.user_id for row in rows}
+
+    if not approve:
+        refund = (
+            select(func.sum(Withdrawal.amount))
+            .where(Withdrawal.user_id == User.user_id, Withdrawal.id.in_(settled_ids))
+            .scalar_subquery()
+        )
+        await session.execute(
+            update(User).where(User.user_id.in_(user_ids)).values(stars_balance=User.stars_balance + refund)
+        )
+    await bump_counters(
+        session,
+        withdrawals_pending=-len(rows),
+        withdrawals_approved_sum=sum(row.amount for row in rows) if approve else 0.0,
+    )
+
+    usernames = dict((await session.execute(
+        select(User.user_id, User.username).where(User.user_id.in_(user_ids))
+    )).all())
+    pch = await session.get(BotSettings, "payments_channel_id")
+    for row in rows:
+        # Admin channel message: remove buttons, keep text
+        if config.ADMIN_CHANNEL_ID:
+            outbox.edit_markup(
+                session, config.ADMIN_CHANNEL_ID, withdrawal_id=row.id, field="channel_message_id",
+            )
+        # Payments channel message: updated status (its id may still be on the way from the outbox)
+        if pch and pch.value:
+            outbox.edit_text(
+                session, pch.value,
+                build_withdrawal_msg(row.id, usernames.get(row.user_id) or "unknown", row.user_id, row.amount, status),
+                message_id=row.payments_message_id, withdrawal_id=row.id, field="payments_message_id",
+            )
+        if row.user_id in usernames:
+            if approve:
+                notify = f"💸 Ваша заявка на вывод <b>{row.amount:.0f} ⭐</b> одобрена!"
+            else:
+                notify = f"❌ Ваша заявка на вывод <b>{row.amount:.0f} ⭐</b> отклонена."
+            outbox.send(session, row.user_id, notify)
+
+    await session.commit()
+    outbox.wake()
+    return [ReviewedWithdrawal(row.id, row.user_id, row.amount) for row in rows]